@@ -5,13 +5,27 @@ import os
 from datetime import datetime, timedelta
 import uuid
 import logging
+import click
 
-from models import db, User, Visitor, Authority, BusEntry, Notification
+from models import db, User, Visitor, Authority, BusEntry, Notification, DailyCounter
+from services.counters import rebuild_counters
+from services.migrations import run_migrations
+from services.query_plans import check_query_plans
+from services.query_budget import install_query_counter
+from services.auth import get_current_user
+from services.inbox import unread_count, rebuild_inbox_counters
+from services.photo_store import collect_garbage
+from services.db_transfer import schema_sql, copy_database
+from services.sqlite_tuning import install_sqlite_pragmas, optimize_database, start_maintenance
+from services.sheets import start_sheets_worker, drain_outbox, retry_dead_rows
+from services.notifications import start_dispatcher, configure_transports, expand_pending_events, deliver_pending, get_transport
+from services.retention import archive_closed_records, start_retention, PHOTO_COLUMNS
+from services.instrumentation import init_instrumentation
 from config import Config
 
-def create_app():
+def create_app(config_object=Config):
     app = Flask(__name__)
-    app.config.from_object(Config)
+    app.config.from_object(config_object)
     
     # Initialize database
     db.init_app(app)
@@ -23,6 +37,7 @@ def create_app():
     from routes.authority import authority_bp
     from routes.dashboard import dashboard_bp
     from routes.api import api_bp
+    from routes.metrics import metrics_bp
     
     # Register blueprints
     app.register_blueprint(auth_bp)
@@ -31,10 +46,15 @@ def create_app():
     app.register_blueprint(authority_bp)
     app.register_blueprint(dashboard_bp)
     app.register_blueprint(api_bp)
+    app.register_blueprint(metrics_bp)
     
-    # Create tables
+    # Create tables and bring existing databases up to date
     with app.app_context():
+        install_sqlite_pragmas(db.engine, app.config)
+        install_query_counter(db.engine)
+        init_instrumentation(app)
         db.create_all()
+        run_migrations()
         
         # Create default admin user if not exists
         admin_user = User.query.filter_by(username='admin').first()
@@ -46,28 +66,133 @@ def create_app():
             )
             db.session.add(admin_user)
             db.session.commit()
+        
+        # Backfill the daily counters the first time they are created
+        if not DailyCounter.query.first() and (Visitor.query.first() or BusEntry.query.first()):
+            rebuild_counters()
+    
+    configure_transports(app)
+    # Under the development reloader the parent process only watches files and
+    # restarts the child that serves requests; the workers run in the child
+    if not app.debug or os.environ.get('WERKZEUG_RUN_MAIN') == 'true':
+        start_maintenance(app)
+        start_sheets_worker(app)
+        start_dispatcher(app)
+        start_retention(app)
+    
+    @app.cli.command('rebuild-counters')
+    def rebuild_counters_command():
+        """Rebuild the daily visitor and vehicle counters from history"""
+        rebuild_counters()
+        print('Daily counters rebuilt.')
+    
+    @app.cli.command('rebuild-inbox-counters')
+    def rebuild_inbox_counters_command():
+        """Recount every authority's unread notifications"""
+        rebuild_inbox_counters()
+        db.session.commit()
+        print('Inbox counters rebuilt.')
+    
+    @app.cli.command('check-query-plans')
+    def check_query_plans_command():
+        """Explain the hot queries and fail if any of them scans a whole table"""
+        full_scans = 0
+        for name, plan, full_scan in check_query_plans():
+            print(f"{'FULL SCAN' if full_scan else 'ok':9} {name}")
+            for line in plan:
+                print(f'          {line}')
+            full_scans += full_scan
+        if full_scans:
+            raise SystemExit(f'{full_scans} hot queries scan a whole table')
+    
+    @app.cli.command('gc-photos')
+    def gc_photos_command():
+        """Delete stored photos that no visitor references any more"""
+        removed = collect_garbage()
+        print(f'Removed {removed} unreferenced photo files.')
+    
+    @app.cli.command('optimize-db')
+    @click.option('--full', is_flag=True, help='Run a complete ANALYZE instead of PRAGMA optimize')
+    def optimize_db_command(full):
+        """Refresh SQLite query planner statistics and checkpoint the WAL"""
+        statements = optimize_database(full=full)
+        if not statements:
+            raise SystemExit('optimize-db only applies to SQLite databases')
+        print('Ran ' + '; '.join(statements) + '.')
+    
+    @app.cli.command('sync-sheets')
+    @click.option('--retry-dead', is_flag=True, help='Also requeue rows that ran out of attempts')
+    def sync_sheets_command(retry_dead):
+        """Send every due Google Sheets outbox row now"""
+        if not app.config['GOOGLE_SHEETS_WEBHOOK_URL']:
+            raise SystemExit('GOOGLE_SHEETS_WEBHOOK_URL is not set')
+        if retry_dead:
+            print(f'Requeued {retry_dead_rows()} dead rows.')
+        print(f'Sent {drain_outbox()} rows to Google Sheets.')
+    
+    @app.cli.command('dispatch-notifications')
+    def dispatch_notifications_command():
+        """Expand queued notification events and send due deliveries now"""
+        expanded = expand_pending_events()
+        sent = {channel: deliver_pending(channel) for channel in app.config['NOTIFICATION_CHANNELS'] if get_transport(channel)}
+        print(f'Expanded {expanded} events; sent ' + (', '.join(f'{n} {c}' for c, n in sent.items()) or 'nothing') + '.')
+    
+    @app.cli.command('archive-records')
+    @click.option('--days', type=int, help='Archive closed records older than this many days [default: RETENTION_DAYS]')
+    @click.option('--photos', type=click.Choice(list(PHOTO_COLUMNS)), help='What to do with archived photos [default: RETENTION_PHOTO_MODE]')
+    def archive_records_command(days, photos):
+        """Move closed visitor, vehicle and notification records into the archive tables"""
+        days = app.config['RETENTION_DAYS'] if days is None else days
+        if not days:
+            raise SystemExit('Archiving is disabled (RETENTION_DAYS=0); pass --days')
+        moved = archive_closed_records(days=days, photo_mode=photos)
+        removed = collect_garbage() if moved.get('photos') else 0
+        print('Archived ' + (', '.join(f'{n} {table}' for table, n in sorted(moved.items()) if table != 'photos') or 'nothing')
+              + f'; released {moved.get("photos", 0)} photo references and removed {removed} photo files.')
+    
+    @app.cli.command('schema-sql')
+    @click.option('--dialect', default='postgresql', show_default=True, help='SQL dialect to generate DDL for')
+    def schema_sql_command(dialect):
+        """Print CREATE statements for the current models"""
+        print(schema_sql(dialect), end='')
+    
+    @app.cli.command('copy-database')
+    @click.argument('source_url')
+    @click.option('--batch-size', default=1000, show_default=True, help='Rows per INSERT batch')
+    @click.option('--yes', is_flag=True, help='Do not ask before replacing existing data')
+    def copy_database_command(source_url, batch_size, yes):
+        """Copy all data from SOURCE_URL (e.g. sqlite:///instance/gate_entry.db) into the configured database"""
+        target = db.engine.url.render_as_string(hide_password=True)
+        if not yes:
+            click.confirm(f'Replace all data in {target} with {source_url}?', abort=True)
+        try:
+            copied = copy_database(source_url, batch_size=batch_size)
+        except ValueError as e:
+            raise SystemExit(str(e))
+        print(f'Copied {sum(rows for _, rows in copied)} rows into {target}.')
     
     @app.route('/')
     def index():
         if 'user_id' not in session:
             return redirect(url_for('auth.login'))
         
-        user = User.query.get(session['user_id'])
+        user = get_current_user()
         if not user:
-            session.clear()
             return redirect(url_for('auth.login'))
         
         return render_template('index.html', user=user)
     
     @app.context_processor
     def inject_user():
-        if 'user_id' in session:
-            user = User.query.get(session['user_id'])
-            return {'current_user': user}
-        return {'current_user': None}
+        user = get_current_user()
+        # Counter read, so the navbar badge costs one primary-key lookup
+        has_inbox = user is not None and (user.role == 'admin' or user.authority_id)
+        return {'current_user': user, 'unread_notifications': unread_count(user) if has_inbox else 0}
     
     return app
 
 if __name__ == '__main__':
+    # Known to create_app before app.run turns the reloader on
+    os.environ['FLASK_DEBUG'] = '1'
     app = create_app()
     app.run(host='0.0.0.0', port=5000, debug=True)
\ No newline at end of file
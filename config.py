@@ -1,25 +1,119 @@
 import os
 from datetime import timedelta
 
+def _database_url():
+    url = os.environ.get('DATABASE_URL') or os.environ.get('SQLALCHEMY_DATABASE_URI') or 'sqlite:///gate_entry.db'
+    # Hosting providers still hand out the postgres:// scheme SQLAlchemy dropped
+    if url.startswith('postgres://'):
+        url = 'postgresql://' + url[len('postgres://'):]
+    return url
+
+def _engine_options(url):
+    # SQLite connections are cheap file handles; pooling only matters for a
+    # server database shared by several gate terminals
+    if url.startswith('sqlite'):
+        return {}
+    return {
+        'pool_size': int(os.environ.get('DB_POOL_SIZE', 10)),
+        'max_overflow': int(os.environ.get('DB_MAX_OVERFLOW', 20)),
+        'pool_timeout': int(os.environ.get('DB_POOL_TIMEOUT', 30)),
+        'pool_recycle': int(os.environ.get('DB_POOL_RECYCLE', 1800)),
+        'pool_pre_ping': True
+    }
+
 class Config:
     # Basic Flask configuration
     SECRET_KEY = os.environ.get('SECRET_KEY') or 'sincet-gate-entry-system-secret-key-2024'
     
-    # Database configuration - Force SQLite for this Flask app
-    SQLALCHEMY_DATABASE_URI = 'sqlite:///gate_entry.db'
+    # Database configuration - SQLite by default, DATABASE_URL selects another backend
+    SQLALCHEMY_DATABASE_URI = _database_url()
+    SQLALCHEMY_ENGINE_OPTIONS = _engine_options(SQLALCHEMY_DATABASE_URI)
     SQLALCHEMY_TRACK_MODIFICATIONS = False
     
+    # SQLite connection tuning (ignored for other backends)
+    SQLITE_TUNING_ENABLED = os.environ.get('SQLITE_TUNING_ENABLED', 'true').lower() == 'true'
+    SQLITE_JOURNAL_MODE = 'WAL'
+    SQLITE_SYNCHRONOUS = 'NORMAL'
+    SQLITE_BUSY_TIMEOUT_MS = 5000
+    SQLITE_MMAP_SIZE = 256 * 1024 * 1024
+    SQLITE_CACHE_SIZE_KB = 64 * 1024
+    # Seconds between PRAGMA optimize runs; 0 disables the maintenance thread
+    SQLITE_OPTIMIZE_INTERVAL = int(os.environ.get('SQLITE_OPTIMIZE_INTERVAL', 6 * 3600))
+    
     # Upload configuration
     UPLOAD_FOLDER = 'static/uploads'
     MAX_CONTENT_LENGTH = 16 * 1024 * 1024  # 16MB max file size
     ALLOWED_EXTENSIONS = {'png', 'jpg', 'jpeg', 'gif'}
+    PHOTO_MAX_DIMENSION = 1280
+    PHOTO_THUMB_SIZE = 96
+    PHOTO_QUALITY = 80
+    PHOTO_GC_GRACE_SECONDS = 3600
+    
+    # Gate log retention, off unless RETENTION_DAYS is set. Closed visitors,
+    # exited vehicles and read notifications older than RETENTION_DAYS move
+    # to the archive tables. RETENTION_PHOTO_MODE decides what happens to
+    # archived visitors' photos: keep, thumbnail (drop the full-size photos)
+    # or delete
+    RETENTION_DAYS = int(os.environ.get('RETENTION_DAYS', 0))
+    RETENTION_BATCH_SIZE = 500
+    RETENTION_PHOTO_MODE = os.environ.get('RETENTION_PHOTO_MODE', 'keep')
+    RETENTION_INTERVAL = 24 * 3600  # seconds between archiving runs; 0 disables the thread
+    
+    # Pagination
+    API_MAX_PAGE_SIZE = 100
+    COUNT_CACHE_SECONDS = 30
+    
+    # Read API responses kept for conditional requests
+    RESPONSE_CACHE_SIZE = 256
+    
+    # Bulk CSV import of expected visitors
+    IMPORT_MAX_ROWS = 5000
+    IMPORT_BATCH_SIZE = 500
+    
+    # Request instrumentation: per-endpoint timings at /metrics (Prometheus
+    # text format) and a JSON slow log of requests and SQL statements over the
+    # thresholds, with the statements' EXPLAIN plans. Bind parameters contain
+    # personal data and password hashes, so they are only logged when
+    # SLOW_QUERY_LOG_PARAMS is set.
+    # Scrapers read /metrics with METRICS_TOKEN as a bearer token; without a
+    # token only signed-in admins can read it
+    METRICS_ENABLED = os.environ.get('METRICS_ENABLED', 'true').lower() == 'true'
+    METRICS_TOKEN = os.environ.get('METRICS_TOKEN', '')
+    SLOW_REQUEST_MS = int(os.environ.get('SLOW_REQUEST_MS', 500))
+    SLOW_QUERY_MS = int(os.environ.get('SLOW_QUERY_MS', 100))
+    SLOW_QUERY_EXPLAIN = True
+    SLOW_QUERY_LOG_PARAMS = os.environ.get('SLOW_QUERY_LOG_PARAMS', 'false').lower() == 'true'
+    SLOW_LOG_FILE = os.environ.get('SLOW_LOG_FILE', '')  # also logged through the app logger
+    
+    # Raise instead of logging when an endpoint exceeds its query budget
+    QUERY_BUDGET_ENFORCE = os.environ.get('QUERY_BUDGET_ENFORCE', 'false').lower() == 'true'
     
     # Session configuration
     PERMANENT_SESSION_LIFETIME = timedelta(hours=8)
+    USER_CACHE_SECONDS = 60
+    AUTHORITY_CACHE_SECONDS = 300
+    
+    # Notification delivery. In-app notifications are always created; each
+    # channel listed here also gets a delivery (webhook, fake)
+    NOTIFICATION_CHANNELS = [c for c in os.environ.get('NOTIFICATION_CHANNELS', '').split(',') if c]
+    NOTIFICATION_WEBHOOK_URL = os.environ.get('NOTIFICATION_WEBHOOK_URL', '')
+    NOTIFICATION_RATE_LIMITS = {'email': 60, 'sms': 30, 'webhook': 600}  # messages per minute
+    NOTIFICATION_BATCH_SIZE = 50
+    NOTIFICATION_MAX_ATTEMPTS = 5
+    NOTIFICATION_RETRY_SECONDS = 30
+    NOTIFICATION_POLL_SECONDS = 30
     
     # Google Sheets configuration (optional)
     GOOGLE_SHEETS_ENABLED = os.environ.get('GOOGLE_SHEETS_ENABLED', 'false').lower() == 'true'
     GOOGLE_SHEETS_WEBHOOK_URL = os.environ.get('GOOGLE_SHEETS_WEBHOOK_URL', '')
+    GOOGLE_SHEETS_BATCH_SIZE = 200
+    GOOGLE_SHEETS_POLL_SECONDS = 10
+    GOOGLE_SHEETS_TIMEOUT = 10
+    # Failed batches wait RETRY_SECONDS, doubling per attempt up to MAX_BACKOFF
+    GOOGLE_SHEETS_RETRY_SECONDS = 5
+    GOOGLE_SHEETS_MAX_BACKOFF = 600
+    # Rows still failing after this many attempts are kept as dead instead of retried
+    GOOGLE_SHEETS_MAX_ATTEMPTS = int(os.environ.get('GOOGLE_SHEETS_MAX_ATTEMPTS', 20))
     
     # Application settings
     COLLEGE_NAME = 'SINCET'
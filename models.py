@@ -1,6 +1,7 @@
 from flask_sqlalchemy import SQLAlchemy
 from datetime import datetime
 import uuid
+from utils import normalize_phone, normalize_plate
 
 db = SQLAlchemy()
 
@@ -11,6 +12,7 @@ class User(db.Model):
     username = db.Column(db.String(80), unique=True, nullable=False)
     password = db.Column(db.String(120), nullable=False)
     role = db.Column(db.String(20), nullable=False, default='user')  # admin, authority, user
+    authority_id = db.Column(db.String(36), db.ForeignKey('authorities.id'))  # inbox of authority accounts
     is_active = db.Column(db.Boolean, default=True)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
@@ -20,6 +22,10 @@ class User(db.Model):
 
 class Authority(db.Model):
     __tablename__ = 'authorities'
+    __table_args__ = (
+        db.Index('ix_authorities_is_active_name', 'is_active', 'name'),
+        db.Index('ix_authorities_designation', 'designation'),
+    )
     
     id = db.Column(db.String(36), primary_key=True, default=lambda: str(uuid.uuid4()))
     name = db.Column(db.String(100), nullable=False)
@@ -40,13 +46,23 @@ class Authority(db.Model):
 
 class Visitor(db.Model):
     __tablename__ = 'visitors'
+    __table_args__ = (
+        db.Index('ix_visitors_entry_time', 'entry_time'),
+        db.Index('ix_visitors_status_exit_time', 'status', 'exit_time'),
+        db.Index('ix_visitors_status_entry_time', 'status', 'entry_time'),
+        db.Index('ix_visitors_authority_id', 'authority_id'),
+        db.Index('ix_visitors_phone_key_entry_time', 'phone_key', 'entry_time'),
+    )
     
     id = db.Column(db.String(36), primary_key=True, default=lambda: str(uuid.uuid4()))
     name = db.Column(db.String(100), nullable=False)
     phone = db.Column(db.String(20), nullable=False)
+    phone_key = db.Column(db.String(20))  # normalized phone for exact-match lookups
     email = db.Column(db.String(120))
     purpose = db.Column(db.Text, nullable=False)
     photo_url = db.Column(db.String(200))
+    photo_thumb_url = db.Column(db.String(200))
+    exit_photo_url = db.Column(db.String(200))
     entry_time = db.Column(db.DateTime, default=datetime.utcnow)
     exit_time = db.Column(db.DateTime)
     authority_id = db.Column(db.String(36), db.ForeignKey('authorities.id'))
@@ -61,14 +77,26 @@ class Visitor(db.Model):
     # Relationships
     notifications = db.relationship('Notification', backref='visitor', lazy=True)
     
+    @db.validates('phone')
+    def _set_phone_key(self, key, phone):
+        self.phone_key = normalize_phone(phone)
+        return phone
+    
     def __repr__(self):
         return f'<Visitor {self.name}>'
 
 class BusEntry(db.Model):
     __tablename__ = 'bus_entries'
+    __table_args__ = (
+        db.Index('ix_bus_entries_entry_time', 'entry_time'),
+        db.Index('ix_bus_entries_status_entry_time', 'status', 'entry_time'),
+        db.Index('ix_bus_entries_vehicle_type_entry_time', 'vehicle_type', 'entry_time'),
+        db.Index('ix_bus_entries_plate_key_entry_time', 'plate_key', 'entry_time'),
+    )
     
     id = db.Column(db.String(36), primary_key=True, default=lambda: str(uuid.uuid4()))
     bus_number = db.Column(db.String(50), nullable=False)
+    plate_key = db.Column(db.String(50))  # normalized vehicle number for exact-match lookups
     driver_name = db.Column(db.String(100))
     driver_phone = db.Column(db.String(20))
     entry_time = db.Column(db.DateTime, default=datetime.utcnow)
@@ -82,11 +110,54 @@ class BusEntry(db.Model):
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
+    @db.validates('bus_number')
+    def _set_plate_key(self, key, bus_number):
+        self.plate_key = normalize_plate(bus_number)
+        return bus_number
+    
     def __repr__(self):
         return f'<BusEntry {self.bus_number}>'
 
+class ExpectedVisitor(db.Model):
+    __tablename__ = 'expected_visitors'
+    __table_args__ = (
+        db.Index('ix_expected_visitors_expected_date_visitor_id', 'expected_date', 'visitor_id'),
+        db.Index('ix_expected_visitors_phone_key', 'phone_key'),
+        db.Index('ix_expected_visitors_visitor_id', 'visitor_id'),
+    )
+    
+    id = db.Column(db.String(36), primary_key=True, default=lambda: str(uuid.uuid4()))
+    name = db.Column(db.String(100), nullable=False)
+    phone = db.Column(db.String(20), nullable=False)
+    phone_key = db.Column(db.String(20))  # normalized phone for exact-match lookups
+    email = db.Column(db.String(120))
+    purpose = db.Column(db.Text, nullable=False)
+    authority_id = db.Column(db.String(36), db.ForeignKey('authorities.id'))
+    expected_date = db.Column(db.Date, nullable=False)
+    visitor_id = db.Column(db.String(36), db.ForeignKey('visitors.id'))  # set on check-in
+    created_by = db.Column(db.String(100))
+    notes = db.Column(db.Text)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    
+    # Relationships
+    authority = db.relationship('Authority')
+    
+    @db.validates('phone')
+    def _set_phone_key(self, key, phone):
+        self.phone_key = normalize_phone(phone)
+        return phone
+    
+    def __repr__(self):
+        return f'<ExpectedVisitor {self.name} {self.expected_date}>'
+
 class Notification(db.Model):
     __tablename__ = 'notifications'
+    __table_args__ = (
+        db.Index('ix_notifications_is_read_created_at', 'is_read', 'created_at'),
+        db.Index('ix_notifications_created_at', 'created_at'),
+        db.Index('ix_notifications_visitor_id', 'visitor_id'),
+        db.Index('ix_notifications_authority_id_is_read_created_at', 'authority_id', 'is_read', 'created_at'),
+    )
     
     id = db.Column(db.String(36), primary_key=True, default=lambda: str(uuid.uuid4()))
     visitor_id = db.Column(db.String(36), db.ForeignKey('visitors.id'))
@@ -95,8 +166,129 @@ class Notification(db.Model):
     title = db.Column(db.String(255), nullable=False)
     message = db.Column(db.Text, nullable=False)
     is_read = db.Column(db.Boolean, default=False)
+    delivery_status = db.Column(db.String(20), default='none')  # none, pending, delivered, failed
+    delivered_at = db.Column(db.DateTime)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    
+    deliveries = db.relationship('NotificationDelivery', backref='notification', lazy=True)
+    
+    def __repr__(self):
+        return f'<Notification {self.title}>'
+
+class NotificationEvent(db.Model):
+    __tablename__ = 'notification_events'
+    __table_args__ = (
+        db.Index('ix_notification_events_status_id', 'status', 'id'),
+        db.Index('ix_notification_events_visitor_id', 'visitor_id'),
+    )
+    
+    id = db.Column(db.Integer, primary_key=True, autoincrement=True)
+    type = db.Column(db.String(50), nullable=False)  # visitor_request
+    visitor_id = db.Column(db.String(36), db.ForeignKey('visitors.id'))
+    authority_id = db.Column(db.String(36), db.ForeignKey('authorities.id'))
+    payload = db.Column(db.Text, nullable=False)  # JSON details used in the message text
+    status = db.Column(db.String(20), nullable=False, default='pending')  # pending, expanded
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    
+    def __repr__(self):
+        return f'<NotificationEvent {self.id} {self.type}:{self.status}>'
+
+class NotificationDelivery(db.Model):
+    __tablename__ = 'notification_deliveries'
+    __table_args__ = (
+        db.Index('ix_notification_deliveries_channel_status_next_attempt_at', 'channel', 'status', 'next_attempt_at'),
+        db.Index('ix_notification_deliveries_notification_id', 'notification_id'),
+    )
+    
+    id = db.Column(db.Integer, primary_key=True, autoincrement=True)
+    notification_id = db.Column(db.String(36), db.ForeignKey('notifications.id'), nullable=False)
+    channel = db.Column(db.String(20), nullable=False)  # email, sms, webhook, fake
+    recipient = db.Column(db.String(120), nullable=False)
+    status = db.Column(db.String(20), nullable=False, default='pending')  # pending, sending, sent, failed
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    next_attempt_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    sent_at = db.Column(db.DateTime)
+    last_error = db.Column(db.Text)
+    
+    def __repr__(self):
+        return f'<NotificationDelivery {self.id} {self.channel}:{self.status}>'
+
+class DailyCounter(db.Model):
+    __tablename__ = 'daily_counters'
+    
+    day = db.Column(db.Date, primary_key=True)
+    kind = db.Column(db.String(20), primary_key=True)  # visitor, vehicle, vehicle_status
+    key = db.Column(db.String(20), primary_key=True)  # visitor status, vehicle type or vehicle status
+    count = db.Column(db.Integer, nullable=False, default=0)
+    
+    def __repr__(self):
+        return f'<DailyCounter {self.day} {self.kind}:{self.key}={self.count}>'
+
+class PhotoBlob(db.Model):
+    __tablename__ = 'photo_blobs'
+    
+    key = db.Column(db.String(80), primary_key=True)  # sha256 hex digest plus extension
+    ref_count = db.Column(db.Integer, nullable=False, default=0)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
     def __repr__(self):
-        return f'<Notification {self.title}>'
\ No newline at end of file
+        return f'<PhotoBlob {self.key} refs={self.ref_count}>'
+
+class TableVersion(db.Model):
+    __tablename__ = 'table_versions'
+    
+    table_name = db.Column(db.String(64), primary_key=True)
+    version = db.Column(db.Integer, nullable=False, default=0)
+    
+    def __repr__(self):
+        return f'<TableVersion {self.table_name}={self.version}>'
+
+class SheetsOutbox(db.Model):
+    __tablename__ = 'sheets_outbox'
+    __table_args__ = (
+        db.Index('ix_sheets_outbox_next_attempt_at', 'next_attempt_at'),
+    )
+    
+    id = db.Column(db.Integer, primary_key=True, autoincrement=True)
+    sheet = db.Column(db.String(20), nullable=False)  # visitors, vehicles
+    action = db.Column(db.String(20), nullable=False)  # entry, exit, approved, rejected
+    payload = db.Column(db.Text, nullable=False)  # JSON snapshot of the record
+    status = db.Column(db.String(20), nullable=False, default='pending')  # pending, sending, dead
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    next_attempt_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    last_error = db.Column(db.Text)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    
+    def __repr__(self):
+        return f'<SheetsOutbox {self.id} {self.sheet}:{self.action}>'
+
+class InboxCounter(db.Model):
+    __tablename__ = 'inbox_counters'
+    
+    authority_id = db.Column(db.String(36), db.ForeignKey('authorities.id'), primary_key=True)
+    unread = db.Column(db.Integer, nullable=False, default=0)
+    
+    def __repr__(self):
+        return f'<InboxCounter {self.authority_id} unread={self.unread}>'
+
+# Closed gate log records older than RETENTION_DAYS are moved into these
+# archive tables by services/retention.py. Each mirrors its hot table's
+# columns, without foreign keys since the rows they point at may be archived
+# as well, plus archived_at. A migration adding a column to a hot table must
+# add it to the archive table too.
+def _archive_table(model, time_column):
+    table = model.__table__
+    return db.Table(
+        f'{table.name}_archive', db.metadata,
+        *[db.Column(column.name, column.type, primary_key=column.primary_key) for column in table.columns],
+        db.Column('archived_at', db.DateTime, nullable=False),
+        db.Index(f'ix_{table.name}_archive_{time_column}', time_column)
+    )
+
+ARCHIVE_TABLES = {
+    Visitor: _archive_table(Visitor, 'entry_time'),
+    BusEntry: _archive_table(BusEntry, 'entry_time'),
+    ExpectedVisitor: _archive_table(ExpectedVisitor, 'expected_date'),
+    Notification: _archive_table(Notification, 'created_at')
+}
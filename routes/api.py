@@ -1,34 +1,49 @@
-from flask import Blueprint, request, jsonify, session
+from flask import Blueprint, request, jsonify
 from datetime import datetime
-from models import db, Visitor, BusEntry, Authority, Notification
+from sqlalchemy.orm import joinedload
+from models import db, Visitor, BusEntry, Notification
+from services.auth import api_login_required, get_current_user
+from services.query_budget import query_budget
+from services.response_cache import cached_response
+from services.events import queue_event
+from services.pagination import keyset_paginate, page_size, cached_count
+from services.authorities import get_directory
+from services.inbox import inbox_query, unread_count, mark_read, can_read
+from services.search import search_visitors, search_vehicles, visitor_search_filter, vehicle_search_filter
+from utils import normalize_phone, normalize_plate
 
 api_bp = Blueprint('api', __name__, url_prefix='/api')
 
-def api_login_required(f):
-    def decorated_function(*args, **kwargs):
-        if 'user_id' not in session:
-            return jsonify({'error': 'Authentication required'}), 401
-        return f(*args, **kwargs)
-    decorated_function.__name__ = f.__name__
-    return decorated_function
-
 @api_bp.route('/visitors', methods=['GET'])
 @api_login_required
+@cached_response('visitors', 'authorities')
+@query_budget(3)
 def get_visitors():
-    page = request.args.get('page', 1, type=int)
-    per_page = request.args.get('per_page', 20, type=int)
+    page = request.args.get('page', type=int)
+    per_page = page_size(request.args.get('per_page', 20, type=int))
     status = request.args.get('status')
+    search = request.args.get('search', '')
     
-    query = Visitor.query
+    query = Visitor.query.options(joinedload(Visitor.authority))
     
     if status:
         query = query.filter_by(status=status)
     
-    visitors = query.order_by(Visitor.entry_time.desc()).paginate(
-        page=page, per_page=per_page, error_out=False
-    )
+    if search:
+        query = query.filter(visitor_search_filter(search))
     
-    return jsonify({
+    if page:
+        # Legacy offset pagination
+        visitors = query.order_by(Visitor.entry_time.desc()).paginate(
+            page=page, per_page=per_page, error_out=False
+        )
+    else:
+        try:
+            visitors = keyset_paginate(query, Visitor, after=request.args.get('cursor'), per_page=per_page)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+    
+    result = {
         'visitors': [{
             'id': v.id,
             'name': v.name,
@@ -39,29 +54,48 @@ def get_visitors():
             'entry_time': v.entry_time.isoformat() if v.entry_time else None,
             'exit_time': v.exit_time.isoformat() if v.exit_time else None,
             'authority_name': v.authority.name if v.authority else None
-        } for v in visitors.items],
-        'total': visitors.total,
-        'pages': visitors.pages,
-        'current_page': visitors.page
-    })
+        } for v in visitors.items]
+    }
+    
+    if page:
+        result.update(total=visitors.total, pages=visitors.pages, current_page=visitors.page)
+    else:
+        result.update(next_cursor=visitors.next_cursor, has_more=visitors.has_next)
+        if request.args.get('include_total', 'false').lower() == 'true':
+            result['total'] = cached_count(query)
+    
+    return jsonify(result)
 
 @api_bp.route('/vehicles', methods=['GET'])
 @api_login_required
+@cached_response('bus_entries')
+@query_budget(3)
 def get_vehicles():
-    page = request.args.get('page', 1, type=int)
-    per_page = request.args.get('per_page', 20, type=int)
+    page = request.args.get('page', type=int)
+    per_page = page_size(request.args.get('per_page', 20, type=int))
     vehicle_type = request.args.get('type')
+    search = request.args.get('search', '')
     
     query = BusEntry.query
     
     if vehicle_type:
         query = query.filter_by(vehicle_type=vehicle_type)
     
-    vehicles = query.order_by(BusEntry.entry_time.desc()).paginate(
-        page=page, per_page=per_page, error_out=False
-    )
+    if search:
+        query = query.filter(vehicle_search_filter(search))
     
-    return jsonify({
+    if page:
+        # Legacy offset pagination
+        vehicles = query.order_by(BusEntry.entry_time.desc()).paginate(
+            page=page, per_page=per_page, error_out=False
+        )
+    else:
+        try:
+            vehicles = keyset_paginate(query, BusEntry, after=request.args.get('cursor'), per_page=per_page)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+    
+    result = {
         'vehicles': [{
             'id': v.id,
             'bus_number': v.bus_number,
@@ -73,46 +107,113 @@ def get_vehicles():
             'exit_time': v.exit_time.isoformat() if v.exit_time else None,
             'route': v.route,
             'passenger_count': v.passenger_count
-        } for v in vehicles.items],
-        'total': vehicles.total,
-        'pages': vehicles.pages,
-        'current_page': vehicles.page
-    })
+        } for v in vehicles.items]
+    }
+    
+    if page:
+        result.update(total=vehicles.total, pages=vehicles.pages, current_page=vehicles.page)
+    else:
+        result.update(next_cursor=vehicles.next_cursor, has_more=vehicles.has_next)
+        if request.args.get('include_total', 'false').lower() == 'true':
+            result['total'] = cached_count(query)
+    
+    return jsonify(result)
 
 @api_bp.route('/authorities', methods=['GET'])
 @api_login_required
 def get_authorities():
-    authorities = Authority.query.filter_by(is_active=True).order_by(Authority.name).all()
+    directory = get_directory()
+    
+    response = jsonify({
+        'authorities': [a._asdict() for a in directory.authorities]
+    })
+    # Clients revalidate every time and get a 304 while the directory is unchanged
+    response.set_etag(directory.etag)
+    response.cache_control.private = True
+    response.cache_control.no_cache = True
+    return response.make_conditional(request)
+
+@api_bp.route('/recognize/visitor', methods=['GET'])
+@api_login_required
+@cached_response('visitors')
+def recognize_visitor():
+    """Look up a returning visitor by phone number to prefill the entry form"""
+    phone_key = normalize_phone(request.args.get('phone', ''))
+    if not phone_key:
+        return jsonify({'error': 'Phone number is required'}), 400
+    
+    last_visit = Visitor.query.filter_by(phone_key=phone_key).order_by(Visitor.entry_time.desc()).first()
+    if not last_visit:
+        return jsonify({'found': False})
     
     return jsonify({
-        'authorities': [{
-            'id': a.id,
-            'name': a.name,
-            'designation': a.designation,
-            'department': a.department,
-            'email': a.email,
-            'phone': a.phone
-        } for a in authorities]
+        'found': True,
+        'visitor': {
+            'name': last_visit.name,
+            'phone': last_visit.phone,
+            'email': last_visit.email,
+            'purpose': last_visit.purpose,
+            'authority_id': last_visit.authority_id,
+            'last_visit': last_visit.entry_time.isoformat() if last_visit.entry_time else None
+        },
+        'visit_count': Visitor.query.filter_by(phone_key=phone_key).count()
     })
 
-@api_bp.route('/notifications', methods=['GET'])
+@api_bp.route('/recognize/vehicle', methods=['GET'])
 @api_login_required
-def get_notifications():
-    user_role = session.get('role')
+@cached_response('bus_entries')
+def recognize_vehicle():
+    """Look up a returning vehicle by number to prefill the entry form"""
+    plate_key = normalize_plate(request.args.get('number', ''))
+    if not plate_key:
+        return jsonify({'error': 'Vehicle number is required'}), 400
     
-    if user_role != 'admin':
-        return jsonify({'error': 'Access denied'}), 403
+    last_visit = BusEntry.query.filter_by(plate_key=plate_key).order_by(BusEntry.entry_time.desc()).first()
+    if not last_visit:
+        return jsonify({'found': False})
     
+    return jsonify({
+        'found': True,
+        'vehicle': {
+            'bus_number': last_visit.bus_number,
+            'vehicle_type': last_visit.vehicle_type,
+            'driver_name': last_visit.driver_name,
+            'driver_phone': last_visit.driver_phone,
+            'route': last_visit.route,
+            'status': last_visit.status,
+            'last_visit': last_visit.entry_time.isoformat() if last_visit.entry_time else None
+        },
+        'visit_count': BusEntry.query.filter_by(plate_key=plate_key).count()
+    })
+
+@api_bp.route('/notifications', methods=['GET'])
+@api_login_required
+@cached_response('notifications', 'visitors', 'authorities', 'inbox_counters', per_user=True)
+@query_budget(2)
+def get_notifications():
+    user = get_current_user()
     unread_only = request.args.get('unread_only', 'false').lower() == 'true'
     
-    query = Notification.query
+    query = inbox_query(user, unread_only=unread_only)
+    if query is None:
+        return jsonify({'error': 'Access denied'}), 403
     
-    if unread_only:
-        query = query.filter_by(is_read=False)
+    query = query.options(
+        joinedload(Notification.visitor),
+        joinedload(Notification.authority)
+    )
     
-    notifications = query.order_by(Notification.created_at.desc()).limit(50).all()
+    try:
+        notifications = keyset_paginate(query, Notification, after=request.args.get('cursor'),
+                                        per_page=page_size(request.args.get('per_page', 50, type=int), default=50),
+                                        time_attr='created_at')
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     
     return jsonify({
+        'unread': unread_count(user),
+        'next_cursor': notifications.next_cursor,
+        'has_more': notifications.has_next,
         'notifications': [{
             'id': n.id,
             'title': n.title,
@@ -122,20 +223,26 @@ def get_notifications():
             'created_at': n.created_at.isoformat(),
             'visitor_name': n.visitor.name if n.visitor else None,
             'authority_name': n.authority.name if n.authority else None
-        } for n in notifications]
+        } for n in notifications.items]
     })
 
 @api_bp.route('/notifications/<notification_id>/mark-read', methods=['POST'])
 @api_login_required
 def mark_notification_read(notification_id):
     notification = Notification.query.get_or_404(notification_id)
-    notification.is_read = True
-    db.session.commit()
+    if not can_read(get_current_user(), notification):
+        return jsonify({'error': 'Access denied'}), 403
+    
+    if mark_read(notification):
+        queue_event(db.session, 'notification_read', id=notification.id)
+        db.session.commit()
     
     return jsonify({'success': True})
 
 @api_bp.route('/search', methods=['GET'])
 @api_login_required
+@cached_response('visitors', 'bus_entries')
+@query_budget(4)
 def search():
     query = request.args.get('q', '')
     search_type = request.args.get('type', 'all')  # all, visitors, vehicles
@@ -146,11 +253,7 @@ def search():
     results = {}
     
     if search_type in ['all', 'visitors']:
-        visitors = Visitor.query.filter(
-            (Visitor.name.contains(query)) |
-            (Visitor.phone.contains(query)) |
-            (Visitor.email.contains(query))
-        ).limit(10).all()
+        visitors = search_visitors(query, limit=10)
         
         results['visitors'] = [{
             'id': v.id,
@@ -162,10 +265,7 @@ def search():
         } for v in visitors]
     
     if search_type in ['all', 'vehicles']:
-        vehicles = BusEntry.query.filter(
-            (BusEntry.bus_number.contains(query)) |
-            (BusEntry.driver_name.contains(query))
-        ).limit(10).all()
+        vehicles = search_vehicles(query, limit=10)
         
         results['vehicles'] = [{
             'id': v.id,
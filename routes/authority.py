@@ -1,30 +1,21 @@
-from flask import Blueprint, render_template, request, redirect, url_for, session, flash, jsonify
-from datetime import datetime
-from models import db, Authority, Visitor, Notification, User
+from flask import Blueprint, render_template, request, redirect, url_for, flash, jsonify, abort
+from sqlalchemy.orm import joinedload
+from models import db, Authority, Notification, User
+from services.auth import login_required, admin_required, invalidate_user, get_current_user
 from werkzeug.security import generate_password_hash
+from services.approvals import decide_visitors, DECISIONS
+from services.authorities import invalidate_authorities
+from services.query_budget import query_budget
+from services.inbox import inbox_query
+from services.pagination import keyset_paginate, KeysetPage
 
 authority_bp = Blueprint('authority', __name__, url_prefix='/authority')
 
-def login_required(f):
-    def decorated_function(*args, **kwargs):
-        if 'user_id' not in session:
-            return redirect(url_for('auth.login'))
-        return f(*args, **kwargs)
-    decorated_function.__name__ = f.__name__
-    return decorated_function
-
-def admin_required(f):
-    def decorated_function(*args, **kwargs):
-        if 'user_id' not in session or session.get('role') != 'admin':
-            flash('Access denied. Admin privileges required.', 'error')
-            return redirect(url_for('index'))
-        return f(*args, **kwargs)
-    decorated_function.__name__ = f.__name__
-    return decorated_function
-
-@authority_bp.route('/list')
+INBOX_PAGE_SIZE = 50
+
+@authority_bp.route('/list', endpoint='list')
 @login_required
-def list():
+def list_authorities():
     authorities = Authority.query.order_by(Authority.name).all()
     return render_template('authority/list.html', authorities=authorities)
 
@@ -75,14 +66,17 @@ def add():
                 user_role = 'admin'
             
             # Create User
+            db.session.flush()
             user = User(
                 username=email,
                 password=generate_password_hash(password),
-                role=user_role
+                role=user_role,
+                authority_id=authority.id
             )
             db.session.add(user)
             
             db.session.commit()
+            invalidate_authorities()
             
             flash('Authority and user account created successfully!', 'success')
             return redirect(url_for('authority.list'))
@@ -108,7 +102,8 @@ def edit(authority_id):
             authority.is_active = 'is_active' in request.form
 
             # Update user role as well
-            user = User.query.filter_by(username=authority.email).first()
+            user = User.query.filter_by(authority_id=authority.id).first() or \
+                User.query.filter_by(username=authority.email).first()
             if user:
                 user_role = 'user'  # Default role
                 if authority.designation in ['faculty staff', 'hod', 'principal']:
@@ -116,8 +111,13 @@ def edit(authority_id):
                 elif authority.designation == 'admin':
                     user_role = 'admin'
                 user.role = user_role
+                user.authority_id = authority.id
             
             db.session.commit()
+            invalidate_authorities()
+            
+            if user:
+                invalidate_user(user.id)
             
             flash('Authority updated successfully!', 'success')
             return redirect(url_for('authority.list'))
@@ -127,39 +127,39 @@ def edit(authority_id):
     
     return render_template('authority/edit.html', authority=authority)
 
+def _inbox_page(unread_only=False, options=()):
+    """One page of the current user's inbox, newest first; empty for users without one"""
+    query = inbox_query(get_current_user(), unread_only=unread_only)
+    if query is None:
+        return KeysetPage([])
+    
+    query = query.options(*options)
+    try:
+        return keyset_paginate(query, Notification, after=request.args.get('cursor'), before=request.args.get('before'),
+                               per_page=INBOX_PAGE_SIZE, time_attr='created_at')
+    except ValueError:
+        return keyset_paginate(query, Notification, per_page=INBOX_PAGE_SIZE, time_attr='created_at')
+
 @authority_bp.route('/approvals')
 @login_required
+@query_budget(2)
 def approvals():
-    # Get pending notifications for this authority or admin
-    user_role = session.get('role')
+    # Pending requests in this authority's inbox, or every inbox for admins
+    page = _inbox_page(unread_only=True, options=[joinedload(Notification.visitor)])
     
-    if user_role == 'admin':
-        # Admin can see all notifications
-        notifications = Notification.query.filter_by(is_read=False).order_by(Notification.created_at.desc()).all()
-    else:
-        # Regular users don't have authority access
-        notifications = []
-    
-    return render_template('authority/approvals.html', notifications=notifications)
+    return render_template('authority/approvals.html', notifications=page.items, page=page)
 
 @authority_bp.route('/approve/<visitor_id>', methods=['POST'])
 @login_required
 def approve_visitor(visitor_id):
-    visitor = Visitor.query.get_or_404(visitor_id)
-    
-    if visitor.status == 'pending':
-        visitor.status = 'approved'
-        visitor.authority_permission_granted = True
-        visitor.permission_granted_at = datetime.utcnow()
-        
-        # Mark related notifications as read
-        notifications = Notification.query.filter_by(visitor_id=visitor_id).all()
-        for notification in notifications:
-            notification.is_read = True
-        
-        db.session.commit()
-        
-        flash(f'Visitor {visitor.name} has been approved.', 'success')
+    result = decide_visitors([visitor_id], 'approve', get_current_user())[0]
+    
+    if result['success']:
+        flash(f"Visitor {result['name']} has been approved.", 'success')
+    elif result.get('forbidden'):
+        abort(403)
+    elif 'name' not in result:
+        abort(404)
     else:
         flash('Visitor request is no longer pending.', 'error')
     
@@ -168,32 +168,60 @@ def approve_visitor(visitor_id):
 @authority_bp.route('/reject/<visitor_id>', methods=['POST'])
 @login_required
 def reject_visitor(visitor_id):
-    visitor = Visitor.query.get_or_404(visitor_id)
-    
-    if visitor.status == 'pending':
-        visitor.status = 'rejected'
-        
-        # Mark related notifications as read
-        notifications = Notification.query.filter_by(visitor_id=visitor_id).all()
-        for notification in notifications:
-            notification.is_read = True
-        
-        db.session.commit()
-        
-        flash(f'Visitor {visitor.name} has been rejected.', 'success')
+    result = decide_visitors([visitor_id], 'reject', get_current_user())[0]
+    
+    if result['success']:
+        flash(f"Visitor {result['name']} has been rejected.", 'success')
+    elif result.get('forbidden'):
+        abort(403)
+    elif 'name' not in result:
+        abort(404)
     else:
         flash('Visitor request is no longer pending.', 'error')
     
     return redirect(url_for('authority.approvals'))
 
-@authority_bp.route('/notifications')
+@authority_bp.route('/approvals/bulk', methods=['POST'])
 @login_required
-def notifications():
-    user_role = session.get('role')
+def bulk_decide():
+    """Approve or reject many pending visitors at once.
     
-    if user_role == 'admin':
-        notifications = Notification.query.order_by(Notification.created_at.desc()).all()
+    Accepts a form (``action`` plus repeated ``visitor_ids``) from the
+    approvals page or JSON ``{"action": ..., "visitor_ids": [...]}``, and
+    answers JSON requests with a per-visitor result list.
+    """
+    if request.is_json:
+        payload = request.get_json(silent=True) or {}
+        action = payload.get('action')
+        visitor_ids = payload.get('visitor_ids') or []
     else:
-        notifications = []
+        action = request.form.get('action')
+        visitor_ids = request.form.getlist('visitor_ids')
+    
+    if action not in DECISIONS or not isinstance(visitor_ids, list):
+        if request.is_json:
+            return jsonify({'error': 'action must be approve or reject and visitor_ids a list'}), 400
+        flash('Select visitors and choose approve or reject.', 'error')
+        return redirect(url_for('authority.approvals'))
+    
+    results = decide_visitors([str(i) for i in visitor_ids], action, get_current_user())
+    
+    if request.is_json:
+        return jsonify({'results': results})
+    
+    done = sum(1 for r in results if r['success'])
+    skipped = [r for r in results if not r['success']]
+    if done:
+        flash(f"{done} visitor(s) {DECISIONS[action]}.", 'success')
+    if skipped:
+        flash('Skipped: ' + ', '.join(f"{r.get('name', r['id'])} ({r['error']})" for r in skipped), 'warning')
+    
+    return redirect(url_for('authority.approvals'))
+
+@authority_bp.route('/notifications')
+@login_required
+@query_budget(2)
+def notifications():
+    page = _inbox_page(options=[joinedload(Notification.visitor), joinedload(Notification.authority)])
     
-    return render_template('authority/notifications.html', notifications=notifications)
+    return render_template('authority/notifications.html', notifications=page.items, page=page)
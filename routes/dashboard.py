@@ -1,87 +1,41 @@
-from flask import Blueprint, render_template, request, session, jsonify, redirect, url_for
+from flask import Blueprint, render_template, request, jsonify, Response, stream_with_context
 from datetime import datetime, timedelta
-from sqlalchemy import func
+from sqlalchemy.orm import joinedload
 from models import db, Visitor, BusEntry, Authority, Notification
+from services.auth import login_required
+from services import counters
+from services.stats import get_dashboard_summary
+from services.query_budget import query_budget
+from services.response_cache import cached_response
+from services.events import stream
+from services import exports
+from services import reports as report_summaries
+from services.pagination import keyset_paginate
+from services.retention import history
 
 dashboard_bp = Blueprint('dashboard', __name__, url_prefix='/dashboard')
 
-def login_required(f):
-    def decorated_function(*args, **kwargs):
-        if 'user_id' not in session:
-            return redirect(url_for('auth.login'))
-        return f(*args, **kwargs)
-    decorated_function.__name__ = f.__name__
-    return decorated_function
+REPORT_PAGE_SIZE = 50
 
 @dashboard_bp.route('/')
 @login_required
 def index():
-    # Get statistics for today
-    today = datetime.now().date()
-    
-    # Visitor statistics
-    today_visitors = Visitor.query.filter(
-        func.date(Visitor.entry_time) == today
-    ).count()
-    
-    pending_visitors = Visitor.query.filter_by(status='pending').count()
-    
-    active_visitors = Visitor.query.filter(
-        Visitor.status.in_(['approved', 'pending']),
-        Visitor.exit_time.is_(None)
-    ).count()
-    
-    # Vehicle statistics
-    today_vehicles = BusEntry.query.filter(
-        func.date(BusEntry.entry_time) == today
-    ).count()
-    
-    active_vehicles = BusEntry.query.filter_by(status='entered').count()
+    stats, week_data = get_dashboard_summary()
     
     # Recent activity
     recent_visitors = Visitor.query.order_by(Visitor.entry_time.desc()).limit(5).all()
     recent_vehicles = BusEntry.query.order_by(BusEntry.entry_time.desc()).limit(5).all()
     
-    # Get weekly data for chart
-    week_data = []
-    for i in range(7):
-        date = today - timedelta(days=i)
-        visitors_count = Visitor.query.filter(
-            func.date(Visitor.entry_time) == date
-        ).count()
-        vehicles_count = BusEntry.query.filter(
-            func.date(BusEntry.entry_time) == date
-        ).count()
-        
-        week_data.append({
-            'date': date.strftime('%Y-%m-%d'),
-            'visitors': visitors_count,
-            'vehicles': vehicles_count
-        })
-    
-    week_data.reverse()  # Show chronological order
-    
-    stats = {
-        'today_visitors': today_visitors,
-        'pending_visitors': pending_visitors,
-        'active_visitors': active_visitors,
-        'today_vehicles': today_vehicles,
-        'active_vehicles': active_vehicles
-    }
-    
     return render_template('dashboard/index.html', 
                          stats=stats, 
                          recent_visitors=recent_visitors,
                          recent_vehicles=recent_vehicles,
                          week_data=week_data)
 
-@dashboard_bp.route('/reports')
-@login_required
-def reports():
-    # Get filter parameters
+def _report_range():
+    """Return the report date filters as strings and as a [start, end) datetime range"""
     start_date = request.args.get('start_date')
     end_date = request.args.get('end_date')
-    report_type = request.args.get('type', 'visitors')
     
     # Set default date range (last 30 days)
     if not start_date:
@@ -93,60 +47,97 @@ def reports():
     start_dt = datetime.strptime(start_date, '%Y-%m-%d')
     end_dt = datetime.strptime(end_date, '%Y-%m-%d') + timedelta(days=1)
     
+    return start_date, end_date, start_dt, end_dt
+
+@dashboard_bp.route('/reports')
+@login_required
+@query_budget(10)
+def reports():
+    report_type = request.args.get('type', 'visitors')
+    start_date, end_date, start_dt, end_dt = _report_range()
+    
+    cursor = request.args.get('cursor')
+    before = request.args.get('before')
+    
     if report_type == 'visitors':
-        # Visitor reports
-        visitors = Visitor.query.filter(
-            Visitor.entry_time.between(start_dt, end_dt)
-        ).order_by(Visitor.entry_time.desc()).all()
+        # Visitor reports, including archived visitors
+        visitor_log = history(Visitor, start_dt, end_dt)
+        query = db.session.query(visitor_log).options(joinedload(visitor_log.authority)).filter(
+            visitor_log.entry_time >= start_dt,
+            visitor_log.entry_time < end_dt
+        )
+        try:
+            visitors = keyset_paginate(query, visitor_log, after=cursor, before=before, per_page=REPORT_PAGE_SIZE)
+        except ValueError:
+            visitors = keyset_paginate(query, visitor_log, per_page=REPORT_PAGE_SIZE)
         
         # Status breakdown
-        status_counts = db.session.query(
-            Visitor.status, func.count(Visitor.id)
-        ).filter(
-            Visitor.entry_time.between(start_dt, end_dt)
-        ).group_by(Visitor.status).all()
+        status_counts = counters.counts_by_key(counters.VISITOR, start_dt.date(), end_dt.date() - timedelta(days=1))
         
         return render_template('dashboard/visitor_reports.html',
                              visitors=visitors,
+                             total=sum(count for _, count in status_counts),
                              status_counts=status_counts,
+                             summary=report_summaries.visitor_summary(start_dt, end_dt),
                              start_date=start_date,
                              end_date=end_date)
     
     else:
-        # Vehicle/Bus reports
-        vehicles = BusEntry.query.filter(
-            BusEntry.entry_time.between(start_dt, end_dt)
-        ).order_by(BusEntry.entry_time.desc()).all()
+        # Vehicle/Bus reports, including archived entries
+        vehicle_log = history(BusEntry, start_dt, end_dt)
+        query = db.session.query(vehicle_log).filter(
+            vehicle_log.entry_time >= start_dt,
+            vehicle_log.entry_time < end_dt
+        )
+        try:
+            vehicles = keyset_paginate(query, vehicle_log, after=cursor, before=before, per_page=REPORT_PAGE_SIZE)
+        except ValueError:
+            vehicles = keyset_paginate(query, vehicle_log, per_page=REPORT_PAGE_SIZE)
         
         # Type breakdown
-        type_counts = db.session.query(
-            BusEntry.vehicle_type, func.count(BusEntry.id)
-        ).filter(
-            BusEntry.entry_time.between(start_dt, end_dt)
-        ).group_by(BusEntry.vehicle_type).all()
+        type_counts = counters.counts_by_key(counters.VEHICLE, start_dt.date(), end_dt.date() - timedelta(days=1))
         
         return render_template('dashboard/vehicle_reports.html',
                              vehicles=vehicles,
+                             total=sum(count for _, count in type_counts),
                              type_counts=type_counts,
+                             summary=report_summaries.vehicle_summary(start_dt, end_dt),
                              start_date=start_date,
                              end_date=end_date)
 
+@dashboard_bp.route('/reports/export')
+@login_required
+def export_report():
+    """Stream the visitor or vehicle report for a date range as CSV"""
+    report_type = request.args.get('type', 'visitors')
+    start_date, end_date, start_dt, end_dt = _report_range()
+    
+    if report_type == 'visitors':
+        body = exports.stream_csv(exports.VISITOR_HEADER, exports.visitor_rows(start_dt, end_dt))
+    else:
+        report_type = 'vehicles'
+        body = exports.stream_csv(exports.VEHICLE_HEADER, exports.vehicle_rows(start_dt, end_dt))
+    
+    filename = f'{report_type}_report_{start_date}_to_{end_date}.csv'
+    return Response(stream_with_context(body), mimetype='text/csv', headers={
+        'Content-Disposition': f'attachment; filename="{filename}"'
+    })
+
 @dashboard_bp.route('/api/stats')
 @login_required
+@cached_response('daily_counters')
 def api_stats():
     """API endpoint for real-time dashboard stats"""
-    today = datetime.now().date()
+    stats, _ = get_dashboard_summary(days=1)
+    stats['last_updated'] = datetime.now().isoformat()
     
-    stats = {
-        'today_visitors': Visitor.query.filter(func.date(Visitor.entry_time) == today).count(),
-        'pending_visitors': Visitor.query.filter_by(status='pending').count(),
-        'active_visitors': Visitor.query.filter(
-            Visitor.status.in_(['approved', 'pending']),
-            Visitor.exit_time.is_(None)
-        ).count(),
-        'today_vehicles': BusEntry.query.filter(func.date(BusEntry.entry_time) == today).count(),
-        'active_vehicles': BusEntry.query.filter_by(status='entered').count(),
-        'last_updated': datetime.now().isoformat()
-    }
-    
-    return jsonify(stats)
\ No newline at end of file
+    return jsonify(stats)
+
+@dashboard_bp.route('/api/stream')
+@login_required
+def api_stream():
+    """Server-Sent Events stream of gate activity for live dashboards"""
+    return Response(stream(), mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no'
+    })
\ No newline at end of file
@@ -0,0 +1,23 @@
+import hmac
+from flask import Blueprint, Response, request, current_app, abort
+from services.auth import get_current_user
+from services.instrumentation import metrics
+
+metrics_bp = Blueprint('metrics', __name__)
+
+def _allowed():
+    """Scrapers present METRICS_TOKEN as a bearer token; signed-in admins need none"""
+    token = current_app.config['METRICS_TOKEN']
+    presented = request.headers.get('Authorization', '')
+    if token and presented.startswith('Bearer '):
+        return hmac.compare_digest(presented.removeprefix('Bearer ').encode(), token.encode())
+    user = get_current_user()
+    return user is not None and user.role == 'admin'
+
+@metrics_bp.route('/metrics')
+def export_metrics():
+    if not current_app.config['METRICS_ENABLED']:
+        abort(404)
+    if not _allowed():
+        abort(403)
+    return Response(metrics.render(), mimetype='text/plain; version=0.0.4; charset=utf-8')
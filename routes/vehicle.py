@@ -1,17 +1,16 @@
 from flask import Blueprint, render_template, request, redirect, url_for, session, flash
 from datetime import datetime
 from models import db, BusEntry
+from services.auth import login_required
+from services import counters
+from services.bulk import exit_vehicles
+from services.events import queue_event
+from services.sheets import queue_sheet_row, vehicle_row
+from services.pagination import keyset_paginate
+from services.search import vehicle_search_filter
 
 vehicle_bp = Blueprint('vehicle', __name__, url_prefix='/vehicle')
 
-def login_required(f):
-    def decorated_function(*args, **kwargs):
-        if 'user_id' not in session:
-            return redirect(url_for('auth.login'))
-        return f(*args, **kwargs)
-    decorated_function.__name__ = f.__name__
-    return decorated_function
-
 @vehicle_bp.route('/entry', methods=['GET', 'POST'])
 @login_required
 def entry():
@@ -39,12 +38,17 @@ def entry():
             )
             
             db.session.add(vehicle_entry)
+            counters.record_vehicle_entry(vehicle_entry)
+            db.session.flush()
+            queue_event(db.session, 'vehicle_entry', id=vehicle_entry.id, bus_number=vehicle_number, vehicle_type=vehicle_type)
+            queue_sheet_row('vehicles', 'entry', vehicle_row(vehicle_entry))
             db.session.commit()
             
             flash(f'{vehicle_type.title()} entry registered successfully!', 'success')
             return redirect(url_for('vehicle.entry'))
             
         except Exception as e:
+            db.session.rollback()
             flash(f'Error registering {vehicle_type}: {str(e)}', 'error')
     
     return render_template('vehicle/entry.html')
@@ -57,8 +61,12 @@ def exit():
         vehicle = BusEntry.query.get(vehicle_id)
         
         if vehicle and vehicle.status != 'exited':
+            old_status = vehicle.status
             vehicle.exit_time = datetime.utcnow()
             vehicle.status = 'exited'
+            counters.record_vehicle_status(vehicle, old_status)
+            queue_event(db.session, 'vehicle_exit', id=vehicle.id, bus_number=vehicle.bus_number, vehicle_type=vehicle.vehicle_type)
+            queue_sheet_row('vehicles', 'exit', vehicle_row(vehicle))
             db.session.commit()
             flash(f'{vehicle.vehicle_type.title()} {vehicle.bus_number} has been marked as exited.', 'success')
         else:
@@ -74,27 +82,51 @@ def exit():
 @vehicle_bp.route('/list')
 @login_required
 def list():
-    page = request.args.get('page', 1, type=int)
+    cursor = request.args.get('cursor')
+    before = request.args.get('before')
     search = request.args.get('search', '')
     vehicle_type = request.args.get('type', '')
     
     query = BusEntry.query
     
     if search:
-        query = query.filter(
-            (BusEntry.bus_number.contains(search)) |
-            (BusEntry.driver_name.contains(search))
-        )
+        query = query.filter(vehicle_search_filter(search))
     
     if vehicle_type:
         query = query.filter(BusEntry.vehicle_type == vehicle_type)
     
-    vehicles = query.order_by(BusEntry.entry_time.desc()).paginate(
-        page=page, per_page=20, error_out=False
-    )
+    try:
+        vehicles = keyset_paginate(query, BusEntry, after=cursor, before=before, per_page=20)
+    except ValueError:
+        vehicles = keyset_paginate(query, BusEntry, per_page=20)
     
     return render_template('vehicle/list.html', vehicles=vehicles, search=search, vehicle_type=vehicle_type)
 
+@vehicle_bp.route('/bulk-exit', methods=['POST'])
+@login_required
+def bulk_exit():
+    # The route picker and the row checkboxes share one form; the button
+    # pressed decides which of them applies
+    if request.form.get('mode') == 'route':
+        vehicle_ids, route = [], request.form.get('route', '').strip()
+    else:
+        vehicle_ids, route = request.form.getlist('vehicle_ids'), ''
+    vehicle_type = request.form.get('vehicle_type', '')
+    next_page = 'vehicle.bus_exit' if vehicle_type == 'bus' else 'vehicle.exit'
+    
+    if not vehicle_ids and not route:
+        flash('Select vehicles or a route to exit.', 'error')
+        return redirect(url_for(next_page))
+    
+    exited = exit_vehicles(vehicle_ids=vehicle_ids, route=route or None, vehicle_type=vehicle_type or None)
+    
+    if exited:
+        flash(f"{len(exited)} vehicle(s) marked as exited: {', '.join(row[1] for row in exited)}", 'success')
+    else:
+        flash('No matching vehicles are still inside.', 'error')
+    
+    return redirect(url_for(next_page))
+
 # Bus-specific routes (using same underlying model but different templates)
 @vehicle_bp.route('/bus/entry', methods=['GET', 'POST'])
 @login_required
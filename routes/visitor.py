@@ -1,20 +1,24 @@
 from flask import Blueprint, render_template, request, redirect, url_for, session, flash, jsonify
 from werkzeug.utils import secure_filename
 import os
-from datetime import datetime
-from models import db, Visitor, Authority, Notification
-from utils import allowed_file, save_uploaded_file
+from datetime import datetime, date
+from sqlalchemy.orm import joinedload
+from models import db, Visitor, ExpectedVisitor
+from services.auth import login_required, admin_required
+from services.bulk import parse_expected_visitors, import_expected_visitors
+from utils import allowed_file
+from services import photo_store
+from services import counters
+from services.events import queue_event
+from services.sheets import queue_sheet_row, visitor_row
+from services.images import enqueue_visitor_photo
+from services.pagination import keyset_paginate
+from services.registration import register_visitor
+from services.authorities import active_authorities
+from services.search import visitor_search_filter
 
 visitor_bp = Blueprint('visitor', __name__, url_prefix='/visitor')
 
-def login_required(f):
-    def decorated_function(*args, **kwargs):
-        if 'user_id' not in session:
-            return redirect(url_for('auth.login'))
-        return f(*args, **kwargs)
-    decorated_function.__name__ = f.__name__
-    return decorated_function
-
 @visitor_bp.route('/entry', methods=['GET', 'POST'])
 @login_required
 def entry():
@@ -33,60 +37,23 @@ def entry():
             if 'photo' in request.files:
                 file = request.files['photo']
                 if file and file.filename and allowed_file(file.filename):
-                    photo_url = save_uploaded_file(file, 'visitors')
+                    photo_url = photo_store.save_upload(file)
                     if not photo_url:
                         flash('Failed to save photo. Please try again.', 'warning')
             
-            # Determine status based on authority selection
-            requires_permission = bool(authority_id)
-            permission_granted = not requires_permission
-            status = 'pending' if requires_permission else 'approved'
-            
-            # Create visitor record
-            visitor = Visitor(
+            visitor = register_visitor(
                 name=name,
                 phone=phone,
                 email=email,
                 purpose=purpose,
-                authority_id=authority_id if authority_id else None,
+                authority_id=authority_id,
                 photo_url=photo_url,
-                status=status,
-                authority_permission_granted=permission_granted,
-                permission_granted_at=datetime.utcnow() if permission_granted else None,
-                created_by=session.get('username', 'System'),
-                notes=notes
+                notes=notes,
+                created_by=session.get('username', 'System')
             )
             
-            db.session.add(visitor)
-            db.session.commit()
-            
-            # Create notification if authority is selected
-            if authority_id:
-                authority = Authority.query.get(authority_id)
-                if authority:
-                    notification = Notification(
-                        visitor_id=visitor.id,
-                        authority_id=authority_id,
-                        type='visitor_request',
-                        title='New Visitor Permission Request',
-                        message=f'{name} ({email}) is requesting permission to enter. Purpose: {purpose}'
-                    )
-                    db.session.add(notification)
-                    
-                    # Also notify admin if authority is not Principal
-                    if authority.designation != 'Principal':
-                        admin_authority = Authority.query.filter_by(designation='Principal').first()
-                        if admin_authority:
-                            admin_notification = Notification(
-                                visitor_id=visitor.id,
-                                authority_id=admin_authority.id,
-                                type='visitor_request',
-                                title='New Visitor Permission Request (Admin Copy)',
-                                message=f'{name} ({email}) is requesting permission to enter. Purpose: {purpose}. Assigned to: {authority.name}'
-                            )
-                            db.session.add(admin_notification)
-                    
-                    db.session.commit()
+            if photo_url:
+                enqueue_visitor_photo(visitor.id, photo_url)
             
             flash('Visitor registered successfully!', 'success')
             return redirect(url_for('visitor.entry'))
@@ -96,8 +63,7 @@ def entry():
             flash(f'Error registering visitor: {str(e)}', 'error')
     
     # Get authorities for dropdown
-    authorities = Authority.query.filter_by(is_active=True).order_by(Authority.name).all()
-    return render_template('visitor/entry.html', authorities=authorities)
+    return render_template('visitor/entry.html', authorities=active_authorities())
 
 @visitor_bp.route('/exit', methods=['GET', 'POST'])
 @login_required
@@ -107,8 +73,12 @@ def exit():
         visitor = Visitor.query.get(visitor_id)
         
         if visitor and visitor.status != 'exited':
+            old_status = visitor.status
             visitor.exit_time = datetime.utcnow()
             visitor.status = 'exited'
+            counters.record_visitor_status(visitor, old_status)
+            queue_event(db.session, 'visitor_exit', id=visitor.id, name=visitor.name)
+            queue_sheet_row('visitors', 'exit', visitor_row(visitor))
             db.session.commit()
             flash(f'Visitor {visitor.name} has been marked as exited.', 'success')
         else:
@@ -127,25 +97,23 @@ def exit():
 @visitor_bp.route('/list')
 @login_required
 def list():
-    page = request.args.get('page', 1, type=int)
+    cursor = request.args.get('cursor')
+    before = request.args.get('before')
     search = request.args.get('search', '')
     status_filter = request.args.get('status', '')
     
     query = Visitor.query
     
     if search:
-        query = query.filter(
-            (Visitor.name.contains(search)) |
-            (Visitor.phone.contains(search)) |
-            (Visitor.email.contains(search))
-        )
+        query = query.filter(visitor_search_filter(search))
     
     if status_filter:
         query = query.filter(Visitor.status == status_filter)
     
-    visitors = query.order_by(Visitor.entry_time.desc()).paginate(
-        page=page, per_page=20, error_out=False
-    )
+    try:
+        visitors = keyset_paginate(query, Visitor, after=cursor, before=before, per_page=20)
+    except ValueError:
+        visitors = keyset_paginate(query, Visitor, per_page=20)
     
     return render_template('visitor/list.html', visitors=visitors, search=search, status_filter=status_filter)
 
@@ -166,15 +134,21 @@ def upload_exit_photo():
         if 'exit_photo' in request.files:
             file = request.files['exit_photo']
             if file and allowed_file(file.filename):
-                exit_photo_url = save_uploaded_file(file, 'visitors/exit')
+                exit_photo_url = photo_store.save_upload(file)
                 
-                # Store exit photo URL in notes or create a separate field
+                if visitor.exit_photo_url:
+                    photo_store.release(visitor.exit_photo_url)
+                visitor.exit_photo_url = exit_photo_url
+                photo_store.acquire(exit_photo_url)
+                
+                # Keep the exit photo visible alongside the visitor's notes
                 if visitor.notes:
                     visitor.notes += f"\n[Exit Photo: {exit_photo_url}]"
                 else:
                     visitor.notes = f"[Exit Photo: {exit_photo_url}]"
                 
                 db.session.commit()
+                enqueue_visitor_photo(visitor.id, exit_photo_url, exit_photo=True)
                 return jsonify({'success': True, 'photo_url': exit_photo_url})
             else:
                 return jsonify({'success': False, 'error': 'Invalid file type'})
@@ -183,4 +157,75 @@ def upload_exit_photo():
             
     except Exception as e:
         db.session.rollback()
-        return jsonify({'success': False, 'error': str(e)})
\ No newline at end of file
+        return jsonify({'success': False, 'error': str(e)})
+
+@visitor_bp.route('/import', methods=['GET', 'POST'])
+@admin_required
+def import_expected():
+    if request.method == 'POST':
+        file = request.files.get('file')
+        if not file or not file.filename or not file.filename.lower().endswith('.csv'):
+            flash('Please choose a CSV file to import.', 'error')
+            return render_template('visitor/import.html', errors=[])
+        
+        # Validate the whole file before inserting anything
+        rows, errors = parse_expected_visitors(file.stream)
+        if errors:
+            flash(f'No visitors were imported: {len(errors)} row(s) need fixing.', 'error')
+            return render_template('visitor/import.html', errors=errors[:50], error_count=len(errors))
+        
+        try:
+            count = import_expected_visitors(rows, session.get('username', 'System'))
+            flash(f'{count} expected visitor(s) imported successfully!', 'success')
+            return redirect(url_for('visitor.expected'))
+        except Exception as e:
+            db.session.rollback()
+            flash(f'Error importing visitors: {str(e)}', 'error')
+    
+    return render_template('visitor/import.html', errors=[])
+
+@visitor_bp.route('/expected')
+@login_required
+def expected():
+    try:
+        day = datetime.strptime(request.args.get('date', ''), '%Y-%m-%d').date()
+    except ValueError:
+        day = date.today()
+    
+    expected_visitors = ExpectedVisitor.query.options(
+        joinedload(ExpectedVisitor.authority)
+    ).filter_by(expected_date=day).order_by(ExpectedVisitor.name).all()
+    
+    return render_template('visitor/expected.html', expected_visitors=expected_visitors, day=day)
+
+@visitor_bp.route('/expected/<expected_id>/check-in', methods=['POST'])
+@login_required
+def check_in_expected(expected_id):
+    expected = ExpectedVisitor.query.get_or_404(expected_id)
+    
+    if expected.visitor_id:
+        flash(f'{expected.name} has already checked in.', 'error')
+        return redirect(url_for('visitor.expected', date=expected.expected_date.isoformat()))
+    
+    try:
+        # Checked in like a walk-in, so the authority they are meeting still decides
+        visitor = register_visitor(
+            name=expected.name,
+            phone=expected.phone,
+            email=expected.email,
+            purpose=expected.purpose,
+            authority_id=expected.authority_id,
+            notes=expected.notes,
+            created_by=session.get('username', 'System'),
+            expected_visitor=expected
+        )
+        
+        if visitor.status == 'pending':
+            flash(f'{visitor.name} checked in and is waiting for approval.', 'success')
+        else:
+            flash(f'{visitor.name} checked in successfully!', 'success')
+    except Exception as e:
+        db.session.rollback()
+        flash(f'Error checking in visitor: {str(e)}', 'error')
+    
+    return redirect(url_for('visitor.expected', date=expected.expected_date.isoformat()))
@@ -0,0 +1,309 @@
+-- PostgreSQL schema for the Flask gate entry application, matching models.py
+-- Generated with: flask schema-sql --dialect postgresql
+-- The app upgrades the database with its own migrations on startup, so this
+-- file is only needed to provision an empty database by hand. Load existing
+-- SQLite data afterwards with: flask copy-database sqlite:///instance/gate_entry.db
+
+CREATE TABLE authorities (
+	id VARCHAR(36) NOT NULL,
+	name VARCHAR(100) NOT NULL,
+	designation VARCHAR(50) NOT NULL,
+	department VARCHAR(100),
+	phone VARCHAR(20),
+	email VARCHAR(120),
+	is_active BOOLEAN,
+	created_at TIMESTAMP WITHOUT TIME ZONE,
+	updated_at TIMESTAMP WITHOUT TIME ZONE,
+	PRIMARY KEY (id)
+);
+
+CREATE INDEX ix_authorities_designation ON authorities (designation);
+
+CREATE INDEX ix_authorities_is_active_name ON authorities (is_active, name);
+
+CREATE TABLE bus_entries (
+	id VARCHAR(36) NOT NULL,
+	bus_number VARCHAR(50) NOT NULL,
+	plate_key VARCHAR(50),
+	driver_name VARCHAR(100),
+	driver_phone VARCHAR(20),
+	entry_time TIMESTAMP WITHOUT TIME ZONE,
+	exit_time TIMESTAMP WITHOUT TIME ZONE,
+	route VARCHAR(100),
+	passenger_count INTEGER,
+	status VARCHAR(20),
+	created_by VARCHAR(100),
+	notes TEXT,
+	vehicle_type VARCHAR(20),
+	created_at TIMESTAMP WITHOUT TIME ZONE,
+	updated_at TIMESTAMP WITHOUT TIME ZONE,
+	PRIMARY KEY (id)
+);
+
+CREATE INDEX ix_bus_entries_entry_time ON bus_entries (entry_time);
+
+CREATE INDEX ix_bus_entries_plate_key_entry_time ON bus_entries (plate_key, entry_time);
+
+CREATE INDEX ix_bus_entries_status_entry_time ON bus_entries (status, entry_time);
+
+CREATE INDEX ix_bus_entries_vehicle_type_entry_time ON bus_entries (vehicle_type, entry_time);
+
+CREATE TABLE bus_entries_archive (
+	id VARCHAR(36) NOT NULL,
+	bus_number VARCHAR(50),
+	plate_key VARCHAR(50),
+	driver_name VARCHAR(100),
+	driver_phone VARCHAR(20),
+	entry_time TIMESTAMP WITHOUT TIME ZONE,
+	exit_time TIMESTAMP WITHOUT TIME ZONE,
+	route VARCHAR(100),
+	passenger_count INTEGER,
+	status VARCHAR(20),
+	created_by VARCHAR(100),
+	notes TEXT,
+	vehicle_type VARCHAR(20),
+	created_at TIMESTAMP WITHOUT TIME ZONE,
+	updated_at TIMESTAMP WITHOUT TIME ZONE,
+	archived_at TIMESTAMP WITHOUT TIME ZONE NOT NULL,
+	PRIMARY KEY (id)
+);
+
+CREATE INDEX ix_bus_entries_archive_entry_time ON bus_entries_archive (entry_time);
+
+CREATE TABLE daily_counters (
+	day DATE NOT NULL,
+	kind VARCHAR(20) NOT NULL,
+	key VARCHAR(20) NOT NULL,
+	count INTEGER NOT NULL,
+	PRIMARY KEY (day, kind, key)
+);
+
+CREATE TABLE expected_visitors_archive (
+	id VARCHAR(36) NOT NULL,
+	name VARCHAR(100),
+	phone VARCHAR(20),
+	phone_key VARCHAR(20),
+	email VARCHAR(120),
+	purpose TEXT,
+	authority_id VARCHAR(36),
+	expected_date DATE,
+	visitor_id VARCHAR(36),
+	created_by VARCHAR(100),
+	notes TEXT,
+	created_at TIMESTAMP WITHOUT TIME ZONE,
+	archived_at TIMESTAMP WITHOUT TIME ZONE NOT NULL,
+	PRIMARY KEY (id)
+);
+
+CREATE INDEX ix_expected_visitors_archive_expected_date ON expected_visitors_archive (expected_date);
+
+CREATE TABLE notifications_archive (
+	id VARCHAR(36) NOT NULL,
+	visitor_id VARCHAR(36),
+	authority_id VARCHAR(36),
+	type VARCHAR(50),
+	title VARCHAR(255),
+	message TEXT,
+	is_read BOOLEAN,
+	delivery_status VARCHAR(20),
+	delivered_at TIMESTAMP WITHOUT TIME ZONE,
+	created_at TIMESTAMP WITHOUT TIME ZONE,
+	updated_at TIMESTAMP WITHOUT TIME ZONE,
+	archived_at TIMESTAMP WITHOUT TIME ZONE NOT NULL,
+	PRIMARY KEY (id)
+);
+
+CREATE INDEX ix_notifications_archive_created_at ON notifications_archive (created_at);
+
+CREATE TABLE photo_blobs (
+	key VARCHAR(80) NOT NULL,
+	ref_count INTEGER NOT NULL,
+	updated_at TIMESTAMP WITHOUT TIME ZONE,
+	PRIMARY KEY (key)
+);
+
+CREATE TABLE sheets_outbox (
+	id SERIAL NOT NULL,
+	sheet VARCHAR(20) NOT NULL,
+	action VARCHAR(20) NOT NULL,
+	payload TEXT NOT NULL,
+	status VARCHAR(20) NOT NULL,
+	attempts INTEGER NOT NULL,
+	next_attempt_at TIMESTAMP WITHOUT TIME ZONE NOT NULL,
+	last_error TEXT,
+	created_at TIMESTAMP WITHOUT TIME ZONE,
+	PRIMARY KEY (id)
+);
+
+CREATE INDEX ix_sheets_outbox_next_attempt_at ON sheets_outbox (next_attempt_at);
+
+CREATE TABLE table_versions (
+	table_name VARCHAR(64) NOT NULL,
+	version INTEGER NOT NULL,
+	PRIMARY KEY (table_name)
+);
+
+CREATE TABLE visitors_archive (
+	id VARCHAR(36) NOT NULL,
+	name VARCHAR(100),
+	phone VARCHAR(20),
+	phone_key VARCHAR(20),
+	email VARCHAR(120),
+	purpose TEXT,
+	photo_url VARCHAR(200),
+	photo_thumb_url VARCHAR(200),
+	exit_photo_url VARCHAR(200),
+	entry_time TIMESTAMP WITHOUT TIME ZONE,
+	exit_time TIMESTAMP WITHOUT TIME ZONE,
+	authority_id VARCHAR(36),
+	authority_permission_granted BOOLEAN,
+	permission_granted_at TIMESTAMP WITHOUT TIME ZONE,
+	status VARCHAR(20),
+	created_by VARCHAR(100),
+	notes TEXT,
+	created_at TIMESTAMP WITHOUT TIME ZONE,
+	updated_at TIMESTAMP WITHOUT TIME ZONE,
+	archived_at TIMESTAMP WITHOUT TIME ZONE NOT NULL,
+	PRIMARY KEY (id)
+);
+
+CREATE INDEX ix_visitors_archive_entry_time ON visitors_archive (entry_time);
+
+CREATE TABLE inbox_counters (
+	authority_id VARCHAR(36) NOT NULL,
+	unread INTEGER NOT NULL,
+	PRIMARY KEY (authority_id),
+	FOREIGN KEY(authority_id) REFERENCES authorities (id)
+);
+
+CREATE TABLE users (
+	id VARCHAR(36) NOT NULL,
+	username VARCHAR(80) NOT NULL,
+	password VARCHAR(120) NOT NULL,
+	role VARCHAR(20) NOT NULL,
+	authority_id VARCHAR(36),
+	is_active BOOLEAN,
+	created_at TIMESTAMP WITHOUT TIME ZONE,
+	updated_at TIMESTAMP WITHOUT TIME ZONE,
+	PRIMARY KEY (id),
+	UNIQUE (username),
+	FOREIGN KEY(authority_id) REFERENCES authorities (id)
+);
+
+CREATE TABLE visitors (
+	id VARCHAR(36) NOT NULL,
+	name VARCHAR(100) NOT NULL,
+	phone VARCHAR(20) NOT NULL,
+	phone_key VARCHAR(20),
+	email VARCHAR(120),
+	purpose TEXT NOT NULL,
+	photo_url VARCHAR(200),
+	photo_thumb_url VARCHAR(200),
+	exit_photo_url VARCHAR(200),
+	entry_time TIMESTAMP WITHOUT TIME ZONE,
+	exit_time TIMESTAMP WITHOUT TIME ZONE,
+	authority_id VARCHAR(36),
+	authority_permission_granted BOOLEAN,
+	permission_granted_at TIMESTAMP WITHOUT TIME ZONE,
+	status VARCHAR(20),
+	created_by VARCHAR(100),
+	notes TEXT,
+	created_at TIMESTAMP WITHOUT TIME ZONE,
+	updated_at TIMESTAMP WITHOUT TIME ZONE,
+	PRIMARY KEY (id),
+	FOREIGN KEY(authority_id) REFERENCES authorities (id)
+);
+
+CREATE INDEX ix_visitors_authority_id ON visitors (authority_id);
+
+CREATE INDEX ix_visitors_entry_time ON visitors (entry_time);
+
+CREATE INDEX ix_visitors_phone_key_entry_time ON visitors (phone_key, entry_time);
+
+CREATE INDEX ix_visitors_status_entry_time ON visitors (status, entry_time);
+
+CREATE INDEX ix_visitors_status_exit_time ON visitors (status, exit_time);
+
+CREATE TABLE expected_visitors (
+	id VARCHAR(36) NOT NULL,
+	name VARCHAR(100) NOT NULL,
+	phone VARCHAR(20) NOT NULL,
+	phone_key VARCHAR(20),
+	email VARCHAR(120),
+	purpose TEXT NOT NULL,
+	authority_id VARCHAR(36),
+	expected_date DATE NOT NULL,
+	visitor_id VARCHAR(36),
+	created_by VARCHAR(100),
+	notes TEXT,
+	created_at TIMESTAMP WITHOUT TIME ZONE,
+	PRIMARY KEY (id),
+	FOREIGN KEY(authority_id) REFERENCES authorities (id),
+	FOREIGN KEY(visitor_id) REFERENCES visitors (id)
+);
+
+CREATE INDEX ix_expected_visitors_expected_date_visitor_id ON expected_visitors (expected_date, visitor_id);
+
+CREATE INDEX ix_expected_visitors_phone_key ON expected_visitors (phone_key);
+
+CREATE INDEX ix_expected_visitors_visitor_id ON expected_visitors (visitor_id);
+
+CREATE TABLE notification_events (
+	id SERIAL NOT NULL,
+	type VARCHAR(50) NOT NULL,
+	visitor_id VARCHAR(36),
+	authority_id VARCHAR(36),
+	payload TEXT NOT NULL,
+	status VARCHAR(20) NOT NULL,
+	created_at TIMESTAMP WITHOUT TIME ZONE,
+	PRIMARY KEY (id),
+	FOREIGN KEY(visitor_id) REFERENCES visitors (id),
+	FOREIGN KEY(authority_id) REFERENCES authorities (id)
+);
+
+CREATE INDEX ix_notification_events_status_id ON notification_events (status, id);
+
+CREATE INDEX ix_notification_events_visitor_id ON notification_events (visitor_id);
+
+CREATE TABLE notifications (
+	id VARCHAR(36) NOT NULL,
+	visitor_id VARCHAR(36),
+	authority_id VARCHAR(36),
+	type VARCHAR(50),
+	title VARCHAR(255) NOT NULL,
+	message TEXT NOT NULL,
+	is_read BOOLEAN,
+	delivery_status VARCHAR(20),
+	delivered_at TIMESTAMP WITHOUT TIME ZONE,
+	created_at TIMESTAMP WITHOUT TIME ZONE,
+	updated_at TIMESTAMP WITHOUT TIME ZONE,
+	PRIMARY KEY (id),
+	FOREIGN KEY(visitor_id) REFERENCES visitors (id),
+	FOREIGN KEY(authority_id) REFERENCES authorities (id)
+);
+
+CREATE INDEX ix_notifications_authority_id_is_read_created_at ON notifications (authority_id, is_read, created_at);
+
+CREATE INDEX ix_notifications_created_at ON notifications (created_at);
+
+CREATE INDEX ix_notifications_is_read_created_at ON notifications (is_read, created_at);
+
+CREATE INDEX ix_notifications_visitor_id ON notifications (visitor_id);
+
+CREATE TABLE notification_deliveries (
+	id SERIAL NOT NULL,
+	notification_id VARCHAR(36) NOT NULL,
+	channel VARCHAR(20) NOT NULL,
+	recipient VARCHAR(120) NOT NULL,
+	status VARCHAR(20) NOT NULL,
+	attempts INTEGER NOT NULL,
+	next_attempt_at TIMESTAMP WITHOUT TIME ZONE NOT NULL,
+	sent_at TIMESTAMP WITHOUT TIME ZONE,
+	last_error TEXT,
+	PRIMARY KEY (id),
+	FOREIGN KEY(notification_id) REFERENCES notifications (id)
+);
+
+CREATE INDEX ix_notification_deliveries_channel_status_next_attempt_at ON notification_deliveries (channel, status, next_attempt_at);
+
+CREATE INDEX ix_notification_deliveries_notification_id ON notification_deliveries (notification_id);
@@ -0,0 +1,89 @@
+from collections import Counter
+from datetime import datetime
+from sqlalchemy import update
+from models import db, Visitor
+from services import counters
+from services.authorities import get_principal_id
+from services.events import queue_event
+from services.inbox import mark_visitor_notifications_read
+from services.sheets import queue_sheet_rows
+
+DECISIONS = {'approve': 'approved', 'reject': 'rejected'}
+
+def can_decide(user, authority_id):
+    """Admins decide every request; authorities decide their own, and the Principal co-approves all"""
+    if user.role == 'admin':
+        return True
+    return user.authority_id is not None and user.authority_id in (authority_id, get_principal_id())
+
+def decide_visitors(visitor_ids, action, user):
+    """Approve or reject pending visitors in one transaction on behalf of ``user``.
+    
+    Uses set-based UPDATEs for both visitors and their notifications. Only
+    rows still pending at update time change, so a request that raced with
+    another approver is reported instead of applied twice. Visitors outside
+    the user's inbox are left alone and reported as forbidden. Returns one
+    result dict per requested id, in request order.
+    """
+    new_status = DECISIONS[action]
+    visitor_ids = list(dict.fromkeys(visitor_ids))
+    
+    visitors = {
+        v.id: v for v in db.session.query(
+            Visitor.id, Visitor.name, Visitor.status, Visitor.entry_time, Visitor.authority_id
+        ).filter(Visitor.id.in_(visitor_ids))
+    } if visitor_ids else {}
+    forbidden = {i for i, v in visitors.items() if not can_decide(user, v.authority_id)}
+    pending_ids = [i for i in visitor_ids if i in visitors and i not in forbidden and visitors[i].status == 'pending']
+    
+    updated_ids = set()
+    if pending_ids:
+        values = {'status': new_status, 'updated_at': datetime.utcnow()}
+        if new_status == 'approved':
+            values.update(authority_permission_granted=True, permission_granted_at=datetime.utcnow())
+        
+        stmt = update(Visitor).where(
+            Visitor.id.in_(pending_ids),
+            Visitor.status == 'pending'
+        ).values(**values)
+        
+        if db.session.get_bind().dialect.update_returning:
+            updated_ids = {row.id for row in db.session.execute(stmt.returning(Visitor.id))}
+        else:
+            db.session.execute(stmt)
+            updated_ids = set(pending_ids)
+    
+    if updated_ids:
+        mark_visitor_notifications_read(list(updated_ids))
+        
+        per_day = Counter((visitors[i].entry_time or datetime.utcnow()).date() for i in updated_ids)
+        for day, count in per_day.items():
+            counters.bump(day, counters.VISITOR, 'pending', -count)
+            counters.bump(day, counters.VISITOR, new_status, count)
+        
+        for visitor_id in updated_ids:
+            queue_event(db.session, f'visitor_{new_status}', id=visitor_id, name=visitors[visitor_id].name)
+        queue_sheet_rows('visitors', new_status, [{
+            'id': visitor_id,
+            'name': visitors[visitor_id].name,
+            'status': new_status,
+            'entry_time': visitors[visitor_id].entry_time
+        } for visitor_id in sorted(updated_ids)])
+    
+    db.session.commit()
+    
+    results = []
+    for visitor_id in visitor_ids:
+        visitor = visitors.get(visitor_id)
+        if visitor_id in updated_ids:
+            results.append({'id': visitor_id, 'name': visitor.name, 'status': new_status, 'success': True})
+        elif visitor is None:
+            results.append({'id': visitor_id, 'success': False, 'error': 'Visitor not found'})
+        elif visitor_id in forbidden:
+            results.append({'id': visitor_id, 'success': False, 'forbidden': True, 'error': 'Not in your inbox'})
+        else:
+            # Either already decided before this request or by a concurrent one
+            current = visitor.status if visitor.status != 'pending' else 'no longer pending'
+            results.append({'id': visitor_id, 'name': visitor.name, 'success': False, 'error': f'Already {current}'})
+    
+    return results
@@ -0,0 +1,73 @@
+import threading
+import time
+from collections import namedtuple
+from flask import session, g, redirect, url_for, flash, jsonify, current_app
+from models import db, User
+
+# The signed-in user is resolved once per request and served from a small
+# in-process cache between requests, so auth checks and the navbar do not hit
+# the database. Entries expire after USER_CACHE_SECONDS and are dropped
+# immediately when an admin changes the account.
+CurrentUser = namedtuple('CurrentUser', ['id', 'username', 'role', 'is_active', 'authority_id'])
+
+_cache = {}
+_lock = threading.Lock()
+
+def invalidate_user(user_id):
+    with _lock:
+        _cache.pop(user_id, None)
+
+def _load_user(user_id):
+    now = time.monotonic()
+    with _lock:
+        cached = _cache.get(user_id)
+    if cached and cached[1] > now:
+        return cached[0]
+    
+    user = db.session.get(User, user_id)
+    snapshot = CurrentUser(user.id, user.username, user.role, user.is_active, user.authority_id) if user else None
+    with _lock:
+        _cache[user_id] = (snapshot, now + current_app.config['USER_CACHE_SECONDS'])
+    return snapshot
+
+def get_current_user():
+    """Return the signed-in user for this request, or None"""
+    if 'current_user' not in g:
+        user = None
+        if 'user_id' in session:
+            user = _load_user(session['user_id'])
+            if user and user.is_active:
+                # Keep role checks that read the session in step with admin edits
+                if session.get('role') != user.role:
+                    session['role'] = user.role
+            else:
+                session.clear()
+                user = None
+        g.current_user = user
+    return g.current_user
+
+def login_required(f):
+    def decorated_function(*args, **kwargs):
+        if not get_current_user():
+            return redirect(url_for('auth.login'))
+        return f(*args, **kwargs)
+    decorated_function.__name__ = f.__name__
+    return decorated_function
+
+def admin_required(f):
+    def decorated_function(*args, **kwargs):
+        user = get_current_user()
+        if not user or user.role != 'admin':
+            flash('Access denied. Admin privileges required.', 'error')
+            return redirect(url_for('index'))
+        return f(*args, **kwargs)
+    decorated_function.__name__ = f.__name__
+    return decorated_function
+
+def api_login_required(f):
+    def decorated_function(*args, **kwargs):
+        if not get_current_user():
+            return jsonify({'error': 'Authentication required'}), 401
+        return f(*args, **kwargs)
+    decorated_function.__name__ = f.__name__
+    return decorated_function
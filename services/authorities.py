@@ -0,0 +1,57 @@
+import hashlib
+import json
+import threading
+import time
+from collections import namedtuple
+from flask import current_app
+from models import db, Authority
+
+# Authorities change only when an admin edits them, but the entry form's
+# dropdown, /api/authorities and every visitor registration read them. The
+# active directory and the Principal's id are kept in a small in-process
+# cache that expires after AUTHORITY_CACHE_SECONDS (so other server processes
+# catch up) and is dropped as soon as an admin adds or edits an authority.
+PRINCIPAL_DESIGNATION = 'Principal'
+
+AuthorityEntry = namedtuple('AuthorityEntry', ['id', 'name', 'designation', 'department', 'email', 'phone'])
+Directory = namedtuple('Directory', ['authorities', 'etag'])
+
+_cache = {}
+_lock = threading.Lock()
+
+def invalidate_authorities():
+    with _lock:
+        _cache.clear()
+
+def _cached(key, load):
+    now = time.monotonic()
+    with _lock:
+        cached = _cache.get(key)
+    if cached and cached[1] > now:
+        return cached[0]
+    
+    value = load()
+    with _lock:
+        _cache[key] = (value, now + current_app.config['AUTHORITY_CACHE_SECONDS'])
+    return value
+
+def _load_directory():
+    rows = db.session.query(
+        Authority.id, Authority.name, Authority.designation, Authority.department, Authority.email, Authority.phone
+    ).filter_by(is_active=True).order_by(Authority.name)
+    authorities = tuple(AuthorityEntry(*row) for row in rows)
+    etag = hashlib.sha1(json.dumps(authorities).encode()).hexdigest()
+    return Directory(authorities, etag)
+
+def get_directory():
+    """Return the active authorities ordered by name, with an ETag for their content"""
+    return _cached('directory', _load_directory)
+
+def active_authorities():
+    return get_directory().authorities
+
+def get_principal_id():
+    """Return the id of the Principal authority, or None if there is none"""
+    return _cached('principal', lambda: db.session.query(Authority.id).filter_by(
+        designation=PRINCIPAL_DESIGNATION
+    ).limit(1).scalar())
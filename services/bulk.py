@@ -0,0 +1,178 @@
+import csv
+import io
+from collections import Counter
+from datetime import datetime, date
+from flask import current_app
+from sqlalchemy import insert, select, update, or_
+from models import db, Authority, BusEntry, ExpectedVisitor
+from services import counters
+from services.events import queue_event
+from services.sheets import queue_sheet_rows
+from utils import normalize_phone
+
+# Set-based gate operations. Each one runs as a handful of statements inside a
+# single transaction instead of one request and commit per row, so clearing
+# the evening bus fleet or loading an exam's guest list stays a single click.
+
+def exit_vehicles(vehicle_ids=None, route=None, vehicle_type=None):
+    """Mark every matching vehicle still inside as exited.
+    
+    Vehicles are selected by id, by route, or both (either matches), and can
+    be narrowed to one vehicle type. Returns the exited rows as
+    ``(id, bus_number, vehicle_type)`` tuples.
+    """
+    criteria = []
+    if vehicle_ids:
+        criteria.append(BusEntry.id.in_(vehicle_ids))
+    if route:
+        criteria.append(BusEntry.route == route)
+    if not criteria:
+        return []
+    
+    conditions = [BusEntry.status == 'entered', or_(*criteria)]
+    if vehicle_type:
+        conditions.append(BusEntry.vehicle_type == vehicle_type)
+    
+    columns = (BusEntry.id, BusEntry.bus_number, BusEntry.vehicle_type, BusEntry.entry_time)
+    exited_at = datetime.utcnow()
+    stmt = update(BusEntry).where(*conditions).values(
+        status='exited', exit_time=exited_at, updated_at=exited_at
+    )
+    
+    if db.session.get_bind().dialect.update_returning:
+        exited = db.session.execute(stmt.returning(*columns)).all()
+    else:
+        exited = db.session.execute(select(*columns).where(*conditions)).all()
+        if exited:
+            db.session.execute(
+                update(BusEntry).where(
+                    BusEntry.id.in_([row.id for row in exited]),
+                    BusEntry.status == 'entered'
+                ).values(status='exited', exit_time=exited_at, updated_at=exited_at)
+            )
+    
+    per_day = Counter((row.entry_time or datetime.utcnow()).date() for row in exited)
+    for day, count in per_day.items():
+        counters.bump(day, counters.VEHICLE_STATUS, 'entered', -count)
+        counters.bump(day, counters.VEHICLE_STATUS, 'exited', count)
+    
+    for row in exited:
+        queue_event(db.session, 'vehicle_exit', id=row.id, bus_number=row.bus_number, vehicle_type=row.vehicle_type)
+    queue_sheet_rows('vehicles', 'exit', [{
+        'id': row.id,
+        'bus_number': row.bus_number,
+        'vehicle_type': row.vehicle_type,
+        'status': 'exited',
+        'entry_time': row.entry_time,
+        'exit_time': exited_at
+    } for row in exited])
+    
+    db.session.commit()
+    return [(row.id, row.bus_number, row.vehicle_type) for row in exited]
+
+EXPECTED_COLUMNS = ('name', 'phone', 'purpose', 'email', 'expected_date', 'authority', 'notes')
+REQUIRED_COLUMNS = ('name', 'phone', 'purpose')
+
+def parse_expected_visitors(stream, default_date=None):
+    """Parse and validate an expected-visitor CSV upload.
+    
+    Returns ``(rows, errors)``. ``rows`` are ready for a bulk insert and
+    ``errors`` is a list of ``(line, message)``; callers must not insert
+    anything unless ``errors`` is empty. The optional ``authority`` column
+    matches an active authority by email or name.
+    """
+    default_date = default_date or date.today()
+    max_rows = current_app.config.get('IMPORT_MAX_ROWS', 5000)
+    
+    text = io.TextIOWrapper(stream, encoding='utf-8-sig', newline='')
+    try:
+        reader = csv.DictReader(text)
+        fieldnames = [f.strip().lower() for f in reader.fieldnames or []]
+    except (UnicodeDecodeError, csv.Error) as e:
+        return [], [(1, f'Unreadable CSV file: {e}')]
+    
+    missing = [c for c in REQUIRED_COLUMNS if c not in fieldnames]
+    if missing:
+        return [], [(1, f"Missing required column(s): {', '.join(missing)}")]
+    reader.fieldnames = fieldnames
+    
+    # One query resolves every authority reference in the file
+    authorities = {}
+    for authority in Authority.query.filter_by(is_active=True):
+        authorities[authority.name.strip().lower()] = authority.id
+        if authority.email:
+            authorities[authority.email.strip().lower()] = authority.id
+    
+    rows, errors = [], []
+    try:
+        for record in reader:
+            line = reader.line_num
+            if len(rows) + len(errors) >= max_rows:
+                errors.append((line, f'Too many rows; the limit is {max_rows}'))
+                break
+            
+            values = {c: (record.get(c) or '').strip() for c in EXPECTED_COLUMNS}
+            if not any(values.values()):
+                continue
+            
+            problems = [f'{c} is required' for c in REQUIRED_COLUMNS if not values[c]]
+            if values['phone'] and not normalize_phone(values['phone']):
+                problems.append('phone has no digits')
+            if len(values['name']) > 100:
+                problems.append('name is longer than 100 characters')
+            if len(values['phone']) > 20:
+                problems.append('phone is longer than 20 characters')
+            if len(values['email']) > 120:
+                problems.append('email is longer than 120 characters')
+            
+            expected_date = default_date
+            if values['expected_date']:
+                try:
+                    expected_date = datetime.strptime(values['expected_date'], '%Y-%m-%d').date()
+                except ValueError:
+                    problems.append('expected_date must be YYYY-MM-DD')
+            
+            authority_id = None
+            if values['authority']:
+                authority_id = authorities.get(values['authority'].lower())
+                if authority_id is None:
+                    problems.append(f"unknown authority '{values['authority']}'")
+            
+            if problems:
+                errors.append((line, '; '.join(problems)))
+                continue
+            
+            rows.append({
+                'name': values['name'],
+                'phone': values['phone'],
+                'phone_key': normalize_phone(values['phone']),
+                'email': values['email'],
+                'purpose': values['purpose'],
+                'authority_id': authority_id,
+                'expected_date': expected_date,
+                'notes': values['notes']
+            })
+    except (UnicodeDecodeError, csv.Error) as e:
+        errors.append((reader.line_num, f'Unreadable CSV file: {e}'))
+    finally:
+        text.detach()
+    
+    if not rows and not errors:
+        errors.append((1, 'The file contains no visitors'))
+    
+    return rows, errors
+
+def import_expected_visitors(rows, created_by):
+    """Insert validated rows in batched executemany statements; returns the count"""
+    batch_size = current_app.config.get('IMPORT_BATCH_SIZE', 500)
+    
+    # Column defaults still apply to Core inserts; ORM validators do not,
+    # which is why the parser fills in phone_key itself
+    for row in rows:
+        row['created_by'] = created_by
+    
+    for start in range(0, len(rows), batch_size):
+        db.session.execute(insert(ExpectedVisitor), rows[start:start + batch_size])
+    
+    db.session.commit()
+    return len(rows)
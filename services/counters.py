@@ -0,0 +1,89 @@
+from datetime import datetime
+from sqlalchemy import func
+from models import db, Visitor, BusEntry, DailyCounter
+from services.sql import upsert_increment
+
+# Rollup of gate activity keyed by the day the visitor or vehicle entered.
+# Visitors are counted per current status, vehicles per vehicle type, and
+# vehicle presence per status, so a status change moves one unit between keys
+# of the same day instead of requiring a recount.
+VISITOR = 'visitor'
+VEHICLE = 'vehicle'
+VEHICLE_STATUS = 'vehicle_status'
+
+def _entry_day(record):
+    return (record.entry_time or datetime.utcnow()).date()
+
+def bump(day, kind, key, delta=1):
+    """Atomically add ``delta`` to a counter within the current transaction"""
+    upsert_increment(DailyCounter, {'day': day, 'kind': kind, 'key': key or ''}, 'count', delta)
+
+def move(day, kind, old_key, new_key):
+    """Move one unit from ``old_key`` to ``new_key`` on the same day"""
+    if old_key == new_key:
+        return
+    bump(day, kind, old_key, -1)
+    bump(day, kind, new_key, 1)
+
+def record_visitor_entry(visitor):
+    bump(_entry_day(visitor), VISITOR, visitor.status)
+
+def record_visitor_status(visitor, old_status):
+    move(_entry_day(visitor), VISITOR, old_status, visitor.status)
+
+def record_vehicle_entry(vehicle):
+    day = _entry_day(vehicle)
+    bump(day, VEHICLE, vehicle.vehicle_type)
+    bump(day, VEHICLE_STATUS, vehicle.status)
+
+def record_vehicle_status(vehicle, old_status):
+    move(_entry_day(vehicle), VEHICLE_STATUS, old_status, vehicle.status)
+
+def counts_by_key(kind, start_day, end_day):
+    """Return ``[(key, count)]`` for a kind over an inclusive day range"""
+    return db.session.query(
+        DailyCounter.key, func.sum(DailyCounter.count)
+    ).filter(
+        DailyCounter.kind == kind,
+        DailyCounter.day >= start_day,
+        DailyCounter.day <= end_day
+    ).group_by(DailyCounter.key).having(func.sum(DailyCounter.count) > 0).all()
+
+def counts_by_day(start_day, end_day):
+    """Return ``{(day, kind): count}`` of visitor and vehicle entries per day"""
+    rows = db.session.query(
+        DailyCounter.day, DailyCounter.kind, func.sum(DailyCounter.count)
+    ).filter(
+        DailyCounter.kind.in_([VISITOR, VEHICLE]),
+        DailyCounter.day >= start_day,
+        DailyCounter.day <= end_day
+    ).group_by(DailyCounter.day, DailyCounter.kind).all()
+    return {(day, kind): count for day, kind, count in rows}
+
+def totals_by_key(kind, keys):
+    """Return ``{key: count}`` summed across all days"""
+    rows = db.session.query(
+        DailyCounter.key, func.sum(DailyCounter.count)
+    ).filter(
+        DailyCounter.kind == kind,
+        DailyCounter.key.in_(keys)
+    ).group_by(DailyCounter.key).all()
+    return {key: count for key, count in rows}
+
+def _backfill(kind, column, key_column):
+    bucket = func.date(column)
+    rows = db.session.query(bucket, key_column, func.count()).group_by(bucket, key_column).all()
+    for day, key, count in rows:
+        if day is None:
+            continue
+        if isinstance(day, str):
+            day = datetime.strptime(day, '%Y-%m-%d').date()
+        db.session.add(DailyCounter(day=day, kind=kind, key=key or '', count=count))
+
+def rebuild_counters():
+    """Recompute every counter from the raw visitor and vehicle rows"""
+    DailyCounter.query.delete()
+    _backfill(VISITOR, Visitor.entry_time, Visitor.status)
+    _backfill(VEHICLE, BusEntry.entry_time, BusEntry.vehicle_type)
+    _backfill(VEHICLE_STATUS, BusEntry.entry_time, BusEntry.status)
+    db.session.commit()
@@ -0,0 +1,88 @@
+from sqlalchemy import create_engine, inspect, select, func, text
+from sqlalchemy.dialects import registry
+from sqlalchemy.schema import CreateTable, CreateIndex
+from models import db
+from services.migrations import MIGRATIONS, current_version
+
+# Moving an installation between database backends, typically from the
+# original SQLite file to PostgreSQL once several gate terminals write at the
+# same time. Tables are copied in dependency order through the model
+# metadata, so values are converted by the column types on both sides rather
+# than by hand-written SQL.
+
+def schema_sql(dialect_name):
+    """Return the DDL for every model table and index in a given dialect"""
+    dialect = registry.load(dialect_name)()
+    
+    statements = []
+    for table in db.metadata.sorted_tables:
+        statements.append(CreateTable(table))
+        statements.extend(CreateIndex(index) for index in sorted(table.indexes, key=lambda i: i.name))
+    
+    ddl = (str(s.compile(dialect=dialect)).strip() for s in statements)
+    return '\n\n'.join('\n'.join(line.rstrip() for line in sql.splitlines()) + ';' for sql in ddl) + '\n'
+
+def _reset_sequence(conn, table):
+    """Move a PostgreSQL serial key's sequence past the ids copied into ``table``"""
+    column = table.autoincrement_column
+    if conn.dialect.name != 'postgresql' or column is None:
+        return
+    
+    quote = conn.dialect.identifier_preparer.quote
+    conn.execute(text(
+        f'SELECT setval(pg_get_serial_sequence(:table, :column), COALESCE(MAX({quote(column.name)}), 1), '
+        f'MAX({quote(column.name)}) IS NOT NULL) FROM {quote(table.name)}'
+    ), {'table': table.name, 'column': column.name})
+
+def copy_database(source_url, batch_size=1000, log=print):
+    """Copy every model table from ``source_url`` into the app database.
+    
+    The source must already be at the current schema version (start the app
+    against it once) and existing rows in the target are replaced. Everything
+    is written in one transaction, so a failed copy leaves the target as it
+    was. Returns ``[(table, rows)]``.
+    """
+    source = create_engine(source_url)
+    latest = MIGRATIONS[-1][0]
+    
+    try:
+        source_tables = set(inspect(source).get_table_names())
+        version = 0
+        if 'schema_migrations' in source_tables:
+            with source.connect() as source_conn:
+                version = current_version(source_conn)
+        if version < latest:
+            raise ValueError(
+                f'Source database is at schema version {version}, not {latest}; '
+                'start the app against it once to upgrade it before copying'
+            )
+        
+        copied = []
+        
+        with db.engine.begin() as target_conn, source.connect() as source_conn:
+            for table in reversed(db.metadata.sorted_tables):
+                target_conn.execute(table.delete())
+            
+            for table in db.metadata.sorted_tables:
+                if table.name not in source_tables:
+                    log(f'{table.name}: not in source, skipped')
+                    continue
+                
+                result = source_conn.execution_options(yield_per=batch_size).execute(select(table))
+                rows = 0
+                for batch in result.mappings().partitions():
+                    target_conn.execute(table.insert(), [dict(row) for row in batch])
+                    rows += len(batch)
+                
+                expected = source_conn.execute(select(func.count()).select_from(table)).scalar()
+                if rows != expected:
+                    raise RuntimeError(f'{table.name}: copied {rows} rows but the source has {expected}')
+                
+                # Explicit ids leave serial sequences behind; the next insert would reuse one
+                _reset_sequence(target_conn, table)
+                log(f'{table.name}: {rows} rows')
+                copied.append((table.name, rows))
+    finally:
+        source.dispose()
+    
+    return copied
@@ -0,0 +1,63 @@
+import json
+import queue
+import threading
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+# In-process publish/subscribe for live updates. Handlers queue events on the
+# database session and they are broadcast only after the transaction commits,
+# so listeners never see a change that was rolled back. Each open
+# Server-Sent Events stream owns a bounded queue; a client that stops reading
+# loses events instead of blocking publishers. Subscribers only receive events
+# published by the same server process.
+_subscribers = set()
+_lock = threading.Lock()
+
+def subscribe():
+    q = queue.Queue(maxsize=100)
+    with _lock:
+        _subscribers.add(q)
+    return q
+
+def unsubscribe(q):
+    with _lock:
+        _subscribers.discard(q)
+
+def publish(event_type, data):
+    """Broadcast an event to every connected stream immediately"""
+    with _lock:
+        subscribers = list(_subscribers)
+    for q in subscribers:
+        try:
+            q.put_nowait((event_type, data))
+        except queue.Full:
+            pass
+
+def queue_event(session, event_type, **data):
+    """Publish an event once the session's current transaction commits"""
+    session.info.setdefault('pending_events', []).append((event_type, data))
+
+@event.listens_for(Session, 'after_commit')
+def _publish_pending(session):
+    for event_type, data in session.info.pop('pending_events', []):
+        publish(event_type, data)
+
+@event.listens_for(Session, 'after_rollback')
+def _discard_pending(session):
+    session.info.pop('pending_events', None)
+
+def stream(heartbeat=15):
+    """Yield Server-Sent Events for one client until it disconnects"""
+    q = subscribe()
+    try:
+        yield 'retry: 5000\n\n'
+        while True:
+            try:
+                event_type, data = q.get(timeout=heartbeat)
+            except queue.Empty:
+                # Comment line keeps proxies from closing an idle connection
+                yield ': keepalive\n\n'
+                continue
+            yield f'event: {event_type}\ndata: {json.dumps(data)}\n\n'
+    finally:
+        unsubscribe(q)
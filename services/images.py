@@ -0,0 +1,69 @@
+import io
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from flask import current_app
+from sqlalchemy import func
+from PIL import Image, ImageOps
+from models import db, Visitor
+from services import photo_store
+
+logger = logging.getLogger(__name__)
+
+# Uploaded camera frames are stored as-is during the request and re-encoded
+# here, off the request path: EXIF (including GPS) is dropped, the image is
+# bounded to PHOTO_MAX_DIMENSION and a square PHOTO_THUMB_SIZE thumbnail is
+# generated for list views. Exit photos are re-encoded the same way but keep
+# no thumbnail, since lists only show the entry photo.
+_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix='photo')
+
+def process_photo(path, max_dimension, thumb_size, quality):
+    """Re-encode an image as a bounded JPEG plus thumbnail; return both as bytes"""
+    display = io.BytesIO()
+    thumb = io.BytesIO()
+    
+    with Image.open(path) as image:
+        image = ImageOps.exif_transpose(image).convert('RGB')
+        image.thumbnail((max_dimension, max_dimension))
+        # Saving without an exif argument writes a JPEG with no metadata
+        image.save(display, 'JPEG', quality=quality, optimize=True)
+        ImageOps.fit(image, (thumb_size, thumb_size)).save(thumb, 'JPEG', quality=quality, optimize=True)
+    
+    return display.getvalue(), thumb.getvalue()
+
+def _process_visitor_photo(app, visitor_id, photo_url, exit_photo=False):
+    with app.app_context():
+        try:
+            display, thumb = process_photo(
+                photo_store.blob_path_for_url(photo_url),
+                app.config['PHOTO_MAX_DIMENSION'],
+                app.config['PHOTO_THUMB_SIZE'],
+                app.config['PHOTO_QUALITY']
+            )
+            display_url = photo_store.store_bytes(display, '.jpg')
+            thumb_url = None if exit_photo else photo_store.store_bytes(thumb, '.jpg')
+        except Exception:
+            logger.exception('Failed to process photo %s for visitor %s', photo_url, visitor_id)
+            return
+        
+        if exit_photo:
+            updated = Visitor.query.filter_by(id=visitor_id, exit_photo_url=photo_url).update({
+                Visitor.exit_photo_url: display_url,
+                # The exit photo is also linked from the visitor's notes
+                Visitor.notes: func.replace(Visitor.notes, photo_url, display_url)
+            }, synchronize_session=False)
+        else:
+            updated = Visitor.query.filter_by(id=visitor_id, photo_url=photo_url).update({
+                Visitor.photo_url: display_url,
+                Visitor.photo_thumb_url: thumb_url
+            }, synchronize_session=False)
+        if updated:
+            # The raw upload is released and left for garbage collection
+            photo_store.acquire(display_url)
+            photo_store.acquire(thumb_url)
+            photo_store.release(photo_url)
+        db.session.commit()
+
+def enqueue_visitor_photo(visitor_id, photo_url, exit_photo=False):
+    """Process a visitor's uploaded entry or exit photo in the background"""
+    app = current_app._get_current_object()
+    return _executor.submit(_process_visitor_photo, app, visitor_id, photo_url, exit_photo)
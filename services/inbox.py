@@ -0,0 +1,82 @@
+from collections import Counter
+from datetime import datetime
+from sqlalchemy import func, select, update, insert
+from models import db, Notification, InboxCounter
+from services.sql import upsert_increment
+
+# Per-authority notification inboxes. Authority accounts are linked to their
+# Authority through users.authority_id and see the notifications addressed to
+# it; admins see every inbox. inbox_counters keeps each authority's unread
+# count up to date in the same transaction as the notification insert or
+# mark-read, so the navbar badge is a primary-key read instead of a COUNT
+# over notifications.
+
+def bump_unread(authority_id, delta=1):
+    if authority_id and delta:
+        upsert_increment(InboxCounter, {'authority_id': authority_id}, 'unread', delta)
+
+def record_notification(notification):
+    """Count a newly added notification in its authority's inbox"""
+    if not notification.is_read:
+        bump_unread(notification.authority_id)
+
+def mark_read(notification):
+    """Mark one notification read; returns False if it already was"""
+    if notification.is_read:
+        return False
+    notification.is_read = True
+    bump_unread(notification.authority_id, -1)
+    return True
+
+def mark_visitor_notifications_read(visitor_ids):
+    """Mark every unread notification about the given visitors read, adjusting the counters"""
+    if not visitor_ids:
+        return
+    
+    conditions = [Notification.visitor_id.in_(visitor_ids), Notification.is_read == False]
+    stmt = update(Notification).where(*conditions).values(is_read=True, updated_at=datetime.utcnow())
+    
+    if db.session.get_bind().dialect.update_returning:
+        authority_ids = db.session.execute(stmt.returning(Notification.authority_id)).scalars().all()
+    else:
+        authority_ids = db.session.execute(select(Notification.authority_id).where(*conditions)).scalars().all()
+        db.session.execute(stmt)
+    
+    for authority_id, count in Counter(authority_ids).items():
+        bump_unread(authority_id, -count)
+
+def can_read(user, notification):
+    return user.role == 'admin' or (user.authority_id is not None and notification.authority_id == user.authority_id)
+
+def inbox_query(user, unread_only=False):
+    """Notifications visible to ``user``, or None if the user has no inbox"""
+    if user.role == 'admin':
+        query = Notification.query
+    elif user.authority_id:
+        query = Notification.query.filter_by(authority_id=user.authority_id)
+    else:
+        return None
+    
+    if unread_only:
+        query = query.filter(Notification.is_read == False)
+    return query
+
+def unread_count(user):
+    """Unread notifications in the user's inbox (every inbox for admins)"""
+    if user.role == 'admin':
+        return db.session.query(func.coalesce(func.sum(InboxCounter.unread), 0)).scalar()
+    if user.authority_id:
+        return db.session.query(InboxCounter.unread).filter_by(authority_id=user.authority_id).scalar() or 0
+    return 0
+
+def rebuild_inbox_counters(conn=None):
+    """Recompute every authority's unread count from the notifications table"""
+    conn = conn or db.session
+    conn.execute(InboxCounter.__table__.delete())
+    conn.execute(insert(InboxCounter).from_select(
+        ['authority_id', 'unread'],
+        select(Notification.authority_id, func.count()).where(
+            Notification.is_read == False,
+            Notification.authority_id.isnot(None)
+        ).group_by(Notification.authority_id)
+    ))
@@ -0,0 +1,261 @@
+import json
+import logging
+import os
+import threading
+import time
+from collections import defaultdict
+from flask import g, request, session, has_app_context, has_request_context, current_app, before_render_template, template_rendered
+from sqlalchemy import event
+from models import db
+from services.query_plans import explain_prefix
+
+logger = logging.getLogger(__name__)
+
+# Request-level performance instrumentation. Every request records its
+# duration, the number and total time of its SQL statements (from engine
+# cursor events), template render time and multipart upload bytes into
+# per-endpoint counters for this process, which /metrics serves in the
+# Prometheus text format. Requests slower than SLOW_REQUEST_MS and statements
+# slower than SLOW_QUERY_MS are written as JSON lines to the slow log, the
+# statements with their EXPLAIN output (and their parameters only when
+# SLOW_QUERY_LOG_PARAMS is set). Streamed responses are timed until the view
+# returns, not until the body has been sent.
+DURATION_BUCKETS = (0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+EXPLAINABLE = ('SELECT', 'WITH', 'INSERT', 'UPDATE', 'DELETE')
+BACKGROUND = 'background'
+
+_explaining = threading.local()
+
+class Metrics:
+    """Per-endpoint request counters and latency histograms for this process"""
+    
+    COUNTERS = {
+        'sql_statements': ('gate_sql_statements_total', 'SQL statements executed'),
+        'sql_seconds': ('gate_sql_duration_seconds_total', 'Time spent executing SQL statements'),
+        'template_seconds': ('gate_template_render_seconds_total', 'Time spent rendering templates'),
+        'upload_bytes': ('gate_upload_bytes_total', 'Bytes received in multipart uploads'),
+        'slow_requests': ('gate_slow_requests_total', 'Requests slower than SLOW_REQUEST_MS'),
+        'slow_queries': ('gate_slow_queries_total', 'SQL statements slower than SLOW_QUERY_MS')
+    }
+    
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.requests = defaultdict(int)  # (endpoint, method, status) -> count
+        self.buckets = defaultdict(lambda: [0] * len(DURATION_BUCKETS))  # endpoint -> non-cumulative counts
+        self.durations = defaultdict(float)  # endpoint -> total seconds
+        self.counts = defaultdict(int)  # endpoint -> requests
+        self.totals = defaultdict(int)  # (counter, endpoint) -> total
+    
+    def observe_request(self, endpoint, method, status, seconds, **totals):
+        with self.lock:
+            self.requests[(endpoint, method, status)] += 1
+            self.counts[endpoint] += 1
+            self.durations[endpoint] += seconds
+            for i, bound in enumerate(DURATION_BUCKETS):
+                if seconds <= bound:
+                    self.buckets[endpoint][i] += 1
+                    break
+            for name, value in totals.items():
+                if value:
+                    self.totals[(name, endpoint)] += value
+    
+    def add(self, name, endpoint, value=1):
+        with self.lock:
+            self.totals[(name, endpoint)] += value
+    
+    def render(self):
+        """Return every metric in the Prometheus text exposition format"""
+        lines = []
+        with self.lock:
+            lines += [
+                '# HELP gate_http_requests_total Requests handled, by endpoint, method and status',
+                '# TYPE gate_http_requests_total counter'
+            ]
+            for (endpoint, method, status), count in sorted(self.requests.items()):
+                lines.append(f'gate_http_requests_total{_labels(endpoint=endpoint, method=method, status=status)} {count}')
+            
+            lines += [
+                '# HELP gate_http_request_duration_seconds Time until the view returned a response',
+                '# TYPE gate_http_request_duration_seconds histogram'
+            ]
+            for endpoint in sorted(self.counts):
+                cumulative = 0
+                for bound, count in zip(DURATION_BUCKETS, self.buckets[endpoint]):
+                    cumulative += count
+                    lines.append(f'gate_http_request_duration_seconds_bucket{_labels(endpoint=endpoint, le=bound)} {cumulative}')
+                lines.append(f'gate_http_request_duration_seconds_bucket{_labels(endpoint=endpoint, le="+Inf")} {self.counts[endpoint]}')
+                lines.append(f'gate_http_request_duration_seconds_sum{_labels(endpoint=endpoint)} {self.durations[endpoint]:.6f}')
+                lines.append(f'gate_http_request_duration_seconds_count{_labels(endpoint=endpoint)} {self.counts[endpoint]}')
+            
+            for name, (metric, description) in self.COUNTERS.items():
+                lines += [f'# HELP {metric} {description}', f'# TYPE {metric} counter']
+                for (counter, endpoint), value in sorted(self.totals.items()):
+                    if counter == name:
+                        lines.append(f'{metric}{_labels(endpoint=endpoint)} {_number(value)}')
+        return '\n'.join(lines) + '\n'
+    
+    def reset(self):
+        with self.lock:
+            for values in (self.requests, self.buckets, self.durations, self.counts, self.totals):
+                values.clear()
+
+metrics = Metrics()
+
+def _labels(**labels):
+    escaped = (
+        f'{name}="{str(value).replace(chr(92), chr(92) * 2).replace(chr(34), chr(92) + chr(34))}"'
+        for name, value in labels.items()
+    )
+    return '{' + ','.join(escaped) + '}'
+
+def _number(value):
+    return f'{value:.6f}' if isinstance(value, float) else str(value)
+
+def _endpoint():
+    if has_request_context():
+        return request.endpoint or 'unmatched'
+    return BACKGROUND
+
+def _loggable(parameters, executemany):
+    """Statement parameters shortened for the log"""
+    if executemany:
+        return f'{len(parameters)} parameter sets'
+    
+    def short(value):
+        if isinstance(value, (str, bytes)) and len(value) > 100:
+            return value[:100] + ('...' if isinstance(value, str) else b'...')
+        return value
+    
+    if isinstance(parameters, dict):
+        return {key: short(value) for key, value in parameters.items()}
+    return [short(value) for value in parameters or ()]
+
+def write_slow_log(kind, record):
+    logger.warning(json.dumps({'event': kind, **record}, default=str))
+
+def explain_statement(statement, parameters):
+    """Return the plan of a statement as it was sent to the database, or None if it cannot be explained"""
+    if not statement.lstrip().upper().startswith(EXPLAINABLE):
+        return None
+    
+    _explaining.active = True
+    try:
+        with db.engine.connect() as conn:
+            rows = conn.exec_driver_sql(explain_prefix(conn.dialect.name) + statement, parameters).fetchall()
+            conn.rollback()
+        return [row[-1] for row in rows]
+    except Exception as e:
+        return [f'EXPLAIN failed: {e}']
+    finally:
+        _explaining.active = False
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault('statement_started', []).append(time.perf_counter())
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    seconds = time.perf_counter() - conn.info['statement_started'].pop()
+    if not has_app_context() or getattr(_explaining, 'active', False):
+        return
+    
+    if has_request_context():
+        g.sql_statements = g.get('sql_statements', 0) + 1
+        g.sql_seconds = g.get('sql_seconds', 0.0) + seconds
+    else:
+        metrics.add('sql_statements', BACKGROUND)
+        metrics.add('sql_seconds', BACKGROUND, seconds)
+    
+    if seconds * 1000 < current_app.config['SLOW_QUERY_MS']:
+        return
+    
+    query = {'statement': statement, 'ms': round(seconds * 1000, 1)}
+    # Bind values hold names, phone numbers and password hashes; EXPLAIN still uses them in memory
+    if current_app.config['SLOW_QUERY_LOG_PARAMS']:
+        query['parameters'] = _loggable(parameters, executemany)
+    if has_request_context():
+        # Explained once the response is ready, outside the request's transaction
+        g.setdefault('slow_queries', []).append((query, None if executemany else parameters))
+    else:
+        metrics.add('slow_queries', BACKGROUND)
+        write_slow_log('slow_query', {'endpoint': BACKGROUND, **query})
+
+def _statement_failed(exception_context):
+    # after_cursor_execute does not run for a failed statement
+    conn = exception_context.connection
+    if conn is not None and exception_context.cursor is not None and conn.info.get('statement_started'):
+        conn.info['statement_started'].pop()
+
+def install_sql_timing(engine):
+    """Time every SQL statement executed on ``engine``"""
+    if not event.contains(engine, 'before_cursor_execute', _before_cursor_execute):
+        event.listen(engine, 'before_cursor_execute', _before_cursor_execute)
+        event.listen(engine, 'after_cursor_execute', _after_cursor_execute)
+        event.listen(engine, 'handle_error', _statement_failed)
+
+def _template_started(sender, template, context, **extra):
+    g.setdefault('template_started', []).append(time.perf_counter())
+
+def _template_rendered(sender, template, context, **extra):
+    started = g.get('template_started')
+    if started:
+        g.template_seconds = g.get('template_seconds', 0.0) + time.perf_counter() - started.pop()
+
+def _start_request():
+    g.request_started = time.perf_counter()
+
+def _finish_request(response):
+    started = g.pop('request_started', None)
+    if started is None:
+        return response
+    
+    config = current_app.config
+    seconds = time.perf_counter() - started
+    endpoint = _endpoint()
+    upload_bytes = (request.content_length or 0) if request.mimetype == 'multipart/form-data' else 0
+    sql_statements, sql_seconds = g.get('sql_statements', 0), g.get('sql_seconds', 0.0)
+    template_seconds = g.get('template_seconds', 0.0)
+    slow_queries = g.pop('slow_queries', [])
+    slow = seconds * 1000 >= config['SLOW_REQUEST_MS']
+    
+    metrics.observe_request(
+        endpoint, request.method, response.status_code, seconds,
+        sql_statements=sql_statements, sql_seconds=sql_seconds, template_seconds=template_seconds,
+        upload_bytes=upload_bytes, slow_requests=int(slow), slow_queries=len(slow_queries)
+    )
+    
+    if slow:
+        write_slow_log('slow_request', {
+            'endpoint': endpoint,
+            'method': request.method,
+            'path': request.path,
+            'args': request.args.to_dict(flat=False),
+            'status': response.status_code,
+            'user_id': session.get('user_id'),
+            'ms': round(seconds * 1000, 1),
+            'sql_statements': sql_statements,
+            'sql_ms': round(sql_seconds * 1000, 1),
+            'template_ms': round(template_seconds * 1000, 1),
+            'upload_bytes': upload_bytes
+        })
+    
+    for query, parameters in slow_queries:
+        plan = explain_statement(query['statement'], parameters) if config['SLOW_QUERY_EXPLAIN'] and parameters is not None else None
+        write_slow_log('slow_query', {'endpoint': endpoint, 'path': request.path, **query, 'plan': plan})
+    
+    return response
+
+def init_instrumentation(app):
+    """Time requests, SQL and templates for /metrics and the slow log; call within an app context"""
+    if not app.config['METRICS_ENABLED']:
+        return
+    
+    install_sql_timing(db.engine)
+    app.before_request(_start_request)
+    app.after_request(_finish_request)
+    before_render_template.connect(_template_started, app)
+    template_rendered.connect(_template_rendered, app)
+    
+    path = app.config['SLOW_LOG_FILE']
+    if path and not any(getattr(h, 'baseFilename', None) == os.path.abspath(path) for h in logger.handlers):
+        handler = logging.FileHandler(path)
+        handler.setFormatter(logging.Formatter('%(message)s'))
+        logger.addHandler(handler)
@@ -0,0 +1,141 @@
+from datetime import datetime
+from sqlalchemy import inspect, text
+from utils import normalize_phone, normalize_plate
+from models import db
+from services.search import install_search_indexes
+from services.inbox import rebuild_inbox_counters
+
+# Versioned schema changes for databases created before a model change.
+# ``db.create_all()`` only creates missing tables, so anything added to an
+# existing table (indexes, columns) must be registered here with the next
+# version number. Steps receive a connection inside the upgrade transaction
+# and must be safe to run against a freshly created schema.
+MIGRATIONS = []
+
+def migration(version, name):
+    """Register a schema migration step"""
+    def decorator(f):
+        MIGRATIONS.append((version, name, f))
+        MIGRATIONS.sort(key=lambda m: m[0])
+        return f
+    return decorator
+
+def create_indexes(conn, *names):
+    """Create the named model indexes if they do not exist yet"""
+    for table in db.metadata.sorted_tables:
+        for index in table.indexes:
+            if index.name in names:
+                index.create(conn, checkfirst=True)
+
+def add_column(conn, table_name, column_ddl):
+    """Add a column to an existing table unless it is already present"""
+    column_name = column_ddl.split()[0]
+    existing = {c['name'] for c in inspect(conn).get_columns(table_name)}
+    if column_name not in existing:
+        conn.execute(text(f'ALTER TABLE {table_name} ADD COLUMN {column_ddl}'))
+
+def _ensure_version_table(conn):
+    conn.execute(text(
+        'CREATE TABLE IF NOT EXISTS schema_migrations ('
+        'version INTEGER PRIMARY KEY, '
+        'name VARCHAR(200) NOT NULL, '
+        'applied_at TIMESTAMP NOT NULL)'
+    ))
+
+def current_version(conn):
+    _ensure_version_table(conn)
+    return conn.execute(text('SELECT MAX(version) FROM schema_migrations')).scalar() or 0
+
+def run_migrations():
+    """Apply every pending migration, each in its own transaction"""
+    applied = []
+    with db.engine.begin() as conn:
+        version = current_version(conn)
+    
+    for step_version, name, step in MIGRATIONS:
+        if step_version <= version:
+            continue
+        with db.engine.begin() as conn:
+            step(conn)
+            conn.execute(
+                text('INSERT INTO schema_migrations (version, name, applied_at) VALUES (:v, :n, :t)'),
+                {'v': step_version, 'n': name, 't': datetime.utcnow()}
+            )
+        applied.append((step_version, name))
+    
+    return applied
+
+@migration(1, 'add secondary indexes for hot queries')
+def _add_secondary_indexes(conn):
+    create_indexes(
+        conn,
+        'ix_authorities_is_active_name',
+        'ix_authorities_designation',
+        'ix_visitors_entry_time',
+        'ix_visitors_status_exit_time',
+        'ix_visitors_authority_id',
+        'ix_bus_entries_entry_time',
+        'ix_bus_entries_status_entry_time',
+        'ix_bus_entries_vehicle_type_entry_time',
+        'ix_notifications_is_read_created_at',
+        'ix_notifications_created_at',
+        'ix_notifications_visitor_id'
+    )
+
+@migration(2, 'add full-text search indexes')
+def _add_search_indexes(conn):
+    install_search_indexes(conn)
+
+@migration(3, 'add normalized phone and plate lookup keys')
+def _add_lookup_keys(conn):
+    add_column(conn, 'visitors', 'phone_key VARCHAR(20)')
+    add_column(conn, 'bus_entries', 'plate_key VARCHAR(50)')
+    
+    for table, source, key, normalize in (
+        ('visitors', 'phone', 'phone_key', normalize_phone),
+        ('bus_entries', 'bus_number', 'plate_key', normalize_plate)
+    ):
+        rows = conn.execute(text(f'SELECT id, {source} FROM {table} WHERE {key} IS NULL')).fetchall()
+        if rows:
+            conn.execute(
+                text(f'UPDATE {table} SET {key} = :key WHERE id = :id'),
+                [{'id': row[0], 'key': normalize(row[1])} for row in rows]
+            )
+    
+    create_indexes(conn, 'ix_visitors_phone_key_entry_time', 'ix_bus_entries_plate_key_entry_time')
+
+@migration(4, 'add status index for paginated visitor lists')
+def _add_visitor_status_entry_time_index(conn):
+    create_indexes(conn, 'ix_visitors_status_entry_time')
+
+@migration(5, 'add visitor photo thumbnails')
+def _add_photo_thumb_url(conn):
+    add_column(conn, 'visitors', 'photo_thumb_url VARCHAR(200)')
+
+@migration(6, 'add visitor exit photo reference')
+def _add_exit_photo_url(conn):
+    add_column(conn, 'visitors', 'exit_photo_url VARCHAR(200)')
+
+@migration(7, 'add notification delivery status')
+def _add_notification_delivery_status(conn):
+    add_column(conn, 'notifications', "delivery_status VARCHAR(20) DEFAULT 'none'")
+    add_column(conn, 'notifications', 'delivered_at TIMESTAMP')
+
+@migration(8, 'link authority accounts to their inbox')
+def _add_authority_inboxes(conn):
+    add_column(conn, 'users', 'authority_id VARCHAR(36) REFERENCES authorities(id)')
+    # Authority accounts were created with the authority's email as username
+    conn.execute(text(
+        'UPDATE users SET authority_id = (SELECT MIN(a.id) FROM authorities a WHERE a.email = users.username) '
+        'WHERE authority_id IS NULL'
+    ))
+    create_indexes(conn, 'ix_notifications_authority_id_is_read_created_at')
+    rebuild_inbox_counters(conn)
+
+@migration(9, 'index visitor references removed when visitors are archived')
+def _add_archive_lookup_indexes(conn):
+    create_indexes(conn, 'ix_expected_visitors_visitor_id', 'ix_notification_events_visitor_id')
+
+@migration(10, 'add sheets outbox status for claimed and dead rows')
+def _add_sheets_outbox_status(conn):
+    add_column(conn, 'sheets_outbox', "status VARCHAR(20) NOT NULL DEFAULT 'pending'")
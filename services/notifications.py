@@ -0,0 +1,357 @@
+import json
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+import requests
+from requests.adapters import HTTPAdapter
+from flask import current_app
+from sqlalchemy import event, select
+from sqlalchemy.orm import Session
+from models import db, Authority, Visitor, Notification, NotificationEvent, NotificationDelivery
+from services.authorities import get_principal_id, PRINCIPAL_DESIGNATION
+from services.events import queue_event
+from services.inbox import record_notification
+from services.sql import claim_rows
+
+logger = logging.getLogger(__name__)
+
+# Notification fan-out. Request handlers only add one notification_events row
+# in their own transaction. After it commits, a small worker pool expands
+# each event into its recipients (the Principal gets a copy of every request
+# assigned to someone else), writes their in-app Notification rows and one
+# notification_deliveries row per configured channel, then sends the
+# deliveries in batches through each channel's transport, subject to the
+# channel's per-minute rate limit. Failed deliveries are retried with backoff
+# until NOTIFICATION_MAX_ATTEMPTS; Notification.delivery_status summarises
+# them. A periodic sweep picks up retries and anything a restart interrupted.
+# Every process (gunicorn workers included) runs its own sweep, so events and
+# deliveries are claimed with a conditional UPDATE before they are processed.
+_executor = ThreadPoolExecutor(max_workers=3, thread_name_prefix='notify')
+_expand_lock = threading.Lock()
+_channel_locks = {}
+_transports = {}
+_limiters = {}
+_registry_lock = threading.Lock()
+_sweeper_started = False
+
+# A worker that stops mid-send leaves its deliveries 'sending'; they are due again after this long
+CLAIM_SECONDS = 300
+
+# Authority attribute used as the recipient address on each channel; other
+# channels address the authority by id
+ADDRESS_FIELDS = {'email': 'email', 'sms': 'phone'}
+
+class FakeTransport:
+    """Keeps sent messages in memory instead of delivering them; for tests and local development"""
+    
+    def __init__(self, fail_with=None):
+        self.sent = []
+        self.fail_with = fail_with
+    
+    def send(self, messages):
+        if self.fail_with:
+            return [self.fail_with] * len(messages)
+        self.sent.extend(messages)
+        return [None] * len(messages)
+
+class WebhookTransport:
+    """Posts each batch of messages as one JSON request"""
+    
+    def __init__(self, url, timeout=10):
+        self.url = url
+        self.timeout = timeout
+        self.http = requests.Session()
+        self.http.mount('https://', HTTPAdapter(pool_maxsize=2, max_retries=0))
+        self.http.mount('http://', HTTPAdapter(pool_maxsize=2, max_retries=0))
+    
+    def send(self, messages):
+        try:
+            response = self.http.post(self.url, json={'messages': messages}, timeout=self.timeout)
+            response.raise_for_status()
+        except requests.RequestException as e:
+            return [str(e)] * len(messages)
+        return [None] * len(messages)
+
+class RateLimiter:
+    """Token bucket allowing ``per_minute`` messages, refilled continuously"""
+    
+    def __init__(self, per_minute):
+        self.rate = per_minute / 60
+        self.capacity = per_minute
+        self.tokens = per_minute
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+    
+    def take(self, wanted):
+        """Take up to ``wanted`` tokens and return how many were granted"""
+        with self.lock:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            granted = min(wanted, int(self.tokens))
+            self.tokens -= granted
+            return granted
+    
+    def give_back(self, unused):
+        with self.lock:
+            self.tokens = min(self.capacity, self.tokens + unused)
+
+def register_transport(channel, transport, per_minute=None):
+    """Deliver notifications on ``channel`` through ``transport``, optionally rate limited"""
+    with _registry_lock:
+        _transports[channel] = transport
+        _channel_locks.setdefault(channel, threading.Lock())
+        if per_minute:
+            _limiters[channel] = RateLimiter(per_minute)
+        else:
+            _limiters.pop(channel, None)
+
+def configure_transports(app):
+    """Register the transports named in NOTIFICATION_CHANNELS"""
+    limits = app.config['NOTIFICATION_RATE_LIMITS']
+    for channel in app.config['NOTIFICATION_CHANNELS']:
+        if channel in _transports:
+            continue
+        if channel == 'webhook' and app.config['NOTIFICATION_WEBHOOK_URL']:
+            register_transport(channel, WebhookTransport(app.config['NOTIFICATION_WEBHOOK_URL']), limits.get(channel))
+        elif channel == 'fake':
+            register_transport(channel, FakeTransport(), limits.get(channel))
+        else:
+            logger.warning('No transport available for notification channel %s', channel)
+
+def get_transport(channel):
+    return _transports.get(channel)
+
+def enqueue_notification(event_type, visitor_id, authority_id, **data):
+    """Queue a notification event in the current transaction; it is dispatched after commit"""
+    db.session.add(NotificationEvent(
+        type=event_type,
+        visitor_id=visitor_id,
+        authority_id=authority_id,
+        payload=json.dumps(data, default=str)
+    ))
+    db.session.info['notification_app'] = current_app._get_current_object()
+
+@event.listens_for(Session, 'after_commit')
+def _dispatch_after_commit(session):
+    app = session.info.pop('notification_app', None)
+    if app is not None:
+        schedule_dispatch(app)
+
+@event.listens_for(Session, 'after_rollback')
+def _discard_dispatch(session):
+    session.info.pop('notification_app', None)
+
+def schedule_dispatch(app):
+    return _executor.submit(_dispatch, app)
+
+def _dispatch(app):
+    with app.app_context():
+        try:
+            expand_pending_events()
+        except Exception:
+            db.session.rollback()
+            logger.exception('Failed to expand notification events')
+        
+        for channel in list(_transports):
+            _executor.submit(_deliver_channel, app, channel)
+
+def _deliver_channel(app, channel):
+    with app.app_context():
+        try:
+            deliver_pending(channel)
+        except Exception:
+            db.session.rollback()
+            logger.exception('Failed to deliver %s notifications', channel)
+
+def _recipients(notification_event):
+    """Return ``(authority, title, message)`` for everyone an event notifies"""
+    authority = db.session.get(Authority, notification_event.authority_id) if notification_event.authority_id else None
+    if notification_event.type != 'visitor_request' or authority is None:
+        return []
+    
+    data = json.loads(notification_event.payload)
+    request_text = f"{data.get('name')} ({data.get('email')}) is requesting permission to enter. Purpose: {data.get('purpose')}"
+    recipients = [(authority, 'New Visitor Permission Request', request_text)]
+    
+    # Also notify admin if authority is not Principal
+    principal_id = get_principal_id() if authority.designation != PRINCIPAL_DESIGNATION else None
+    principal = db.session.get(Authority, principal_id) if principal_id else None
+    if principal:
+        recipients.append((
+            principal,
+            'New Visitor Permission Request (Admin Copy)',
+            f'{request_text}. Assigned to: {authority.name}'
+        ))
+    
+    return recipients
+
+def _address(authority, channel):
+    field = ADDRESS_FIELDS.get(channel)
+    return getattr(authority, field) if field else authority.id
+
+def expand_pending_events(batch_size=100):
+    """Turn pending notification events into Notification and delivery rows; return how many were expanded"""
+    with _expand_lock:
+        expanded = 0
+        while True:
+            candidates = db.session.scalars(
+                select(NotificationEvent.id).where(NotificationEvent.status == 'pending').order_by(
+                    NotificationEvent.id
+                ).limit(batch_size)
+            ).all()
+            if not candidates:
+                db.session.commit()
+                return expanded
+            
+            # Claimed in the transaction that writes the notifications, so an
+            # event is expanded exactly once even when several processes sweep
+            claimed = claim_rows(NotificationEvent, candidates, NotificationEvent.status == 'pending', status='expanded')
+            events = NotificationEvent.query.filter(NotificationEvent.id.in_(claimed)).order_by(NotificationEvent.id).all()
+            
+            channels = list(_transports)
+            for notification_event in events:
+                visitor = db.session.get(Visitor, notification_event.visitor_id) if notification_event.visitor_id else None
+                # A request decided before it was dispatched is recorded but not sent
+                decided = visitor is not None and visitor.status != 'pending'
+                
+                for authority, title, message in _recipients(notification_event):
+                    notification = Notification(
+                        visitor_id=notification_event.visitor_id,
+                        authority_id=authority.id,
+                        type=notification_event.type,
+                        title=title,
+                        message=message,
+                        is_read=decided
+                    )
+                    deliveries = [] if decided else [
+                        NotificationDelivery(channel=channel, recipient=_address(authority, channel))
+                        for channel in channels if _address(authority, channel)
+                    ]
+                    notification.delivery_status = 'pending' if deliveries else 'none'
+                    notification.deliveries = deliveries
+                    db.session.add(notification)
+                    record_notification(notification)
+                    queue_event(db.session, 'notification', visitor_id=notification_event.visitor_id, authority_id=authority.id)
+            
+            db.session.commit()
+            expanded += len(events)
+
+def deliver_pending(channel):
+    """Send due deliveries on one channel in batches; return how many were sent"""
+    transport = _transports.get(channel)
+    lock = _channel_locks.get(channel)
+    if transport is None:
+        return 0
+    
+    config = current_app.config
+    with lock:
+        sent = 0
+        while True:
+            wanted = config['NOTIFICATION_BATCH_SIZE']
+            limiter = _limiters.get(channel)
+            if limiter:
+                wanted = limiter.take(wanted)
+                if not wanted:
+                    # Out of budget; the next sweep continues
+                    db.session.commit()
+                    return sent
+            
+            now = datetime.utcnow()
+            due = (
+                NotificationDelivery.channel == channel,
+                NotificationDelivery.status.in_(('pending', 'sending')),
+                NotificationDelivery.next_attempt_at <= now
+            )
+            candidates = db.session.scalars(
+                select(NotificationDelivery.id).where(*due).order_by(NotificationDelivery.id).limit(wanted)
+            ).all()
+            # Only what this worker claimed is sent; another process may hold the rest
+            claimed = claim_rows(
+                NotificationDelivery, candidates, *due,
+                status='sending', next_attempt_at=now + timedelta(seconds=CLAIM_SECONDS)
+            )
+            db.session.commit()
+            if limiter:
+                limiter.give_back(wanted - len(claimed))
+            if not claimed:
+                return sent
+            deliveries = NotificationDelivery.query.filter(
+                NotificationDelivery.id.in_(claimed)
+            ).order_by(NotificationDelivery.id).all()
+            
+            notifications = {n.id: n for n in Notification.query.filter(
+                Notification.id.in_({d.notification_id for d in deliveries})
+            )}
+            messages = [{
+                'delivery_id': d.id,
+                'channel': channel,
+                'recipient': d.recipient,
+                'title': notifications[d.notification_id].title,
+                'message': notifications[d.notification_id].message,
+                'visitor_id': notifications[d.notification_id].visitor_id,
+                'authority_id': notifications[d.notification_id].authority_id
+            } for d in deliveries]
+            
+            errors = transport.send(messages)
+            for delivery, error in zip(deliveries, errors):
+                delivery.attempts += 1
+                if error is None:
+                    delivery.status = 'sent'
+                    delivery.sent_at = now
+                    delivery.last_error = None
+                    sent += 1
+                else:
+                    delivery.last_error = str(error)[:500]
+                    if delivery.attempts >= config['NOTIFICATION_MAX_ATTEMPTS']:
+                        delivery.status = 'failed'
+                    else:
+                        delay = min(config['NOTIFICATION_RETRY_SECONDS'] * 2 ** (delivery.attempts - 1), 3600)
+                        delivery.status = 'pending'
+                        delivery.next_attempt_at = now + timedelta(seconds=delay)
+            
+            db.session.flush()
+            _update_delivery_status(notifications.values(), now)
+            db.session.commit()
+            
+            if len(candidates) < wanted:
+                return sent
+
+def _update_delivery_status(notifications, now):
+    """Summarise each notification's deliveries: any pending or sending wins, then any failure"""
+    statuses = {}
+    for notification_id, status in db.session.query(
+        NotificationDelivery.notification_id, NotificationDelivery.status
+    ).filter(
+        NotificationDelivery.notification_id.in_([n.id for n in notifications])
+    ).group_by(NotificationDelivery.notification_id, NotificationDelivery.status):
+        statuses.setdefault(notification_id, set()).add(status)
+    
+    for notification in notifications:
+        found = statuses.get(notification.id, set())
+        if found & {'pending', 'sending'}:
+            status = 'pending'
+        elif 'failed' in found:
+            status = 'failed'
+        else:
+            status = 'delivered'
+        if status != notification.delivery_status:
+            notification.delivery_status = status
+            if status == 'delivered':
+                notification.delivered_at = now
+
+def start_dispatcher(app):
+    """Sweep for due work every NOTIFICATION_POLL_SECONDS in a daemon thread"""
+    global _sweeper_started
+    if _sweeper_started or app.testing:
+        return
+    
+    def run():
+        while True:
+            schedule_dispatch(app)
+            time.sleep(app.config['NOTIFICATION_POLL_SECONDS'])
+    
+    threading.Thread(target=run, name='notify-sweeper', daemon=True).start()
+    _sweeper_started = True
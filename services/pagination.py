@@ -0,0 +1,98 @@
+import base64
+import time
+from datetime import datetime
+from flask import current_app
+from sqlalchemy import and_, or_, func, select
+
+# Keyset pagination over (entry_time, id), newest first; models without an
+# entry_time pass ``time_attr`` (notifications use created_at). A cursor
+# encodes the sort key of the last row seen, so every page is an index range scan of
+# ``per_page`` rows no matter how deep the client has paged, and no COUNT(*)
+# is needed to render a page.
+
+class KeysetPage:
+    def __init__(self, items, next_cursor=None, prev_cursor=None):
+        self.items = items
+        self.next_cursor = next_cursor
+        self.prev_cursor = prev_cursor
+    
+    @property
+    def has_next(self):
+        return self.next_cursor is not None
+    
+    @property
+    def has_prev(self):
+        return self.prev_cursor is not None
+
+def encode_cursor(record, time_attr='entry_time'):
+    raw = f'{getattr(record, time_attr).isoformat()}|{record.id}'
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+def decode_cursor(cursor):
+    """Return the (entry_time, id) encoded in a cursor; raises ValueError if malformed"""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)).decode()
+        entry_time, record_id = raw.split('|', 1)
+        return datetime.fromisoformat(entry_time), record_id
+    except (ValueError, UnicodeDecodeError) as e:
+        raise ValueError('Invalid cursor') from e
+
+def page_size(requested, default=20):
+    """Clamp a client supplied page size to the configured maximum"""
+    if not requested or requested < 1:
+        return default
+    return min(requested, current_app.config['API_MAX_PAGE_SIZE'])
+
+def keyset_paginate(query, model, after=None, before=None, per_page=20, time_attr='entry_time'):
+    """Return the page of ``query`` after or before the given cursor"""
+    time_col, id_col = getattr(model, time_attr), model.id
+    
+    if before:
+        entry_time, record_id = decode_cursor(before)
+        rows = query.filter(or_(
+            time_col > entry_time,
+            and_(time_col == entry_time, id_col > record_id)
+        )).order_by(time_col.asc(), id_col.asc()).limit(per_page + 1).all()
+        has_more = len(rows) > per_page
+        rows = rows[:per_page][::-1]
+        return KeysetPage(
+            rows,
+            next_cursor=encode_cursor(rows[-1], time_attr) if rows else None,
+            prev_cursor=encode_cursor(rows[0], time_attr) if has_more else None
+        )
+    
+    if after:
+        entry_time, record_id = decode_cursor(after)
+        query = query.filter(or_(
+            time_col < entry_time,
+            and_(time_col == entry_time, id_col < record_id)
+        ))
+    
+    rows = query.order_by(time_col.desc(), id_col.desc()).limit(per_page + 1).all()
+    has_more = len(rows) > per_page
+    rows = rows[:per_page]
+    return KeysetPage(
+        rows,
+        next_cursor=encode_cursor(rows[-1], time_attr) if has_more else None,
+        prev_cursor=encode_cursor(rows[0], time_attr) if after and rows else None
+    )
+
+_count_cache = {}
+
+def cached_count(query):
+    """COUNT(*) of a query, reused for COUNT_CACHE_SECONDS per distinct filter"""
+    statement = query.statement
+    key = str(statement.compile(compile_kwargs={'literal_binds': True}))
+    now = time.monotonic()
+    
+    cached = _count_cache.get(key)
+    if cached and now - cached[1] < current_app.config['COUNT_CACHE_SECONDS']:
+        return cached[0]
+    
+    total = query.session.execute(
+        select(func.count()).select_from(statement.order_by(None).subquery())
+    ).scalar()
+    if len(_count_cache) >= 1000:
+        _count_cache.clear()
+    _count_cache[key] = (total, now)
+    return total
@@ -0,0 +1,106 @@
+import hashlib
+import os
+import tempfile
+import time
+from datetime import datetime, timedelta
+from flask import current_app
+from models import db, PhotoBlob
+from utils import allowed_file
+from services.sql import upsert_increment
+
+# Content-addressed photo storage. Each file is named by the SHA-256 of its
+# bytes and fanned out into two levels of subdirectories
+# (blobs/ab/cd/abcd....jpg), so identical uploads are stored once and no
+# directory grows past a few hundred entries. photo_blobs.ref_count tracks
+# how many visitor columns point at each blob; blobs nobody references are
+# deleted by collect_garbage() once they are older than the grace period.
+BLOB_FOLDER = 'blobs'
+BLOB_URL_PREFIX = f'/static/uploads/{BLOB_FOLDER}/'
+
+def _blob_root():
+    return os.path.join(current_app.config['UPLOAD_FOLDER'], BLOB_FOLDER)
+
+def _blob_path(key):
+    return os.path.join(_blob_root(), key[:2], key[2:4], key)
+
+def blob_key(url):
+    """Return the blob key for a stored URL, or None for files outside the store"""
+    if url and url.startswith(BLOB_URL_PREFIX):
+        return url.rsplit('/', 1)[1]
+    return None
+
+def blob_url(key):
+    return f'{BLOB_URL_PREFIX}{key[:2]}/{key[2:4]}/{key}'
+
+def store_bytes(data, ext):
+    """Store ``data`` under its content hash and return its URL"""
+    key = hashlib.sha256(data).hexdigest() + ext.lower()
+    path = _blob_path(key)
+    
+    if not os.path.exists(path):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Write then rename so readers never see a partial file
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path))
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+    else:
+        # Refresh the mtime so a concurrent garbage collection keeps it
+        os.utime(path)
+    
+    return blob_url(key)
+
+def save_upload(file):
+    """Store an uploaded image and return its URL, or None if not allowed"""
+    if not file or not allowed_file(file.filename):
+        return None
+    ext = os.path.splitext(file.filename)[1]
+    return store_bytes(file.read(), ext)
+
+def blob_path_for_url(url):
+    return _blob_path(blob_key(url))
+
+def acquire(url):
+    """Record a new reference to a stored photo within the current transaction"""
+    key = blob_key(url)
+    if key:
+        upsert_increment(PhotoBlob, {'key': key}, 'ref_count', 1)
+
+def release(url):
+    """Drop a reference to a stored photo within the current transaction"""
+    key = blob_key(url)
+    if key:
+        upsert_increment(PhotoBlob, {'key': key}, 'ref_count', -1)
+
+def collect_garbage(grace_seconds=None):
+    """Delete unreferenced blobs older than the grace period; return how many"""
+    if grace_seconds is None:
+        grace_seconds = current_app.config['PHOTO_GC_GRACE_SECONDS']
+    cutoff = time.time() - grace_seconds
+    
+    referenced = {key for key, in db.session.query(PhotoBlob.key).filter(PhotoBlob.ref_count > 0)}
+    removed = []
+    
+    for dirpath, _, filenames in os.walk(_blob_root()):
+        for filename in filenames:
+            path = os.path.join(dirpath, filename)
+            if filename in referenced or os.path.getmtime(path) > cutoff:
+                continue
+            os.remove(path)
+            removed.append(filename)
+    
+    # Rows for blobs that are no longer referenced and past the grace period
+    db.session.query(PhotoBlob).filter(
+        PhotoBlob.ref_count <= 0,
+        PhotoBlob.updated_at < datetime.utcnow() - timedelta(seconds=grace_seconds)
+    ).delete(synchronize_session=False)
+    db.session.commit()
+    
+    for dirpath, _, _ in os.walk(_blob_root(), topdown=False):
+        if dirpath != _blob_root():
+            try:
+                os.rmdir(dirpath)
+            except OSError:
+                pass  # not empty
+    
+    return len(removed)
@@ -0,0 +1,43 @@
+import logging
+from flask import g, has_app_context, current_app, request
+from sqlalchemy import event
+
+logger = logging.getLogger(__name__)
+
+class QueryBudgetExceeded(AssertionError):
+    """Raised when an endpoint runs more SQL statements than it is allowed"""
+
+def _count_query(conn, cursor, statement, parameters, context, executemany):
+    if has_app_context():
+        g.query_count = g.get('query_count', 0) + 1
+
+def install_query_counter(engine):
+    """Count every SQL statement executed within the current app context"""
+    if not event.contains(engine, 'before_cursor_execute', _count_query):
+        event.listen(engine, 'before_cursor_execute', _count_query)
+
+def query_count():
+    return g.get('query_count', 0)
+
+def query_budget(max_queries):
+    """Fail (in testing) or warn when the view runs more than ``max_queries`` statements.
+    
+    Guards endpoints against N+1 relationship loads creeping back in: the
+    budget is the number of queries the view needs regardless of page size.
+    """
+    def decorator(f):
+        def decorated_function(*args, **kwargs):
+            start = query_count()
+            response = f(*args, **kwargs)
+            used = query_count() - start
+            
+            if used > max_queries:
+                message = f'{request.endpoint} ran {used} queries (budget {max_queries})'
+                if current_app.testing or current_app.config.get('QUERY_BUDGET_ENFORCE'):
+                    raise QueryBudgetExceeded(message)
+                logger.warning(message)
+            
+            return response
+        decorated_function.__name__ = f.__name__
+        return decorated_function
+    return decorator
@@ -0,0 +1,87 @@
+from datetime import datetime, timedelta
+from sqlalchemy import text
+from models import db, Visitor, BusEntry, Notification, Authority, ARCHIVE_TABLES
+
+def explain_prefix(dialect_name):
+    return 'EXPLAIN QUERY PLAN ' if dialect_name == 'sqlite' else 'EXPLAIN '
+
+def explain(statement, params=None):
+    """Return the database query plan for a SQL string or SQLAlchemy query as text lines"""
+    bind = db.session.get_bind()
+    if hasattr(statement, 'statement'):
+        statement = statement.statement
+    if not isinstance(statement, str):
+        compiled = statement.compile(bind, compile_kwargs={'literal_binds': True})
+        statement = str(compiled)
+    
+    rows = db.session.execute(text(explain_prefix(bind.dialect.name) + statement), params or {}).fetchall()
+    # SQLite returns (id, parent, notused, detail); PostgreSQL returns one text column
+    return [row[-1] for row in rows]
+
+def is_full_scan(plan):
+    """True if any step of the plan reads a whole table without an index"""
+    for line in plan:
+        if line.startswith('SCAN ') and ' USING ' not in line:
+            return True
+        if 'Seq Scan' in line:
+            return True
+    return False
+
+def hot_queries():
+    """The filters and orderings used on the busiest pages, keyed by description"""
+    start = datetime.combine(datetime.now().date(), datetime.min.time())
+    end = start + timedelta(days=1)
+    return {
+        'visitors entered today': Visitor.query.filter(
+            Visitor.entry_time >= start, Visitor.entry_time < end
+        ),
+        'active visitors for exit': Visitor.query.filter(
+            Visitor.status.in_(['approved', 'pending']),
+            Visitor.exit_time.is_(None)
+        ).order_by(Visitor.entry_time.desc()),
+        'returning visitor by phone': Visitor.query.filter_by(
+            phone_key=''
+        ).order_by(Visitor.entry_time.desc()).limit(1),
+        'visitors by authority': Visitor.query.filter_by(authority_id=''),
+        'recent visitors': Visitor.query.order_by(Visitor.entry_time.desc()).limit(5),
+        'active vehicles for exit': BusEntry.query.filter_by(
+            status='entered'
+        ).order_by(BusEntry.entry_time.desc()),
+        'active buses for exit': BusEntry.query.filter_by(
+            status='entered', vehicle_type='bus'
+        ).order_by(BusEntry.entry_time.desc()),
+        'returning vehicle by number': BusEntry.query.filter_by(
+            plate_key=''
+        ).order_by(BusEntry.entry_time.desc()).limit(1),
+        'vehicles by type': BusEntry.query.filter_by(
+            vehicle_type='bus'
+        ).order_by(BusEntry.entry_time.desc()),
+        'unread notifications': Notification.query.filter_by(
+            is_read=False
+        ).order_by(Notification.created_at.desc()),
+        'notifications for visitor': Notification.query.filter_by(visitor_id=''),
+        'unread inbox': Notification.query.filter_by(
+            authority_id='', is_read=False
+        ).order_by(Notification.created_at.desc()),
+        'active authorities': Authority.query.filter_by(
+            is_active=True
+        ).order_by(Authority.name),
+        'principal lookup': Authority.query.filter_by(designation='Principal'),
+        'visitors to archive': Visitor.query.filter(
+            Visitor.status.in_(['exited', 'rejected']), Visitor.entry_time < start
+        ).limit(500),
+        'vehicles to archive': BusEntry.query.filter(
+            BusEntry.status == 'exited', BusEntry.entry_time < start
+        ).order_by(BusEntry.entry_time),
+        'archived visitors by date': db.session.query(ARCHIVE_TABLES[Visitor]).filter(
+            ARCHIVE_TABLES[Visitor].c.entry_time >= start, ARCHIVE_TABLES[Visitor].c.entry_time < end
+        )
+    }
+
+def check_query_plans():
+    """Explain every hot query and return ``[(name, plan, full_scan)]``"""
+    results = []
+    for name, query in hot_queries().items():
+        plan = explain(query)
+        results.append((name, plan, is_full_scan(plan)))
+    return results
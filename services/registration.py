@@ -0,0 +1,57 @@
+from datetime import datetime
+from models import db, Visitor, ExpectedVisitor
+from services import counters
+from services import photo_store
+from services.events import queue_event
+from services.notifications import enqueue_notification
+from services.sheets import queue_sheet_row, visitor_row
+
+def register_visitor(name, phone, email, purpose, authority_id=None, photo_url=None, notes='', created_by='System',
+                     expected_visitor=None):
+    """Record a visitor entry and its permission request in one transaction.
+    
+    Visitors assigned to an authority start out pending and a notification
+    event is queued for the dispatcher, which works out who to notify. The
+    visitor, counters, notification event and live events are committed
+    together, so a failure leaves nothing behind. ``expected_visitor`` is the
+    pre-registration being checked in; a ValueError is raised if it already
+    has been. Returns the new visitor.
+    """
+    requires_permission = bool(authority_id)
+    status = 'pending' if requires_permission else 'approved'
+    
+    visitor = Visitor(
+        name=name,
+        phone=phone,
+        email=email,
+        purpose=purpose,
+        authority_id=authority_id or None,
+        photo_url=photo_url,
+        status=status,
+        authority_permission_granted=not requires_permission,
+        permission_granted_at=None if requires_permission else datetime.utcnow(),
+        created_by=created_by,
+        notes=notes
+    )
+    
+    db.session.add(visitor)
+    photo_store.acquire(photo_url)
+    counters.record_visitor_entry(visitor)
+    db.session.flush()
+    
+    if expected_visitor is not None:
+        # Conditional, so two guards checking in the same person record one visit
+        linked = ExpectedVisitor.query.filter_by(id=expected_visitor.id, visitor_id=None).update(
+            {'visitor_id': visitor.id}, synchronize_session=False
+        )
+        if not linked:
+            raise ValueError(f'{expected_visitor.name} has already checked in')
+    
+    queue_event(db.session, 'visitor_entry', id=visitor.id, name=name, status=status)
+    queue_sheet_row('visitors', 'entry', visitor_row(visitor))
+    
+    if authority_id:
+        enqueue_notification('visitor_request', visitor.id, authority_id, name=name, email=email, purpose=purpose)
+    
+    db.session.commit()
+    return visitor
@@ -0,0 +1,87 @@
+from datetime import timedelta
+from sqlalchemy import func
+from models import db, Visitor, BusEntry, Authority
+from services import counters
+from services.retention import history
+
+# Report summaries computed with grouped SQL over an entry_time range, so the
+# report pages never load the raw rows just to count them. Per-day totals
+# come from the daily_counters rollup; the other summaries read through
+# ``history`` so they include archived records.
+
+def _in_range(model, start_dt, end_dt):
+    return (model.entry_time >= start_dt, model.entry_time < end_dt)
+
+def daily_counts(kind, start_dt, end_dt):
+    """Return ``[{'date', 'count'}]`` for every day in the range"""
+    first_day = start_dt.date()
+    last_day = (end_dt - timedelta(days=1)).date()
+    day_counts = counters.counts_by_day(first_day, last_day)
+    
+    days = []
+    for i in range((last_day - first_day).days + 1):
+        day = first_day + timedelta(days=i)
+        days.append({'date': day.strftime('%Y-%m-%d'), 'count': day_counts.get((day, kind), 0)})
+    return days
+
+def hourly_counts(model, start_dt, end_dt):
+    """Return a list of 24 entry counts, one per hour of the day"""
+    hour = func.extract('hour', model.entry_time)
+    rows = db.session.query(hour, func.count()).filter(
+        *_in_range(model, start_dt, end_dt)
+    ).group_by(hour).all()
+    
+    hours = [0] * 24
+    for h, count in rows:
+        if h is not None:
+            hours[int(h)] = count
+    return hours
+
+def average_dwell_minutes(model, start_dt, end_dt):
+    """Average time between entry and exit for records that have exited"""
+    dwell = func.extract('epoch', model.exit_time) - func.extract('epoch', model.entry_time)
+    seconds = db.session.query(func.avg(dwell)).filter(
+        *_in_range(model, start_dt, end_dt),
+        model.exit_time.isnot(None)
+    ).scalar()
+    return round(seconds / 60) if seconds is not None else None
+
+def authority_counts(start_dt, end_dt, limit=20):
+    """Return ``[(authority name, count)]`` of visitors, busiest first"""
+    visitors = history(Visitor, start_dt, end_dt)
+    rows = db.session.query(
+        Authority.name, func.count(visitors.id)
+    ).select_from(visitors).outerjoin(
+        Authority, visitors.authority_id == Authority.id
+    ).filter(
+        *_in_range(visitors, start_dt, end_dt)
+    ).group_by(Authority.id, Authority.name).order_by(func.count(visitors.id).desc()).limit(limit).all()
+    return [(name or 'No authority', count) for name, count in rows]
+
+def route_counts(start_dt, end_dt, limit=20):
+    """Return ``[(route, count)]`` of vehicle entries, busiest first"""
+    vehicles = history(BusEntry, start_dt, end_dt)
+    rows = db.session.query(
+        vehicles.route, func.count(vehicles.id)
+    ).filter(
+        *_in_range(vehicles, start_dt, end_dt)
+    ).group_by(vehicles.route).order_by(func.count(vehicles.id).desc()).limit(limit).all()
+    return [(route or 'No route', count) for route, count in rows]
+
+def visitor_summary(start_dt, end_dt):
+    visitors = history(Visitor, start_dt, end_dt)
+    return {
+        'daily': daily_counts(counters.VISITOR, start_dt, end_dt),
+        'hourly': hourly_counts(visitors, start_dt, end_dt),
+        'authorities': authority_counts(start_dt, end_dt),
+        'average_dwell': average_dwell_minutes(visitors, start_dt, end_dt)
+    }
+
+def vehicle_summary(start_dt, end_dt):
+    vehicles = history(BusEntry, start_dt, end_dt)
+    return {
+        'daily': daily_counts(counters.VEHICLE, start_dt, end_dt),
+        'hourly': hourly_counts(vehicles, start_dt, end_dt),
+        'routes': route_counts(start_dt, end_dt),
+        'average_dwell': average_dwell_minutes(vehicles, start_dt, end_dt)
+    }
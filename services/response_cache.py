@@ -0,0 +1,165 @@
+import hashlib
+import threading
+from collections import OrderedDict
+from datetime import date
+from flask import current_app, request, session
+from sqlalchemy import event, update
+from sqlalchemy.orm import Session
+from models import db, TableVersion
+from services.sql import upsert_increment_statement
+
+# Conditional responses for read APIs. Every committed transaction bumps a
+# version number per table it wrote (table_versions), so a view's ETag is a
+# hash of the request, the caller's role, the day and the versions of the
+# tables it reads. A client that sends a matching If-None-Match gets a 304
+# after one small lookup; otherwise the JSON body is served from an in-process
+# LRU, and identical requests that arrive while it is being computed wait for
+# the first one instead of running the same queries again.
+_responses = OrderedDict()
+_inflight = {}
+_lock = threading.Lock()
+
+def _dml_table(statement):
+    table = getattr(statement, 'table', None)
+    return getattr(table, 'name', None)
+
+@event.listens_for(Session, 'after_flush')
+def _record_flushed_tables(session, flush_context):
+    changed = session.info.setdefault('changed_tables', set())
+    for obj in list(session.new) + list(session.dirty) + list(session.deleted):
+        table = getattr(obj, '__table__', None)
+        if table is not None:
+            changed.add(table.name)
+
+@event.listens_for(Session, 'do_orm_execute')
+def _record_statement_table(orm_execute_state):
+    if orm_execute_state.is_insert or orm_execute_state.is_update or orm_execute_state.is_delete:
+        table = _dml_table(orm_execute_state.statement)
+        if table:
+            orm_execute_state.session.info.setdefault('changed_tables', set()).add(table)
+
+@event.listens_for(Session, 'before_commit')
+def _bump_changed_tables(session):
+    # Flush first so the changes still pending in the unit of work are recorded
+    session.flush()
+    changed = session.info.pop('changed_tables', None)
+    if not changed:
+        return
+    
+    # Bumped in the writer's own transaction, so a version and the data it
+    # describes commit (or roll back) together. Sorted, so writers touching
+    # several tables take the version rows in the same order.
+    conn = session.connection()
+    for table in sorted(changed):
+        bump_version(conn, table)
+
+@event.listens_for(Session, 'after_rollback')
+def _discard_changed_tables(session):
+    session.info.pop('changed_tables', None)
+
+def bump_version(conn, table):
+    """Increment a table's change version on ``conn``"""
+    stmt = upsert_increment_statement(conn.dialect.name, TableVersion, {'table_name': table}, 'version', 1)
+    if stmt is not None:
+        conn.execute(stmt)
+        return
+    
+    updated = conn.execute(
+        update(TableVersion).where(TableVersion.table_name == table).values(version=TableVersion.version + 1)
+    ).rowcount
+    if not updated:
+        conn.execute(TableVersion.__table__.insert().values(table_name=table, version=1))
+
+def table_versions(tables):
+    """Return the current change version of each table, 0 for tables never written"""
+    rows = dict(db.session.query(TableVersion.table_name, TableVersion.version).filter(
+        TableVersion.table_name.in_(tables)
+    ))
+    return tuple(rows.get(table, 0) for table in tables)
+
+def _store(key, entry):
+    with _lock:
+        _responses[key] = entry
+        _responses.move_to_end(key)
+        while len(_responses) > current_app.config['RESPONSE_CACHE_SIZE']:
+            _responses.popitem(last=False)
+
+def _lookup(key):
+    with _lock:
+        entry = _responses.get(key)
+        if entry is not None:
+            _responses.move_to_end(key)
+        return entry
+
+def _compute_once(key, compute):
+    """Return ``(entry, response)`` for ``key``, running ``compute`` at most once concurrently.
+    
+    ``entry`` is the cached ``(body, mimetype)`` pair; ``response`` is set
+    instead when the view returned something that must not be cached, such
+    as an error.
+    """
+    with _lock:
+        entry = _responses.get(key)
+        waiter = _inflight.get(key) if entry is None else None
+        leader = entry is None and waiter is None
+        if leader:
+            _inflight[key] = threading.Event()
+    
+    if entry is not None:
+        return entry, None
+    
+    if not leader:
+        waiter.wait(timeout=30)
+        entry = _lookup(key)
+        if entry is not None:
+            return entry, None
+        # The first request failed or was not cacheable; compute our own answer
+        response = compute()
+        return None, response
+    
+    try:
+        response = compute()
+        if response.status_code != 200 or response.is_streamed:
+            return None, response
+        entry = (response.get_data(), response.mimetype)
+        _store(key, entry)
+        return entry, None
+    finally:
+        with _lock:
+            _inflight.pop(key).set()
+
+def cached_response(*tables, per_user=False):
+    """Serve a JSON view with an ETag derived from the versions of ``tables``.
+    
+    The view must depend only on its URL, the caller's role, the date and the
+    contents of ``tables``; views that show the caller's own data also pass
+    ``per_user``.
+    """
+    def decorator(f):
+        def decorated_function(*args, **kwargs):
+            key_parts = (
+                request.path,
+                sorted(request.args.items(multi=True)),
+                session.get('role'),
+                session.get('user_id') if per_user else None,
+                date.today().isoformat(),
+                table_versions(tables)
+            )
+            key = hashlib.sha1(repr(key_parts).encode()).hexdigest()
+            
+            if request.if_none_match.contains(key):
+                response = current_app.response_class(status=304)
+            else:
+                entry, response = _compute_once(key, lambda: current_app.make_response(f(*args, **kwargs)))
+                if response is not None:
+                    return response
+                body, mimetype = entry
+                response = current_app.response_class(body, mimetype=mimetype)
+            
+            response.set_etag(key)
+            response.cache_control.private = True
+            response.cache_control.no_cache = True
+            return response
+        decorated_function.__name__ = f.__name__
+        return decorated_function
+    return decorator
@@ -0,0 +1,187 @@
+import logging
+import threading
+import time
+from collections import Counter
+from datetime import datetime, timedelta
+from flask import current_app, g, has_app_context
+from sqlalchemy import select, func, literal, null, union_all, DateTime
+from sqlalchemy.orm import aliased
+from models import (
+    db, Visitor, BusEntry, ExpectedVisitor, Notification, NotificationEvent, NotificationDelivery,
+    ARCHIVE_TABLES
+)
+from services import photo_store
+from services.inbox import bump_unread
+
+logger = logging.getLogger(__name__)
+
+# Retention for the gate logs. Closed records (visitors who exited or were
+# rejected, vehicles that exited, read notifications) older than
+# RETENTION_DAYS are moved in batches from the hot tables into their archive
+# tables, one short transaction per batch, so the tables the gate screens
+# work on only hold recent and open records. Reports and exports read through
+# ``history``, which adds the archive rows when the date range reaches back
+# far enough. Daily counters are rollups and are kept as they are.
+CLOSED_VISITOR_STATUSES = ('exited', 'rejected')
+CLOSED_VEHICLE_STATUSES = ('exited',)
+
+# Photo references dropped from archived visitors for each RETENTION_PHOTO_MODE;
+# their blobs are then removed by the photo garbage collector
+PHOTO_COLUMNS = {
+    'keep': (),
+    'thumbnail': ('photo_url', 'exit_photo_url'),
+    'delete': ('photo_url', 'photo_thumb_url', 'exit_photo_url')
+}
+
+_retention_started = False
+
+def _archive_reaches(model, start_dt):
+    """True if the model's archive may hold rows entered at or after ``start_dt``"""
+    memo = g.setdefault('archive_latest', {}) if has_app_context() else {}
+    if model not in memo:
+        archive = ARCHIVE_TABLES[model]
+        memo[model] = db.session.execute(select(func.max(archive.c.entry_time))).scalar()
+    latest = memo[model]
+    return latest is not None and latest >= start_dt
+
+def history(model, start_dt, end_dt):
+    """``model`` (Visitor or BusEntry) over its hot and archived rows entered in [start_dt, end_dt).
+    
+    Returns the model itself when nothing archived is that recent, otherwise an
+    alias of the model over the union of both tables that loads and filters
+    like the model. Callers still apply their own entry_time range.
+    """
+    if not _archive_reaches(model, start_dt):
+        return model
+    
+    table, archive = model.__table__, ARCHIVE_TABLES[model]
+    rows = union_all(
+        select(*table.columns).where(table.c.entry_time >= start_dt, table.c.entry_time < end_dt),
+        select(*[archive.c[column.name] for column in table.columns]).where(
+            archive.c.entry_time >= start_dt, archive.c.entry_time < end_dt
+        )
+    ).subquery(f'{table.name}_history')
+    return aliased(model, rows, adapt_on_names=True)
+
+def _move(model, condition, blank=()):
+    """Copy the rows matching ``condition`` into the archive table and delete them; return how many moved.
+    
+    Columns named in ``blank`` are archived as NULL.
+    """
+    table, archive = model.__table__, ARCHIVE_TABLES[model]
+    names = [column.name for column in table.columns]
+    db.session.execute(archive.insert().from_select(
+        names + ['archived_at'],
+        select(
+            *[null().label(column.name) if column.name in blank else column for column in table.columns],
+            literal(datetime.utcnow(), DateTime).label('archived_at')
+        ).where(condition)
+    ))
+    return db.session.execute(table.delete().where(condition)).rowcount
+
+def _archive_notifications(condition):
+    """Archive notifications matching ``condition`` with their deliveries removed and unread counts adjusted"""
+    NotificationDelivery.query.filter(
+        NotificationDelivery.notification_id.in_(select(Notification.id).where(condition))
+    ).delete(synchronize_session=False)
+    
+    for authority_id, unread in db.session.query(Notification.authority_id, func.count()).filter(
+        condition, Notification.is_read == False
+    ).group_by(Notification.authority_id):
+        bump_unread(authority_id, -unread)
+    
+    return _move(Notification, condition)
+
+def _archive_visitor_batch(cutoff, batch_size, photo_mode):
+    moved = Counter()
+    rows = db.session.query(
+        Visitor.id, Visitor.photo_url, Visitor.photo_thumb_url, Visitor.exit_photo_url
+    ).filter(
+        Visitor.status.in_(CLOSED_VISITOR_STATUSES),
+        Visitor.entry_time < cutoff
+    ).limit(batch_size).all()
+    if not rows:
+        return moved
+    ids = [row.id for row in rows]
+    
+    # Rows pointing at the visitors go first
+    moved['notifications'] += _archive_notifications(Notification.visitor_id.in_(ids))
+    NotificationEvent.query.filter(NotificationEvent.visitor_id.in_(ids)).delete(synchronize_session=False)
+    moved['expected_visitors'] += _move(ExpectedVisitor, ExpectedVisitor.visitor_id.in_(ids))
+    
+    columns = PHOTO_COLUMNS[photo_mode]
+    for row in rows:
+        for column in columns:
+            photo_store.release(getattr(row, column))
+        moved['photos'] += sum(getattr(row, column) is not None for column in columns)
+    
+    moved['visitors'] += _move(Visitor, Visitor.id.in_(ids), blank=columns)
+    return moved
+
+def _archive_vehicle_batch(cutoff, batch_size):
+    ids = db.session.scalars(select(BusEntry.id).where(
+        BusEntry.status.in_(CLOSED_VEHICLE_STATUSES),
+        BusEntry.entry_time < cutoff
+    ).order_by(BusEntry.entry_time).limit(batch_size)).all()
+    return Counter(bus_entries=_move(BusEntry, BusEntry.id.in_(ids)) if ids else 0)
+
+def _archive_notification_batch(cutoff, batch_size):
+    ids = db.session.scalars(select(Notification.id).where(
+        Notification.is_read == True,
+        Notification.created_at < cutoff
+    ).order_by(Notification.created_at).limit(batch_size)).all()
+    return Counter(notifications=_archive_notifications(Notification.id.in_(ids)) if ids else 0)
+
+def archive_closed_records(days=None, batch_size=None, photo_mode=None):
+    """Move closed records older than ``days`` into the archive tables; return moved rows per table.
+    
+    Does nothing when ``days`` is 0, which is also the RETENTION_DAYS default.
+    """
+    config = current_app.config
+    days = config['RETENTION_DAYS'] if days is None else days
+    if not days:
+        return {}
+    batch_size = batch_size or config['RETENTION_BATCH_SIZE']
+    photo_mode = photo_mode or config['RETENTION_PHOTO_MODE']
+    if photo_mode not in PHOTO_COLUMNS:
+        raise ValueError(f'Unknown photo mode {photo_mode!r}; use one of {", ".join(PHOTO_COLUMNS)}')
+    
+    cutoff = datetime.utcnow() - timedelta(days=days)
+    moved = Counter()
+    for archive_batch in (
+        lambda: _archive_visitor_batch(cutoff, batch_size, photo_mode),
+        lambda: _archive_vehicle_batch(cutoff, batch_size),
+        lambda: _archive_notification_batch(cutoff, batch_size)
+    ):
+        while True:
+            batch = archive_batch()
+            db.session.commit()
+            moved.update(batch)
+            if sum(count for table, count in batch.items() if table != 'photos') == 0:
+                break
+    
+    g.pop('archive_latest', None)
+    return {table: count for table, count in moved.items() if count}
+
+def start_retention(app):
+    """Archive closed records every RETENTION_INTERVAL seconds in a daemon thread"""
+    global _retention_started
+    if _retention_started or not app.config['RETENTION_DAYS'] or not app.config['RETENTION_INTERVAL'] or app.testing:
+        return
+    
+    def run():
+        while True:
+            time.sleep(app.config['RETENTION_INTERVAL'])
+            with app.app_context():
+                try:
+                    moved = archive_closed_records()
+                    if moved.get('photos'):
+                        photo_store.collect_garbage()
+                    if moved:
+                        logger.info('Archived %s', ', '.join(f'{n} {table}' for table, n in sorted(moved.items())))
+                except Exception:
+                    db.session.rollback()
+                    logger.exception('Archiving closed records failed')
+    
+    threading.Thread(target=run, name='retention', daemon=True).start()
+    _retention_started = True
@@ -0,0 +1,111 @@
+import re
+from sqlalchemy import text, String
+from models import db, Visitor, BusEntry
+
+# SQLite FTS5 indexes over the searchable visitor and vehicle columns. They
+# use the base tables as external content, so only the inverted index is
+# stored, and triggers keep them in sync on every insert, update and delete
+# regardless of which code path writes the row. Other databases fall back to
+# substring matching.
+SEARCH_INDEXES = {
+    'visitor_search': ('visitors', ['name', 'phone', 'email', 'purpose']),
+    'vehicle_search': ('bus_entries', ['bus_number', 'driver_name', 'route'])
+}
+
+_available = {}
+
+def install_search_indexes(conn):
+    """Create the FTS5 tables and sync triggers and index existing rows"""
+    if conn.dialect.name != 'sqlite':
+        return
+    
+    for index, (table, columns) in SEARCH_INDEXES.items():
+        cols = ', '.join(columns)
+        new_cols = ', '.join(f'new.{c}' for c in columns)
+        old_cols = ', '.join(f'old.{c}' for c in columns)
+        
+        conn.execute(text(
+            f"CREATE VIRTUAL TABLE IF NOT EXISTS {index} USING fts5("
+            f"{cols}, content='{table}', content_rowid='rowid', prefix='2 3')"
+        ))
+        conn.execute(text(
+            f"CREATE TRIGGER IF NOT EXISTS {index}_ai AFTER INSERT ON {table} BEGIN "
+            f"INSERT INTO {index}(rowid, {cols}) VALUES (new.rowid, {new_cols}); END"
+        ))
+        conn.execute(text(
+            f"CREATE TRIGGER IF NOT EXISTS {index}_ad AFTER DELETE ON {table} BEGIN "
+            f"INSERT INTO {index}({index}, rowid, {cols}) VALUES ('delete', old.rowid, {old_cols}); END"
+        ))
+        conn.execute(text(
+            f"CREATE TRIGGER IF NOT EXISTS {index}_au AFTER UPDATE OF {cols} ON {table} BEGIN "
+            f"INSERT INTO {index}({index}, rowid, {cols}) VALUES ('delete', old.rowid, {old_cols}); "
+            f"INSERT INTO {index}(rowid, {cols}) VALUES (new.rowid, {new_cols}); END"
+        ))
+        conn.execute(text(f"INSERT INTO {index}({index}) VALUES ('rebuild')"))
+
+def search_index_available():
+    """True if the FTS5 search tables exist on the current database"""
+    bind = db.session.get_bind()
+    key = str(bind.url)
+    if key not in _available:
+        _available[key] = bind.dialect.name == 'sqlite' and db.session.execute(
+            text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'visitor_search'")
+        ).first() is not None
+    return _available[key]
+
+def match_expression(query):
+    """Turn free text into an FTS5 query that prefix-matches every word"""
+    words = re.findall(r'\w+', query)
+    return ' '.join(f'"{word}"*' for word in words)
+
+def _match_sql(index, table):
+    return (
+        f"SELECT {table}.id FROM {index} JOIN {table} ON {table}.rowid = {index}.rowid "
+        f"WHERE {index} MATCH :match ORDER BY {index}.rank"
+    )
+
+def _matching_ids(index, table, query):
+    return text(_match_sql(index, table)).bindparams(match=match_expression(query)).columns(id=String)
+
+def visitor_search_filter(query):
+    """Filter clause matching visitors by name, phone, email or purpose"""
+    if search_index_available() and match_expression(query):
+        return Visitor.id.in_(_matching_ids('visitor_search', 'visitors', query))
+    return (
+        (Visitor.name.contains(query)) |
+        (Visitor.phone.contains(query)) |
+        (Visitor.email.contains(query))
+    )
+
+def vehicle_search_filter(query):
+    """Filter clause matching vehicles by number, driver or route"""
+    if search_index_available() and match_expression(query):
+        return BusEntry.id.in_(_matching_ids('vehicle_search', 'bus_entries', query))
+    return (
+        (BusEntry.bus_number.contains(query)) |
+        (BusEntry.driver_name.contains(query))
+    )
+
+def _ranked(model, index, table, query, limit):
+    if not (search_index_available() and match_expression(query)):
+        return None
+    ids = [row.id for row in db.session.execute(
+        text(_match_sql(index, table) + ' LIMIT :limit'),
+        {'match': match_expression(query), 'limit': limit}
+    )]
+    records = {r.id: r for r in model.query.filter(model.id.in_(ids)).all()} if ids else {}
+    return [records[i] for i in ids if i in records]
+
+def search_visitors(query, limit=10):
+    """Return the best matching visitors, ranked by relevance when indexed"""
+    ranked = _ranked(Visitor, 'visitor_search', 'visitors', query, limit)
+    if ranked is not None:
+        return ranked
+    return Visitor.query.filter(visitor_search_filter(query)).limit(limit).all()
+
+def search_vehicles(query, limit=10):
+    """Return the best matching vehicles, ranked by relevance when indexed"""
+    ranked = _ranked(BusEntry, 'vehicle_search', 'bus_entries', query, limit)
+    if ranked is not None:
+        return ranked
+    return BusEntry.query.filter(vehicle_search_filter(query)).limit(limit).all()
@@ -0,0 +1,184 @@
+import json
+import logging
+import threading
+from datetime import datetime, timedelta
+import requests
+from requests.adapters import HTTPAdapter
+from flask import current_app
+from sqlalchemy import event, select
+from sqlalchemy.orm import Session
+from models import db, SheetsOutbox
+from services.sql import claim_rows
+
+logger = logging.getLogger(__name__)
+
+# Google Sheets sync through a transactional outbox. Gate handlers add a
+# sheets_outbox row in the same transaction as the visitor or vehicle change,
+# so nothing is lost or sent for a rolled back change, and no HTTP call is
+# made on the request path. A background worker claims due rows in batches of
+# up to GOOGLE_SHEETS_BATCH_SIZE, posts them to GOOGLE_SHEETS_WEBHOOK_URL over
+# one pooled HTTP session, deletes them once the webhook accepts the batch and
+# otherwise retries the batch with exponential backoff. Rows that fail
+# GOOGLE_SHEETS_MAX_ATTEMPTS times are kept as 'dead' until requeued with
+# ``flask sync-sheets --retry-dead``. Delivery is at least once; every row
+# carries its outbox_id so the sheet side can drop repeats.
+_wake = threading.Event()
+_http = None
+_http_lock = threading.Lock()
+_worker_started = False
+
+# A worker that stops mid-batch leaves its rows 'sending'; they are due again after this long
+CLAIM_SECONDS = 300
+
+def _enabled():
+    return current_app.config.get('GOOGLE_SHEETS_ENABLED')
+
+def visitor_row(visitor):
+    return {
+        'id': visitor.id,
+        'name': visitor.name,
+        'phone': visitor.phone,
+        'email': visitor.email,
+        'purpose': visitor.purpose,
+        'status': visitor.status,
+        'authority_id': visitor.authority_id,
+        'entry_time': visitor.entry_time,
+        'exit_time': visitor.exit_time
+    }
+
+def vehicle_row(vehicle):
+    return {
+        'id': vehicle.id,
+        'bus_number': vehicle.bus_number,
+        'vehicle_type': vehicle.vehicle_type,
+        'driver_name': vehicle.driver_name,
+        'route': vehicle.route,
+        'passenger_count': vehicle.passenger_count,
+        'status': vehicle.status,
+        'entry_time': vehicle.entry_time,
+        'exit_time': vehicle.exit_time
+    }
+
+def queue_sheet_rows(sheet, action, rows):
+    """Add outbox rows for ``rows`` (dicts) to the current transaction when Sheets sync is enabled"""
+    if not rows or not _enabled():
+        return
+    
+    db.session.add_all(
+        SheetsOutbox(sheet=sheet, action=action, payload=json.dumps(row, default=str)) for row in rows
+    )
+    db.session.info['sheets_queued'] = True
+
+def queue_sheet_row(sheet, action, row):
+    queue_sheet_rows(sheet, action, [row])
+
+@event.listens_for(Session, 'after_commit')
+def _wake_worker(session):
+    if session.info.pop('sheets_queued', False):
+        _wake.set()
+
+@event.listens_for(Session, 'after_rollback')
+def _discard_queued(session):
+    session.info.pop('sheets_queued', None)
+
+def _http_session():
+    global _http
+    with _http_lock:
+        if _http is None:
+            _http = requests.Session()
+            _http.mount('https://', HTTPAdapter(pool_maxsize=2, max_retries=0))
+            _http.mount('http://', HTTPAdapter(pool_maxsize=2, max_retries=0))
+        return _http
+
+def send_batch():
+    """Claim and post the next batch of due outbox rows; return how many were delivered"""
+    config = current_app.config
+    now = datetime.utcnow()
+    due = (SheetsOutbox.status.in_(('pending', 'sending')), SheetsOutbox.next_attempt_at <= now)
+    candidates = db.session.scalars(
+        select(SheetsOutbox.id).where(*due).order_by(SheetsOutbox.id).limit(config['GOOGLE_SHEETS_BATCH_SIZE'])
+    ).all()
+    # Another worker may have claimed some of them since; only send what this one got
+    claimed = claim_rows(
+        SheetsOutbox, candidates, *due,
+        status='sending', next_attempt_at=now + timedelta(seconds=CLAIM_SECONDS)
+    )
+    db.session.commit()
+    if not claimed:
+        return 0
+    rows = SheetsOutbox.query.filter(SheetsOutbox.id.in_(claimed)).order_by(SheetsOutbox.id).all()
+    
+    body = {'rows': [{
+        'outbox_id': row.id,
+        'sheet': row.sheet,
+        'action': row.action,
+        'queued_at': row.created_at.isoformat() if row.created_at else None,
+        'data': json.loads(row.payload)
+    } for row in rows]}
+    
+    try:
+        response = _http_session().post(
+            config['GOOGLE_SHEETS_WEBHOOK_URL'], json=body, timeout=config['GOOGLE_SHEETS_TIMEOUT']
+        )
+        response.raise_for_status()
+    except requests.RequestException as e:
+        dead = 0
+        for row in rows:
+            row.attempts += 1
+            row.last_error = str(e)[:500]
+            if row.attempts >= config['GOOGLE_SHEETS_MAX_ATTEMPTS']:
+                row.status = 'dead'
+                dead += 1
+            else:
+                delay = min(config['GOOGLE_SHEETS_RETRY_SECONDS'] * 2 ** (row.attempts - 1), config['GOOGLE_SHEETS_MAX_BACKOFF'])
+                row.status = 'pending'
+                row.next_attempt_at = now + timedelta(seconds=delay)
+        db.session.commit()
+        logger.warning('Google Sheets sync of %d rows failed: %s', len(rows), e)
+        if dead:
+            logger.error('Gave up on %d Google Sheets rows after %d attempts', dead, config['GOOGLE_SHEETS_MAX_ATTEMPTS'])
+        return 0
+    
+    SheetsOutbox.query.filter(SheetsOutbox.id.in_([row.id for row in rows])).delete(synchronize_session=False)
+    db.session.commit()
+    return len(rows)
+
+def retry_dead_rows():
+    """Queue every dead outbox row for another round of attempts; return how many were requeued"""
+    requeued = SheetsOutbox.query.filter_by(status='dead').update(
+        {'status': 'pending', 'attempts': 0, 'next_attempt_at': datetime.utcnow()}, synchronize_session=False
+    )
+    db.session.commit()
+    return requeued
+
+def drain_outbox():
+    """Send due rows until the outbox is empty or a batch fails; return how many were delivered"""
+    delivered = 0
+    while True:
+        sent = send_batch()
+        delivered += sent
+        if sent < current_app.config['GOOGLE_SHEETS_BATCH_SIZE']:
+            return delivered
+
+def start_sheets_worker(app):
+    """Drain the outbox in a daemon thread whenever rows are queued, and every GOOGLE_SHEETS_POLL_SECONDS"""
+    global _worker_started
+    if _worker_started or not app.config.get('GOOGLE_SHEETS_ENABLED') or app.testing:
+        return
+    if not app.config.get('GOOGLE_SHEETS_WEBHOOK_URL'):
+        logger.warning('GOOGLE_SHEETS_ENABLED is set without GOOGLE_SHEETS_WEBHOOK_URL; rows will queue unsent')
+        return
+    
+    def run():
+        while True:
+            _wake.wait(timeout=app.config['GOOGLE_SHEETS_POLL_SECONDS'])
+            _wake.clear()
+            with app.app_context():
+                try:
+                    drain_outbox()
+                except Exception:
+                    db.session.rollback()
+                    logger.exception('Google Sheets sync failed')
+    
+    threading.Thread(target=run, name='sheets-sync', daemon=True).start()
+    _worker_started = True
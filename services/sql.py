@@ -0,0 +1,53 @@
+from datetime import datetime
+from sqlalchemy import update
+from sqlalchemy.dialects import postgresql, sqlite
+from models import db
+
+def upsert_increment_statement(dialect, model, keys, column, delta):
+    """Build the INSERT ... ON CONFLICT statement behind ``upsert_increment``, or None if the dialect lacks one"""
+    if dialect not in ('sqlite', 'postgresql'):
+        return None
+    
+    insert = sqlite.insert if dialect == 'sqlite' else postgresql.insert
+    stmt = insert(model).values(**keys, **{column: delta})
+    set_ = {column: getattr(model, column) + getattr(stmt.excluded, column)}
+    # The conflict branch is an UPDATE that column onupdate hooks never see
+    if 'updated_at' in model.__table__.columns:
+        set_['updated_at'] = datetime.utcnow()
+    return stmt.on_conflict_do_update(index_elements=list(keys), set_=set_)
+
+def upsert_increment(model, keys, column, delta):
+    """Add ``delta`` to ``column`` of the row identified by ``keys``, creating it if missing.
+    
+    Runs as a single INSERT ... ON CONFLICT statement where the dialect supports
+    it, so concurrent writers never lose an increment.
+    """
+    stmt = upsert_increment_statement(db.session.get_bind().dialect.name, model, keys, column, delta)
+    if stmt is not None:
+        db.session.execute(stmt)
+        return
+    
+    updated = model.query.filter_by(**keys).update(
+        {getattr(model, column): getattr(model, column) + delta}, synchronize_session=False
+    )
+    if not updated:
+        db.session.add(model(**keys, **{column: delta}))
+
+def claim_rows(model, ids, *conditions, **values):
+    """Set ``values`` on the rows in ``ids`` that still match ``conditions``; return the ids changed.
+    
+    The check and the change are one conditional UPDATE, so when several
+    workers (threads or processes) picked the same candidates each row is
+    claimed by exactly one of them. Runs in the current transaction.
+    """
+    if not ids:
+        return []
+    
+    stmt = update(model).where(model.id.in_(ids), *conditions).values(**values)
+    if db.session.get_bind().dialect.update_returning:
+        return sorted(row.id for row in db.session.execute(stmt.returning(model.id)))
+    
+    return [
+        row_id for row_id in sorted(ids)
+        if db.session.execute(update(model).where(model.id == row_id, *conditions).values(**values)).rowcount
+    ]
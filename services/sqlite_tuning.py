@@ -0,0 +1,91 @@
+import logging
+import threading
+import time
+from sqlalchemy import event, text
+from models import db
+
+logger = logging.getLogger(__name__)
+
+# Connection settings for single-node SQLite deployments. WAL lets the
+# dashboards keep reading while a gate terminal commits, and with
+# synchronous=NORMAL a commit only appends to the WAL without an fsync; the
+# WAL is synced at checkpoints. The database always stays consistent, but
+# after a power loss or OS crash the commits made since the last sync can be
+# rolled back (an application crash loses nothing). That is the trade-off
+# SQLite recommends for WAL mode; set SQLITE_SYNCHRONOUS to FULL to sync every
+# commit.
+# busy_timeout makes concurrent writers wait for the lock instead of failing
+# with "database is locked".
+
+def _pragmas(config):
+    return [
+        ('journal_mode', config.get('SQLITE_JOURNAL_MODE', 'WAL')),
+        ('synchronous', config.get('SQLITE_SYNCHRONOUS', 'NORMAL')),
+        ('busy_timeout', int(config.get('SQLITE_BUSY_TIMEOUT_MS', 5000))),
+        ('mmap_size', int(config.get('SQLITE_MMAP_SIZE', 256 * 1024 * 1024))),
+        # Negative values are KiB rather than pages
+        ('cache_size', -int(config.get('SQLITE_CACHE_SIZE_KB', 64 * 1024))),
+        ('temp_store', 'MEMORY')
+    ]
+
+def install_sqlite_pragmas(engine, config):
+    """Apply the tuning pragmas to every new connection of a SQLite engine"""
+    if engine.dialect.name != 'sqlite' or not config.get('SQLITE_TUNING_ENABLED', True):
+        return
+    
+    pragmas = _pragmas(config)
+    # In-memory databases cannot use WAL and are private to one connection
+    if engine.url.database in (None, '', ':memory:'):
+        pragmas = [p for p in pragmas if p[0] != 'journal_mode']
+    
+    def set_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        try:
+            for name, value in pragmas:
+                cursor.execute(f'PRAGMA {name} = {value}')
+        finally:
+            cursor.close()
+    
+    event.listen(engine, 'connect', set_pragmas)
+
+def optimize_database(full=False):
+    """Refresh query planner statistics and trim the WAL.
+    
+    ``PRAGMA optimize`` only re-analyzes tables whose statistics are stale, so
+    it is cheap enough to run periodically; ``full`` runs a complete ANALYZE.
+    Returns the statements executed.
+    """
+    if db.engine.dialect.name != 'sqlite':
+        return []
+    
+    statements = ['ANALYZE' if full else 'PRAGMA optimize', 'PRAGMA wal_checkpoint(TRUNCATE)']
+    with db.engine.connect() as conn:
+        for statement in statements:
+            conn.execute(text(statement))
+        conn.commit()
+    return statements
+
+_maintenance_started = False
+
+def start_maintenance(app):
+    """Run ``optimize_database`` every SQLITE_OPTIMIZE_INTERVAL seconds in a daemon thread"""
+    global _maintenance_started
+    interval = app.config.get('SQLITE_OPTIMIZE_INTERVAL', 0)
+    if _maintenance_started or not interval or app.testing:
+        return
+    
+    with app.app_context():
+        if db.engine.dialect.name != 'sqlite':
+            return
+    
+    def run():
+        while True:
+            time.sleep(interval)
+            with app.app_context():
+                try:
+                    optimize_database()
+                except Exception:
+                    logger.exception('SQLite maintenance failed')
+    
+    threading.Thread(target=run, name='sqlite-maintenance', daemon=True).start()
+    _maintenance_started = True
@@ -0,0 +1,44 @@
+from datetime import datetime, timedelta
+from services import counters
+
+def day_range(day):
+    """Return the [start, end) datetimes covering a calendar day"""
+    start = datetime.combine(day, datetime.min.time())
+    return start, start + timedelta(days=1)
+
+def get_dashboard_summary(today=None, days=7):
+    """Compute dashboard counters and the per-day activity histogram.
+    
+    Returns a ``(stats, week_data)`` tuple. Everything is read from the
+    ``daily_counters`` rollup, so the cost grows with the number of days
+    covered rather than with the number of gate log rows.
+    """
+    if today is None:
+        today = datetime.now().date()
+    first_day = today - timedelta(days=days - 1)
+    
+    day_counts = counters.counts_by_day(first_day, today)
+    
+    week_data = []
+    for i in range(days):
+        day = first_day + timedelta(days=i)
+        week_data.append({
+            'date': day.strftime('%Y-%m-%d'),
+            'visitors': day_counts.get((day, counters.VISITOR), 0),
+            'vehicles': day_counts.get((day, counters.VEHICLE), 0)
+        })
+    
+    visitor_totals = counters.totals_by_key(counters.VISITOR, ['pending', 'approved'])
+    vehicle_totals = counters.totals_by_key(counters.VEHICLE_STATUS, ['entered'])
+    
+    # Exiting always sets status to 'exited', so open visits are exactly the
+    # pending and approved ones
+    stats = {
+        'today_visitors': week_data[-1]['visitors'],
+        'pending_visitors': visitor_totals.get('pending', 0),
+        'active_visitors': visitor_totals.get('pending', 0) + visitor_totals.get('approved', 0),
+        'today_vehicles': week_data[-1]['vehicles'],
+        'active_vehicles': vehicle_totals.get('entered', 0)
+    }
+    
+    return stats, week_data
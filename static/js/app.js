@@ -35,12 +35,56 @@ function initializeApp() {
         initializeSpeechRecognition();
     }
 
-    // Auto-refresh dashboard stats
+    // Prefill entry forms for returning visitors and vehicles
+    document.querySelectorAll('[data-recognize]').forEach(initializeRecognition);
+
+    // Live dashboard stats
     if (document.querySelector('.dashboard-stats')) {
-        // Refresh immediately on load, then every 30 seconds
         refreshDashboardStats();
-        setInterval(refreshDashboardStats, 30000); // Refresh every 30 seconds
+        if (window.EventSource) {
+            // Refresh when the server pushes gate activity, with a slow safety poll
+            subscribeToLiveEvents(debounce(refreshDashboardStats, 1000));
+            setInterval(refreshDashboardStats, 300000);
+        } else {
+            setInterval(refreshDashboardStats, 30000); // Refresh every 30 seconds
+        }
+    }
+
+    // Live approval requests
+    const approvalsBanner = document.getElementById('liveApprovalsBanner');
+    if (approvalsBanner && window.EventSource) {
+        subscribeToLiveEvents(function(eventType) {
+            if (['notification', 'visitor_approved', 'visitor_rejected'].includes(eventType)) {
+                approvalsBanner.classList.remove('d-none');
+            }
+        });
+    }
+}
+
+// Server-Sent Events
+const liveEventTypes = [
+    'visitor_entry', 'visitor_exit', 'visitor_approved', 'visitor_rejected',
+    'vehicle_entry', 'vehicle_exit', 'notification', 'notification_read'
+];
+let liveEventSource = null;
+
+function subscribeToLiveEvents(callback) {
+    if (!liveEventSource) {
+        liveEventSource = new EventSource('/dashboard/api/stream');
     }
+    liveEventTypes.forEach(function(eventType) {
+        liveEventSource.addEventListener(eventType, function(event) {
+            callback(eventType, JSON.parse(event.data));
+        });
+    });
+}
+
+function debounce(fn, wait) {
+    let timeout;
+    return function() {
+        clearTimeout(timeout);
+        timeout = setTimeout(fn, wait);
+    };
 }
 
 // Camera functionality
@@ -316,6 +360,48 @@ function updateStatCard(elementId, value) {
     }
 }
 
+// Returning visitor / vehicle recognition
+const recognizeFields = {
+    visitor: { param: 'phone', record: 'visitor', fields: ['name', 'email', 'purpose', 'authority_id'] },
+    vehicle: { param: 'number', record: 'vehicle', fields: ['vehicle_type', 'driver_name', 'driver_phone', 'route'] }
+};
+
+function initializeRecognition(input) {
+    const config = recognizeFields[input.dataset.recognize];
+    if (!config) return;
+
+    const hint = document.createElement('small');
+    hint.className = 'text-success d-none';
+    input.insertAdjacentElement('afterend', hint);
+
+    input.addEventListener('change', function() {
+        const value = input.value.trim();
+        hint.classList.add('d-none');
+        if (!value) return;
+
+        fetch(`/api/recognize/${input.dataset.recognize}?${config.param}=${encodeURIComponent(value)}`)
+            .then(response => response.json())
+            .then(data => {
+                if (!data.found) return;
+
+                const record = data[config.record];
+                // Only fill fields the guard has not typed into yet
+                config.fields.forEach(function(field) {
+                    const element = document.getElementById(field);
+                    if (element && !element.value && record[field]) {
+                        element.value = record[field];
+                    }
+                });
+
+                hint.textContent = `Returning ${input.dataset.recognize} - ${data.visit_count} previous visit(s), last on ${new Date(record.last_visit).toLocaleDateString()}`;
+                hint.classList.remove('d-none');
+            })
+            .catch(error => {
+                console.error('Recognition error:', error);
+            });
+    });
+}
+
 // Form validation helpers
 function validateForm(formId) {
     const form = document.getElementById(formId);
@@ -368,15 +454,24 @@ function initializeSearch() {
     });
 }
 
+let searchController = null;
+
 function performSearch(query) {
     if (query.length < 2) return;
     
-    fetch(`/api/search?q=${encodeURIComponent(query)}`)
+    // Cancel the previous keystroke's request so only the latest one renders
+    if (searchController) {
+        searchController.abort();
+    }
+    searchController = new AbortController();
+    
+    fetch(`/api/search?q=${encodeURIComponent(query)}`, { signal: searchController.signal })
         .then(response => response.json())
         .then(data => {
             displaySearchResults(data);
         })
         .catch(error => {
+            if (error.name === 'AbortError') return;
             console.error('Search error:', error);
         });
 }
@@ -0,0 +1,59 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config import Config
+from app import create_app
+from models import db
+from services import auth, authorities, pagination, response_cache
+from services.instrumentation import metrics
+
+def _clear_process_caches():
+    # Each test gets a fresh database, so nothing cached in this process may outlive it
+    auth._cache.clear()
+    authorities.invalidate_authorities()
+    pagination._count_cache.clear()
+    response_cache._responses.clear()
+    metrics.reset()
+
+@pytest.fixture
+def make_app(tmp_path):
+    """Return a factory building the app on a throwaway SQLite database, with config overrides"""
+    def make(**overrides):
+        settings = {
+            'TESTING': True,
+            'SQLALCHEMY_DATABASE_URI': 'sqlite:///' + str(tmp_path / 'gate.db'),
+            'SQLALCHEMY_ENGINE_OPTIONS': {},
+            'UPLOAD_FOLDER': str(tmp_path / 'uploads'),
+            **overrides
+        }
+        _clear_process_caches()
+        return create_app(type('TestConfig', (Config,), settings))
+    return make
+
+@pytest.fixture
+def app(make_app):
+    return make_app()
+
+@pytest.fixture
+def db_session(app):
+    with app.app_context():
+        yield db.session
+        db.session.remove()
+
+@pytest.fixture
+def login(app):
+    """Return a function signing a new test client in"""
+    def login(username='admin', password='admin123'):
+        client = app.test_client()
+        response = client.post('/auth/login', data={'username': username, 'password': password})
+        assert response.status_code == 302, response.status_code
+        return client
+    return login
+
+@pytest.fixture
+def admin(login):
+    return login()
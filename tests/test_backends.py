@@ -0,0 +1,121 @@
+"""The gate workflow on each supported database backend.
+
+SQLite always runs. Set TEST_DATABASE_URL to add a server database, e.g. a
+local PostgreSQL created with ``createdb gate_entry_test``; it is wiped, so
+never point it at a database holding real data. The SQLite data is then also
+copied across with ``copy_database`` and the row counts compared.
+"""
+import os
+
+import pytest
+from werkzeug.security import generate_password_hash
+
+from config import Config, _engine_options
+from models import db, User, Visitor, BusEntry, DailyCounter, NotificationEvent, SheetsOutbox
+from app import create_app
+from services.counters import rebuild_counters
+from services.db_transfer import copy_database, schema_sql
+
+SCHEMA_FILE = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'scripts', '011_create_app_schema_postgres.sql'
+)
+SERVER_URL = os.environ.get('TEST_DATABASE_URL')
+
+def _server_app(url):
+    config = type('ServerConfig', (Config,), {
+        'TESTING': True,
+        'SQLALCHEMY_DATABASE_URI': url,
+        'SQLALCHEMY_ENGINE_OPTIONS': _engine_options(url)
+    })
+    # Start from an empty schema so every run is repeatable
+    app = create_app(config)
+    with app.app_context():
+        db.drop_all()
+        db.session.execute(db.text('DROP TABLE IF EXISTS schema_migrations'))
+        db.session.commit()
+    return create_app(config)
+
+def expect(response, code):
+    assert response.status_code == code, f'{response.request.path} returned {response.status_code}'
+
+def run_workflow(app):
+    client = app.test_client()
+    
+    expect(client.post('/auth/login', data={'username': 'admin', 'password': 'admin123'}), 302)
+    expect(client.post('/authority/add', data={
+        'name': 'Test HOD', 'designation': 'hod', 'email': 'hod@test', 'password': 'x', 'confirm_password': 'x'
+    }), 302)
+    with app.app_context():
+        authority_id = db.session.execute(db.text("SELECT id FROM authorities WHERE email = 'hod@test'")).scalar()
+    
+    for i in range(3):
+        expect(client.post('/visitor/entry', data={
+            'name': f'Visitor {i}', 'phone': f'98765 4321{i}', 'purpose': 'check', 'authority_id': authority_id
+        }), 302)
+        expect(client.post('/vehicle/entry', data={'vehicle_number': f'TN 01 AB 00{i}', 'route': 'R1', 'vehicle_type': 'bus'}), 302)
+    
+    with app.app_context():
+        visitor_ids = [v.id for v in Visitor.query.all()]
+        db.session.add(User(username='guard@test', password=generate_password_hash('x'), role='user'))
+        db.session.commit()
+    
+    # Accounts without an inbox cannot decide another authority's requests
+    guard = app.test_client()
+    expect(guard.post('/auth/login', data={'username': 'guard@test', 'password': 'x'}), 302)
+    expect(guard.post(f'/authority/approve/{visitor_ids[0]}'), 403)
+    response = guard.post('/authority/approvals/bulk', json={'action': 'reject', 'visitor_ids': visitor_ids})
+    expect(response, 200)
+    assert all(r.get('forbidden') for r in response.get_json()['results'])
+    
+    response = client.post('/authority/approvals/bulk', json={'action': 'approve', 'visitor_ids': visitor_ids})
+    expect(response, 200)
+    assert all(r['success'] for r in response.get_json()['results'])
+    expect(client.post('/vehicle/bulk-exit', data={'mode': 'route', 'route': 'R1'}), 302)
+    
+    for url in ('/', '/dashboard/', '/dashboard/reports', '/dashboard/reports?type=vehicles', '/visitor/list',
+                '/vehicle/list', '/api/visitors', '/api/search?q=Visitor', '/dashboard/reports/export?type=visitors'):
+        expect(client.get(url), 200)
+    
+    with app.app_context():
+        assert BusEntry.query.filter_by(status='exited').count() == 3
+        live = sorted((r.day, r.kind, r.key, r.count) for r in DailyCounter.query.all() if r.count)
+        rebuild_counters()
+        assert live == sorted((r.day, r.kind, r.key, r.count) for r in DailyCounter.query.all()), 'counters drifted'
+
+def test_schema_file_matches_models():
+    with open(SCHEMA_FILE) as f:
+        shipped = ''.join(line for line in f if not line.startswith('--')).lstrip('\n')
+    assert shipped == schema_sql('postgresql'), (
+        f'{os.path.basename(SCHEMA_FILE)} is out of date; regenerate it with flask schema-sql'
+    )
+
+def check_copy(target, source_url):
+    """Replace the target's data with the source's rows, then write to the serial-keyed tables"""
+    with target.app_context():
+        copied = dict(copy_database(source_url, log=lambda line: None))
+        assert copied['visitors'] == 3 and copied['bus_entries'] == 3
+        
+        # Copied ids must not be handed out again
+        copied_ids = {e.id for e in NotificationEvent.query}
+        db.session.add(NotificationEvent(type='visitor_request', payload='{}'))
+        db.session.add(SheetsOutbox(sheet='visitors', action='entry', payload='{}'))
+        db.session.commit()
+        assert NotificationEvent.query.count() == len(copied_ids) + 1
+
+def test_workflow_on_sqlite(app):
+    run_workflow(app)
+
+def test_copy_between_sqlite_databases(app, make_app, tmp_path):
+    run_workflow(app)
+    target = make_app(SQLALCHEMY_DATABASE_URI='sqlite:///' + str(tmp_path / 'copy.db'))
+    check_copy(target, app.config['SQLALCHEMY_DATABASE_URI'])
+
+@pytest.mark.skipif(not SERVER_URL, reason='TEST_DATABASE_URL is not set')
+def test_workflow_and_copy_on_server_database(app):
+    run_workflow(app)
+    sqlite_url = app.config['SQLALCHEMY_DATABASE_URI']
+    
+    server = _server_app(SERVER_URL)
+    run_workflow(server)
+    # Replace the server data with the SQLite run's rows
+    check_copy(server, sqlite_url)
@@ -0,0 +1,34 @@
+from datetime import date
+
+from werkzeug.security import generate_password_hash
+
+from models import db, User, Authority, Visitor, ExpectedVisitor, NotificationEvent
+
+def test_only_admins_import_expected_visitors(app, admin, login):
+    with app.app_context():
+        db.session.add(User(username='guard@test', password=generate_password_hash('x'), role='user'))
+        db.session.commit()
+    
+    guard = login('guard@test', 'x')
+    assert guard.get('/visitor/import').status_code == 302
+    assert admin.get('/visitor/import').status_code == 200
+
+def test_check_in_waits_for_the_authority(app, admin):
+    with app.app_context():
+        hod = Authority(name='Test HOD', designation='hod', email='hod@test')
+        db.session.add(hod)
+        db.session.flush()
+        expected = ExpectedVisitor(name='Guest', phone='9876543210', purpose='check',
+                                   authority_id=hod.id, expected_date=date.today())
+        db.session.add(expected)
+        db.session.commit()
+        expected_id = expected.id
+    
+    assert admin.post(f'/visitor/expected/{expected_id}/check-in').status_code == 302
+    assert admin.post(f'/visitor/expected/{expected_id}/check-in').status_code == 302
+    
+    with app.app_context():
+        visitor = Visitor.query.one()
+        assert visitor.status == 'pending' and not visitor.authority_permission_granted
+        assert db.session.get(ExpectedVisitor, expected_id).visitor_id == visitor.id
+        assert NotificationEvent.query.filter_by(visitor_id=visitor.id).count() == 1
@@ -0,0 +1,64 @@
+import json
+import logging
+
+import pytest
+
+from services.instrumentation import logger
+
+class Capture(logging.Handler):
+    def __init__(self):
+        super().__init__()
+        self.records = []
+    
+    def emit(self, record):
+        self.records.append(json.loads(record.getMessage()))
+
+@pytest.fixture
+def app(make_app):
+    # Both thresholds at 0 ms, so every request and statement is logged
+    return make_app(SLOW_REQUEST_MS=0, SLOW_QUERY_MS=0)
+
+@pytest.fixture
+def slow_log():
+    capture = Capture()
+    logger.addHandler(capture)
+    yield capture.records
+    logger.removeHandler(capture)
+
+def test_metrics_count_requests_sql_and_templates(admin):
+    assert admin.get('/dashboard/').status_code == 200
+    assert admin.get('/api/visitors').status_code == 200
+    
+    response = admin.get('/metrics')
+    assert response.status_code == 200
+    text = response.get_data(as_text=True)
+    for expected in (
+        'gate_http_requests_total{endpoint="dashboard.index",method="GET",status="200"} 1',
+        'gate_http_request_duration_seconds_count{endpoint="api.get_visitors"} 1',
+        'gate_sql_statements_total{endpoint="dashboard.index"}',
+        'gate_template_render_seconds_total{endpoint="dashboard.index"}',
+        'gate_slow_requests_total{endpoint="auth.login"} 1'
+    ):
+        assert expected in text
+
+def test_metrics_need_an_admin_or_the_token(app):
+    # Including requests a local proxy forwards
+    anonymous = app.test_client()
+    assert anonymous.get('/metrics').status_code == 403
+    assert anonymous.get('/metrics', headers={'Authorization': 'Bearer wrong'}).status_code == 403
+    app.config['METRICS_TOKEN'] = 'test-token'
+    assert anonymous.get('/metrics', headers={'Authorization': 'Bearer test-token'}).status_code == 200
+
+def test_slow_log_records_requests_and_explained_queries(admin, slow_log):
+    assert admin.get('/dashboard/').status_code == 200
+    assert admin.get('/api/visitors').status_code == 200
+    
+    slow_requests = [r for r in slow_log if r['event'] == 'slow_request']
+    assert {r['endpoint'] for r in slow_requests} >= {'dashboard.index', 'api.get_visitors'}
+    dashboard = next(r for r in slow_requests if r['endpoint'] == 'dashboard.index')
+    assert dashboard['sql_statements'] > 0 and dashboard['template_ms'] > 0
+    
+    explained = [r for r in slow_log if r['event'] == 'slow_query' and r.get('plan')]
+    assert explained and all('EXPLAIN failed' not in r['plan'][0] for r in explained)
+    # Parameters (the admin's password hash among them) stay out of the log by default
+    assert not any('parameters' in r for r in slow_log if r['event'] == 'slow_query')
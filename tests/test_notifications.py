@@ -0,0 +1,91 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+import app as gate_app
+from models import db, Authority, Notification, NotificationDelivery, NotificationEvent
+from services.notifications import FakeTransport, register_transport, expand_pending_events, deliver_pending
+from services.registration import register_visitor
+from services.sql import claim_rows
+
+@pytest.fixture
+def app(make_app):
+    return make_app(NOTIFICATION_RETRY_SECONDS=0)
+
+@pytest.fixture
+def transport():
+    transport = FakeTransport(fail_with='gateway unavailable')
+    register_transport('fake', transport)
+    return transport
+
+def test_event_fans_out_and_failed_delivery_is_retried(db_session, transport):
+    hod = Authority(name='Test HOD', designation='hod', email='hod@test')
+    principal = Authority(name='Test Principal', designation='Principal', email='principal@test')
+    db.session.add_all([hod, principal])
+    db.session.commit()
+    
+    visitor = register_visitor('Visitor', '9876543210', 'v@test', 'check', authority_id=hod.id)
+    # The post-commit dispatch may already have run in the worker pool
+    expand_pending_events()
+    assert NotificationEvent.query.filter_by(status='pending').count() == 0
+    
+    notifications = Notification.query.filter_by(visitor_id=visitor.id).all()
+    assert sorted(n.authority_id for n in notifications) == sorted([hod.id, principal.id])
+    assert all(n.delivery_status == 'pending' for n in notifications)
+    
+    # Deliveries may also be attempted by the background dispatch; only the outcome is checked
+    deliver_pending('fake')
+    db.session.expire_all()
+    deliveries = NotificationDelivery.query.all()
+    assert len(deliveries) == 2 and all(d.status == 'pending' and d.attempts >= 1 for d in deliveries)
+    
+    transport.fail_with = None
+    deliver_pending('fake')
+    db.session.expire_all()
+    assert all(n.delivery_status == 'delivered' for n in Notification.query.filter_by(visitor_id=visitor.id))
+    assert sorted(m['recipient'] for m in transport.sent) == sorted([hod.id, principal.id])
+
+def test_events_are_claimed_once(db_session):
+    db.session.add_all(NotificationEvent(type='visitor_request', payload='{}') for _ in range(3))
+    db.session.commit()
+    ids = [e.id for e in NotificationEvent.query]
+    
+    # Two sweeps picked the same candidates; the second gets nothing
+    assert claim_rows(NotificationEvent, ids, NotificationEvent.status == 'pending', status='expanded') == ids
+    assert claim_rows(NotificationEvent, ids, NotificationEvent.status == 'pending', status='expanded') == []
+    db.session.commit()
+    assert expand_pending_events() == 0
+
+def test_deliveries_claimed_by_another_worker_are_not_sent(db_session):
+    transport = FakeTransport()
+    register_transport('fake', transport)
+    hod = Authority(name='Test HOD', designation='hod', email='hod@test')
+    db.session.add(hod)
+    db.session.flush()
+    notification = Notification(authority_id=hod.id, title='Test', message='Test', delivery_status='pending')
+    notification.deliveries = [NotificationDelivery(channel='fake', recipient=str(i)) for i in range(2)]
+    db.session.add(notification)
+    db.session.commit()
+    
+    # Another process is still sending the first one
+    first = notification.deliveries[0]
+    first.status, first.next_attempt_at = 'sending', datetime.utcnow() + timedelta(minutes=5)
+    db.session.commit()
+    
+    assert deliver_pending('fake') == 1
+    assert [m['recipient'] for m in transport.sent] == ['1']
+    db.session.expire_all()
+    assert db.session.get(Notification, notification.id).delivery_status == 'pending'
+
+def test_reloader_parent_starts_no_workers(make_app, monkeypatch):
+    started = []
+    for name in ('start_maintenance', 'start_sheets_worker', 'start_dispatcher', 'start_retention'):
+        monkeypatch.setattr(gate_app, name, lambda app, name=name: started.append(name))
+    
+    monkeypatch.delenv('WERKZEUG_RUN_MAIN', raising=False)
+    make_app(DEBUG=True)
+    assert started == []
+    
+    monkeypatch.setenv('WERKZEUG_RUN_MAIN', 'true')
+    make_app(DEBUG=True)
+    assert len(started) == 4
@@ -0,0 +1,40 @@
+import io
+
+from PIL import Image
+
+import routes.visitor as visitor_routes
+from models import db, Visitor
+from services import photo_store
+from services.images import enqueue_visitor_photo
+
+def _camera_frame():
+    image = Image.new('RGB', (3000, 2000), 'gray')
+    exif = Image.Exif()
+    exif[0x010f] = 'Test Camera'  # Make
+    frame = io.BytesIO()
+    image.save(frame, 'JPEG', exif=exif)
+    frame.seek(0)
+    return frame
+
+def test_exit_photo_is_re_encoded_without_metadata(app, admin, monkeypatch):
+    processing = []
+    monkeypatch.setattr(visitor_routes, 'enqueue_visitor_photo',
+                        lambda *args, **kwargs: processing.append(enqueue_visitor_photo(*args, **kwargs)))
+    admin.post('/visitor/entry', data={'name': 'Visitor', 'phone': '98765 43210', 'purpose': 'check'})
+    with app.app_context():
+        visitor_id = Visitor.query.one().id
+    
+    response = admin.post('/visitor/upload-exit-photo', data={
+        'visitor_id': visitor_id, 'exit_photo': (_camera_frame(), 'exit_photo.jpg')
+    }, content_type='multipart/form-data')
+    raw_url = response.get_json()['photo_url']
+    assert len(processing) == 1
+    processing[0].result()
+    
+    with app.app_context():
+        visitor = db.session.get(Visitor, visitor_id)
+        assert visitor.exit_photo_url != raw_url and visitor.photo_thumb_url is None
+        assert raw_url not in visitor.notes and visitor.exit_photo_url in visitor.notes
+        with Image.open(photo_store.blob_path_for_url(visitor.exit_photo_url)) as stored:
+            assert max(stored.size) == app.config['PHOTO_MAX_DIMENSION']
+            assert not stored.getexif()
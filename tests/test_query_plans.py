@@ -0,0 +1,50 @@
+from sqlalchemy import text
+
+from models import db
+from services.migrations import run_migrations
+from services.query_plans import explain, hot_queries, is_full_scan
+
+# Indexes added by migration 1, and the hot queries that need them
+MIGRATION_INDEXES = (
+    'ix_authorities_is_active_name',
+    'ix_authorities_designation',
+    'ix_visitors_entry_time',
+    'ix_visitors_status_exit_time',
+    'ix_visitors_authority_id',
+    'ix_bus_entries_entry_time',
+    'ix_bus_entries_status_entry_time',
+    'ix_bus_entries_vehicle_type_entry_time',
+    'ix_notifications_is_read_created_at',
+    'ix_notifications_created_at',
+    'ix_notifications_visitor_id'
+)
+INDEXED_BY_MIGRATION = {
+    'visitors entered today': 'ix_visitors_entry_time',
+    'visitors by authority': 'ix_visitors_authority_id',
+    'active vehicles for exit': 'ix_bus_entries_status_entry_time',
+    'vehicles by type': 'ix_bus_entries_vehicle_type_entry_time',
+    'notifications for visitor': 'ix_notifications_visitor_id',
+    'active authorities': 'ix_authorities_is_active_name',
+    'principal lookup': 'ix_authorities_designation'
+}
+
+def _plans():
+    queries = hot_queries()
+    return {name: explain(queries[name]) for name in INDEXED_BY_MIGRATION}
+
+def test_migrations_index_the_hot_queries(db_session):
+    # A database created before the indexes existed, with no migrations recorded
+    for index in MIGRATION_INDEXES:
+        db.session.execute(text(f'DROP INDEX {index}'))
+    db.session.execute(text('DELETE FROM schema_migrations'))
+    db.session.commit()
+    
+    for name, plan in _plans().items():
+        assert is_full_scan(plan), f'{name}: {plan}'
+    db.session.commit()
+    
+    run_migrations()
+    
+    for name, plan in _plans().items():
+        index = INDEXED_BY_MIGRATION[name]
+        assert any(line.startswith('SEARCH ') and f'USING INDEX {index}' in line for line in plan), f'{name}: {plan}'
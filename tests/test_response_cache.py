@@ -0,0 +1,26 @@
+from models import db, BusEntry
+from services.response_cache import table_versions
+
+def test_commit_bumps_the_versions_of_written_tables(db_session):
+    before = table_versions(('bus_entries', 'visitors'))
+    db.session.add(BusEntry(bus_number='TN 01 AB 0001'))
+    db.session.commit()
+    assert table_versions(('bus_entries', 'visitors')) == (before[0] + 1, before[1])
+
+def test_rollback_discards_the_bump_with_the_data(db_session):
+    db.session.add(BusEntry(bus_number='TN 01 AB 0001'))
+    db.session.commit()
+    before = table_versions(('bus_entries',))
+    
+    db.session.add(BusEntry(bus_number='TN 01 AB 0002'))
+    db.session.flush()
+    db.session.rollback()
+    assert table_versions(('bus_entries',)) == before
+
+def test_api_etag_changes_after_a_write(app, admin):
+    first = admin.get('/api/visitors')
+    assert first.status_code == 200 and first.headers['ETag']
+    assert admin.get('/api/visitors', headers={'If-None-Match': first.headers['ETag']}).status_code == 304
+    
+    admin.post('/visitor/entry', data={'name': 'Visitor', 'phone': '98765 43210', 'purpose': 'check'})
+    assert admin.get('/api/visitors', headers={'If-None-Match': first.headers['ETag']}).status_code == 200
@@ -0,0 +1,69 @@
+from datetime import datetime, timedelta
+
+from models import db, Authority, Visitor, BusEntry, Notification, InboxCounter, ARCHIVE_TABLES
+from services import exports, reports
+from services.inbox import record_notification
+from services.retention import archive_closed_records
+
+OLD = datetime.utcnow() - timedelta(days=400)
+
+def _add_records():
+    hod = Authority(name='Test HOD', designation='hod', email='hod@test')
+    db.session.add(hod)
+    db.session.flush()
+    
+    visitors = [
+        Visitor(name='Exited', phone='9876543210', purpose='check', status='exited',
+                entry_time=OLD, exit_time=OLD + timedelta(hours=1), authority_id=hod.id),
+        Visitor(name='Rejected', phone='9876543211', purpose='check', status='rejected', entry_time=OLD),
+        Visitor(name='Still inside', phone='9876543212', purpose='check', status='approved', entry_time=OLD),
+        Visitor(name='Recent', phone='9876543213', purpose='check', status='exited', entry_time=datetime.utcnow())
+    ]
+    vehicles = [
+        BusEntry(bus_number='TN 01 AB 0001', status='exited', entry_time=OLD, exit_time=OLD + timedelta(hours=2)),
+        BusEntry(bus_number='TN 01 AB 0002', status='exited', entry_time=OLD),
+        BusEntry(bus_number='TN 01 AB 0003', status='entered', entry_time=OLD)
+    ]
+    db.session.add_all(visitors + vehicles)
+    db.session.flush()
+    
+    notification = Notification(visitor_id=visitors[0].id, authority_id=hod.id, title='Check', message='Check')
+    db.session.add(notification)
+    record_notification(notification)
+    db.session.commit()
+    return hod
+
+def test_only_closed_records_are_archived(db_session):
+    hod = _add_records()
+    
+    moved = archive_closed_records(days=180, photo_mode='keep')
+    assert moved == {'visitors': 2, 'bus_entries': 2, 'notifications': 1}
+    assert sorted(v.name for v in Visitor.query) == ['Recent', 'Still inside']
+    assert BusEntry.query.count() == 1 and Notification.query.count() == 0
+    assert db.session.get(InboxCounter, hod.id).unread == 0
+    assert db.session.query(ARCHIVE_TABLES[Visitor]).count() == 2
+    assert archive_closed_records(days=180) == {}
+
+def test_archiving_is_off_by_default(db_session):
+    _add_records()
+    assert archive_closed_records() == {}
+    assert Visitor.query.count() == 4 and BusEntry.query.count() == 3
+
+def test_reports_include_archived_records(app, admin):
+    with app.app_context():
+        _add_records()
+        archive_closed_records(days=180, photo_mode='keep')
+        
+        start, end = OLD - timedelta(days=1), datetime.utcnow() + timedelta(days=1)
+        summary = reports.visitor_summary(start, end)
+        assert sum(summary['hourly']) == 4
+        assert summary['average_dwell'] == 60
+        assert ('Test HOD', 1) in summary['authorities']
+        assert sum(reports.vehicle_summary(start, end)['hourly']) == 3
+        assert len(list(exports.visitor_rows(start, end))) == 4
+        assert len(list(exports.vehicle_rows(start, end))) == 3
+    
+    response = admin.get('/dashboard/reports', query_string={
+        'type': 'visitors', 'start_date': start.strftime('%Y-%m-%d'), 'end_date': end.strftime('%Y-%m-%d')
+    })
+    assert response.status_code == 200 and b'Rejected' in response.data
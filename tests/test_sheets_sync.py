@@ -0,0 +1,95 @@
+import json
+import threading
+from datetime import datetime, timedelta
+from http.server import BaseHTTPRequestHandler, HTTPServer
+
+import pytest
+
+from models import db, SheetsOutbox
+from services.sheets import drain_outbox, retry_dead_rows, queue_sheet_row
+
+class StubWebhook(BaseHTTPRequestHandler):
+    """Rejects the first ``failures_left`` batches with a 500 and records the rows of the rest"""
+    
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers['Content-Length'])))
+        if self.server.failures_left:
+            self.server.failures_left -= 1
+            self.send_response(500)
+        else:
+            self.server.batches.append(body['rows'])
+            self.send_response(200)
+        self.end_headers()
+    
+    def log_message(self, format, *args):
+        pass
+
+@pytest.fixture
+def webhook():
+    server = HTTPServer(('127.0.0.1', 0), StubWebhook)
+    server.batches = []
+    server.failures_left = 1
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+@pytest.fixture
+def app(make_app, webhook):
+    return make_app(
+        GOOGLE_SHEETS_ENABLED=True,
+        GOOGLE_SHEETS_WEBHOOK_URL=f'http://127.0.0.1:{webhook.server_port}/',
+        GOOGLE_SHEETS_BATCH_SIZE=4,
+        GOOGLE_SHEETS_RETRY_SECONDS=0,
+        GOOGLE_SHEETS_MAX_ATTEMPTS=3
+    )
+
+def test_outbox_drains_in_batches_after_a_failed_attempt(app, admin, webhook):
+    for i in range(3):
+        admin.post('/visitor/entry', data={'name': f'Visitor {i}', 'phone': f'98765 4321{i}', 'purpose': 'check'})
+        admin.post('/vehicle/entry', data={'vehicle_number': f'TN 01 AB 00{i}', 'route': 'R1', 'vehicle_type': 'bus'})
+    admin.post('/vehicle/bulk-exit', data={'mode': 'route', 'route': 'R1'})
+    
+    with app.app_context():
+        assert SheetsOutbox.query.count() == 9
+        assert drain_outbox() == 0, 'first batch should have been rejected'
+        assert SheetsOutbox.query.filter(SheetsOutbox.attempts == 1).count() == 4
+        assert drain_outbox() == 9
+        assert SheetsOutbox.query.count() == 0
+    
+    rows = [row for batch in webhook.batches for row in batch]
+    assert [len(batch) for batch in webhook.batches] == [4, 4, 1]
+    assert [row['outbox_id'] for row in rows] == sorted(row['outbox_id'] for row in rows)
+    assert sum(row['action'] == 'exit' for row in rows) == 3
+
+def test_rows_claimed_by_another_worker_are_not_sent(app, webhook):
+    webhook.failures_left = 0
+    with app.app_context():
+        for i in range(3):
+            queue_sheet_row('visitors', 'entry', {'id': i})
+        db.session.commit()
+        
+        # Another process claimed the first row and is still posting it
+        first = SheetsOutbox.query.order_by(SheetsOutbox.id).first()
+        first.status, first.next_attempt_at = 'sending', datetime.utcnow() + timedelta(minutes=5)
+        db.session.commit()
+        
+        assert drain_outbox() == 2
+        assert [row.id for row in SheetsOutbox.query] == [first.id]
+    assert [row['data']['id'] for batch in webhook.batches for row in batch] == [1, 2]
+
+def test_rows_failing_every_attempt_are_kept_dead(app, webhook):
+    webhook.failures_left = 3
+    with app.app_context():
+        queue_sheet_row('visitors', 'entry', {'id': 1})
+        db.session.commit()
+        
+        for _ in range(3):
+            assert drain_outbox() == 0
+        row = SheetsOutbox.query.one()
+        assert row.status == 'dead' and row.attempts == 3
+        assert drain_outbox() == 0 and webhook.failures_left == 0
+        
+        assert retry_dead_rows() == 1
+        assert drain_outbox() == 1
+        assert SheetsOutbox.query.count() == 0
@@ -1,6 +1,3 @@
-import os
-import uuid
-from werkzeug.utils import secure_filename
 from flask import current_app
 
 def allowed_file(filename):
@@ -10,26 +7,15 @@ def allowed_file(filename):
     return '.' in filename and \
            filename.rsplit('.', 1)[1].lower() in current_app.config['ALLOWED_EXTENSIONS']
 
-def save_uploaded_file(file, folder):
-    """Save uploaded file and return the file path"""
-    if not file or not allowed_file(file.filename):
-        return None
-    
-    # Generate unique filename
-    filename = secure_filename(file.filename)
-    name, ext = os.path.splitext(filename)
-    unique_filename = f"{name}_{uuid.uuid4().hex[:8]}{ext}"
-    
-    # Create directory if it doesn't exist
-    upload_path = os.path.join(current_app.config['UPLOAD_FOLDER'], folder)
-    os.makedirs(upload_path, exist_ok=True)
-    
-    # Save file
-    file_path = os.path.join(upload_path, unique_filename)
-    file.save(file_path)
-    
-    # Return relative path for database storage
-    return f"/static/uploads/{folder}/{unique_filename}"
+def normalize_phone(phone):
+    """Return a lookup key for a phone number: its last 10 digits"""
+    digits = ''.join(c for c in (phone or '') if c.isdigit())
+    return digits[-10:] or None
+
+def normalize_plate(plate):
+    """Return a lookup key for a vehicle number: uppercase letters and digits only"""
+    key = ''.join(c for c in (plate or '') if c.isalnum()).upper()
+    return key or None
 
 def format_datetime(dt):
     """Format datetime for display"""